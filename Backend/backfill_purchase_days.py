@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Qwipo Purchase Day Backfill
+One-off: sets last_purchase_day on the purchase edges of a graph ingested before
+ingestion recorded it, so windowed and decayed recommendations see those purchases
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from dotenv import load_dotenv
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from neo4j_pool import close_neo4j_pools, get_neo4j_pool
+from optimized_ingestion_service import write_purchase_days
+
+
+def main():
+    load_dotenv(override=True)
+    parser = argparse.ArgumentParser(description="Set last_purchase_day on existing purchase edges from the JSON data files")
+    parser.add_argument("--retailers-file", default=os.getenv("RETAILERS_FILE", "mock_data/retailers.json"))
+    parser.add_argument("--transactions-file", default=os.getenv("TRANSACTIONS_FILE", "mock_data/transactions.json"))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    print("📅 QWIPO PURCHASE DAY BACKFILL")
+    print("=" * 60)
+
+    with open(args.retailers_file, 'r') as f:
+        retailers_data = json.load(f)
+    with open(args.transactions_file, 'r') as f:
+        transactions_data = json.load(f)
+
+    start = time.perf_counter()
+    try:
+        edges = write_purchase_days(get_neo4j_pool(), retailers_data, transactions_data, args.batch_size)
+    finally:
+        close_neo4j_pools()
+    print(f"✅ Dated {edges} purchase edges from {len(transactions_data)} transactions "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
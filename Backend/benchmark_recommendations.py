@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Qwipo Recommendation Latency Benchmark
+Generates mock datasets at several scales and measures per-method latency
+percentiles and throughput of QwipoRecommendationEngine
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+# Keep per-request engine logs out of timing runs unless asked for
+os.environ.setdefault("QWIPO_LOG_LEVEL", "WARNING")
+
+from mock_data_generator import QwipoMockDataGenerator
+from in_memory_graph import InMemoryRecommendationGraph
+from recommendation_engine import QwipoRecommendationEngine
+from serialization import comprehensive_payload, dumps
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+TRANSACTIONS_PER_RETAILER = 40
+
+# Engine methods under test, called as method(retailer_id, **kwargs)
+BENCHMARK_METHODS = {
+    "get_retailer_profile": {},
+    "get_collaborative_recommendations": {"limit": 10},
+    "get_category_expansion_recommendations": {"limit": 10},
+    "get_brand_loyalty_recommendations": {"limit": 10},
+    "get_comprehensive_recommendations": {"limit_per_type": 5},
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize_latencies(latencies: List[float], wall_seconds: float) -> Dict[str, float]:
+    """Latency percentiles in milliseconds plus throughput in calls per second"""
+    ordered = sorted(latencies)
+    return {
+        "calls": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+        "throughput_per_s": len(ordered) / wall_seconds if wall_seconds > 0 else 0.0,
+    }
+
+
+def generate_dataset(num_transactions: int, seed: int):
+    """Generate retailers and transactions with the mock generator at a given scale"""
+    random.seed(seed)
+    generator = QwipoMockDataGenerator()
+    num_retailers = max(50, num_transactions // TRANSACTIONS_PER_RETAILER)
+    retailers = generator.generate_retailer_profiles(num_retailers)
+    transactions = generator.generate_purchase_transactions(retailers, num_transactions)
+    return retailers, transactions
+
+
+def build_engine(backend: str, retailers, transactions):
+    """Create an engine on the requested backend loaded with the dataset"""
+    graph = InMemoryRecommendationGraph.from_transactions(retailers, transactions)
+    if backend == "local":
+        return QwipoRecommendationEngine(local_graph=graph), graph
+
+    engine = QwipoRecommendationEngine()
+    engine.neo4j_graph.query("MATCH (n) DETACH DELETE n")
+    graph.write_to_neo4j(engine.neo4j_graph)
+    return engine, graph
+
+
+def benchmark_engine(engine, retailer_ids: List[str], iterations: int, warmup: int) -> Dict[str, Any]:
+    """Time every engine method over the sampled retailers"""
+    results = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for method_name, kwargs in BENCHMARK_METHODS.items():
+            method = getattr(engine, method_name)
+            for retailer_id in retailer_ids[:warmup]:
+                method(retailer_id, **kwargs)
+
+            latencies = []
+            wall_start = time.perf_counter()
+            for i in range(iterations):
+                retailer_id = retailer_ids[i % len(retailer_ids)]
+                start = time.perf_counter()
+                method(retailer_id, **kwargs)
+                latencies.append(time.perf_counter() - start)
+            results[method_name] = summarize_latencies(latencies, time.perf_counter() - wall_start)
+
+        # Response payload build: encode precomputed comprehensive results to JSON bytes
+        payloads = [
+            (retailer_id, engine.get_retailer_profile(retailer_id), engine.get_comprehensive_recommendations(retailer_id))
+            for retailer_id in retailer_ids
+        ]
+        latencies = []
+        wall_start = time.perf_counter()
+        for i in range(iterations):
+            retailer_id, profile, recommendations = payloads[i % len(payloads)]
+            start = time.perf_counter()
+            dumps(comprehensive_payload(retailer_id, profile, recommendations))
+            latencies.append(time.perf_counter() - start)
+        results["serialize_comprehensive_payload"] = summarize_latencies(latencies, time.perf_counter() - wall_start)
+    return results
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any], metric: str, threshold: float) -> List[str]:
+    """List regressions where the metric grew by more than threshold (fraction) over the baseline"""
+    regressions = []
+    for size, size_result in current["results"].items():
+        baseline_methods = baseline.get("results", {}).get(size, {}).get("methods", {})
+        for method_name, stats in size_result["methods"].items():
+            old = baseline_methods.get(method_name, {}).get(metric)
+            if not old:
+                continue
+            change = stats[metric] / old - 1.0
+            if change > threshold:
+                regressions.append(
+                    f"{size} txns / {method_name}: {metric} {old:.2f}ms -> {stats[metric]:.2f}ms (+{change:.0%})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Qwipo recommendation latency across dataset sizes")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated transaction counts to generate")
+    parser.add_argument("--backend", choices=["local", "neo4j"], default="local",
+                        help="In-process graph, or the Neo4j instance from .env (wiped and reloaded per size)")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed calls per method")
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed calls per method")
+    parser.add_argument("--sample-retailers", type=int, default=100, help="Retailers to rotate through")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Results file (default: benchmarks/recommendations_<timestamp>.json)")
+    parser.add_argument("--compare", help="Baseline results file to check for regressions")
+    parser.add_argument("--metric", default="p95_ms", choices=["p50_ms", "p95_ms", "p99_ms", "mean_ms"])
+    parser.add_argument("--threshold", type=float, default=0.20, help="Allowed growth before flagging (0.20 = 20%%)")
+    parser.add_argument("--yes-wipe-neo4j", action="store_true",
+                        help="Confirm that the neo4j backend may delete all data in the configured database")
+    args = parser.parse_args()
+
+    if args.backend == "neo4j" and not args.yes_wipe_neo4j:
+        print("❌ The neo4j backend deletes and reloads the configured database for every size.")
+        print("   Re-run with --yes-wipe-neo4j against a local/throwaway instance.")
+        sys.exit(1)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    print("⏱️  QWIPO RECOMMENDATION BENCHMARK")
+    print(f"Backend: {args.backend} | Sizes: {sizes} | Iterations: {args.iterations}")
+    print("=" * 60)
+
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "backend": args.backend,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "iterations": args.iterations,
+        "results": {},
+    }
+
+    for size in sizes:
+        print(f"\n🏭 Generating dataset with {size:,} transactions...")
+        start = time.perf_counter()
+        retailers, transactions = generate_dataset(size, args.seed)
+        generation_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            engine, graph = build_engine(args.backend, retailers, transactions)
+        load_seconds = time.perf_counter() - start
+        print(f"   {len(retailers):,} retailers, {len(transactions):,} transactions, "
+              f"{graph.edge_count:,} purchase edges (generated {generation_seconds:.1f}s, loaded {load_seconds:.1f}s)")
+
+        rng = random.Random(args.seed)
+        retailer_ids = [r["id"] for r in rng.sample(retailers, min(args.sample_retailers, len(retailers)))]
+        methods = benchmark_engine(engine, retailer_ids, args.iterations, args.warmup)
+
+        report["results"][str(size)] = {
+            "retailers": len(retailers),
+            "transactions": len(transactions),
+            "purchase_edges": graph.edge_count,
+            "generation_seconds": generation_seconds,
+            "load_seconds": load_seconds,
+            "methods": methods,
+        }
+
+        for method_name, stats in methods.items():
+            print(f"   {method_name:<42} p50 {stats['p50_ms']:8.2f}ms  p95 {stats['p95_ms']:8.2f}ms  "
+                  f"p99 {stats['p99_ms']:8.2f}ms  {stats['throughput_per_s']:8.1f}/s")
+
+    output_file = args.output or os.path.join(
+        "benchmarks", f"recommendations_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    with open(output_file, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to: {output_file}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.metric, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%} on {args.metric}:")
+            for line in regressions:
+                print(f"   - {line}")
+            sys.exit(1)
+        print(f"\n✅ No {args.metric} regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,14 @@ class IngestionConfig:
     NEO4J_URI: str = "neo4j+s://your-instance.databases.neo4j.io"
     NEO4J_USERNAME: str = "neo4j"
     NEO4J_PASSWORD: str = "your-password"
+    NEO4J_DATABASE: str = "neo4j"
+    
+    # Neo4j connection pools (reads and writes use separate pools)
+    NEO4J_READ_POOL_SIZE: int = 50
+    NEO4J_WRITE_POOL_SIZE: int = 20
+    NEO4J_ACQUISITION_TIMEOUT: float = 30.0  # seconds to wait for a free connection
+    NEO4J_MAX_CONNECTION_LIFETIME: float = 3600.0  # seconds before a connection is recycled
+    NEO4J_FETCH_SIZE: int = 1000  # records pulled per network round trip
     
     # OpenAI Configuration
     OPENAI_API_KEY: str = "your-openai-api-key"
@@ -26,6 +34,13 @@ class IngestionConfig:
             NEO4J_URI=os.getenv("NEO4J_URI", cls.NEO4J_URI),
             NEO4J_USERNAME=os.getenv("NEO4J_USERNAME", cls.NEO4J_USERNAME),
             NEO4J_PASSWORD=os.getenv("NEO4J_PASSWORD", cls.NEO4J_PASSWORD),
+            NEO4J_DATABASE=os.getenv("NEO4J_DATABASE", cls.NEO4J_DATABASE),
+            NEO4J_READ_POOL_SIZE=int(os.getenv("NEO4J_READ_POOL_SIZE", cls.NEO4J_READ_POOL_SIZE)),
+            NEO4J_WRITE_POOL_SIZE=int(os.getenv("NEO4J_WRITE_POOL_SIZE", cls.NEO4J_WRITE_POOL_SIZE)),
+            NEO4J_ACQUISITION_TIMEOUT=float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", cls.NEO4J_ACQUISITION_TIMEOUT)),
+            NEO4J_MAX_CONNECTION_LIFETIME=float(
+                os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", cls.NEO4J_MAX_CONNECTION_LIFETIME)),
+            NEO4J_FETCH_SIZE=int(os.getenv("NEO4J_FETCH_SIZE", cls.NEO4J_FETCH_SIZE)),
             OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", cls.OPENAI_API_KEY),
             RETAILERS_FILE=os.getenv("RETAILERS_FILE", cls.RETAILERS_FILE),
             TRANSACTIONS_FILE=os.getenv("TRANSACTIONS_FILE", cls.TRANSACTIONS_FILE)
@@ -9,13 +9,14 @@ Focuses on creating realistic business patterns and relationships.
 import sys
 import os
 import json
-from datetime import datetime
+from itertools import islice
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 from mock_data_generator import QwipoMockDataGenerator
 from schema import QWIPO_SCHEMA
+from report_engine import build_summary_report
 
 def main():
     print("=" * 60)
@@ -79,65 +80,13 @@ def main():
     show_sample_data(dataset)
 
 def generate_summary_report(dataset):
-    """Generate a detailed summary report of the mock data"""
-    
-    summary = {
-        "generation_date": datetime.now().isoformat(),
-        "total_retailers": len(dataset['retailers']),
-        "total_transactions": len(dataset['transactions']),
-        "total_brands": len(dataset['product_catalog']),
-        "retailer_distribution": {},
-        "transaction_patterns": {},
-        "top_products": [],
-        "regional_distribution": {},
-        "seasonal_insights": {}
-    }
-    
-    # Analyze retailer distribution
-    retailer_sizes = {}
-    retailer_segments = {}
-    retailer_locations = {}
-    
-    for retailer in dataset['retailers']:
-        size = retailer['size']
-        segment = retailer['customer_segment']
-        location = retailer['location']
-        
-        retailer_sizes[size] = retailer_sizes.get(size, 0) + 1
-        retailer_segments[segment] = retailer_segments.get(segment, 0) + 1
-        retailer_locations[location] = retailer_locations.get(location, 0) + 1
-    
-    summary['retailer_distribution'] = {
-        'by_size': retailer_sizes,
-        'by_segment': retailer_segments,
-        'by_location': retailer_locations
-    }
-    
-    # Analyze transaction patterns
-    product_sales = {}
-    brand_sales = {}
-    monthly_sales = {}
-    
-    for transaction in dataset['transactions']:
-        product = transaction['product_name']
-        brand = transaction['brand']
-        month = transaction['purchase_date'][:7]  # YYYY-MM
-        amount = transaction['total_amount']
-        
-        product_sales[product] = product_sales.get(product, 0) + amount
-        brand_sales[brand] = brand_sales.get(brand, 0) + amount
-        monthly_sales[month] = monthly_sales.get(month, 0) + amount
-    
-    # Top 10 products by sales
-    top_products = sorted(product_sales.items(), key=lambda x: x[1], reverse=True)[:10]
-    summary['top_products'] = [{'product': p, 'total_sales': s} for p, s in top_products]
-    
-    # Top brands by sales
-    top_brands = sorted(brand_sales.items(), key=lambda x: x[1], reverse=True)[:5]
-    summary['top_brands'] = [{'brand': b, 'total_sales': s} for b, s in top_brands]
-    
-    # Monthly sales trend
-    summary['monthly_sales_trend'] = dict(sorted(monthly_sales.items()))
+    """Generate a detailed summary report of the mock data in a single pass"""
+    
+    summary = build_summary_report(
+        dataset['transactions'],
+        retailers=dataset['retailers'],
+        total_brands=len(dataset['product_catalog'])
+    )
     
     # Save summary report
     with open('mock_data/summary_report.json', 'w') as f:
@@ -148,7 +97,7 @@ def generate_summary_report(dataset):
 def generate_sample_llm_text(dataset):
     """Generate sample text data that would be fed to LLM for entity extraction"""
     
-    sample_transactions = dataset['transactions'][:20]  # First 20 transactions
+    sample_transactions = islice(dataset['transactions'], 20)  # First 20 transactions, works on streams too
     
     llm_text_samples = []
     
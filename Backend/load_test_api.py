@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Qwipo Recommendation API Load Test
+Replays a Zipf-distributed request mix against the FastAPI app at increasing
+concurrency levels and reports latency histograms, error rates and throughput
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+# Keep per-request engine logs out of timing runs unless asked for
+os.environ.setdefault("QWIPO_LOG_LEVEL", "WARNING")
+
+# Upper bounds (ms) of the latency histogram buckets
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+DEFAULT_MIX = "retailers=1,profile=3,recommendations=4,recommendations_type=2"
+RECOMMENDATION_TYPES = ["collaborative", "category_expansion", "brand_loyalty"]
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse 'endpoint=weight,...' into a weight mapping"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def zipf_weights(n: int, s: float) -> List[float]:
+    """Zipf weights 1/rank^s for ranks 1..n"""
+    return [1.0 / (rank ** s) for rank in range(1, n + 1)]
+
+
+def build_request_plan(retailer_ids: List[str], total: int, mix: Dict[str, float],
+                       zipf_s: float, seed: int) -> List[Tuple[str, str]]:
+    """Generate (endpoint, path) pairs with Zipf-popular retailers and a weighted endpoint mix"""
+    rng = random.Random(seed)
+    ranked = list(retailer_ids)
+    rng.shuffle(ranked)  # Popularity rank should not follow id order
+    retailer_weights = zipf_weights(len(ranked), zipf_s)
+    endpoints = list(mix)
+    endpoint_weights = [mix[e] for e in endpoints]
+
+    plan = []
+    for endpoint in rng.choices(endpoints, weights=endpoint_weights, k=total):
+        retailer_id = rng.choices(ranked, weights=retailer_weights, k=1)[0]
+        if endpoint == "retailers":
+            path = f"/retailers?limit={rng.choice([20, 50, 100])}"
+        elif endpoint == "profile":
+            path = f"/retailers/{retailer_id}/profile"
+        elif endpoint == "recommendations":
+            path = f"/retailers/{retailer_id}/recommendations?limit_per_type=5"
+        elif endpoint == "recommendations_type":
+            path = f"/retailers/{retailer_id}/recommendations/{rng.choice(RECOMMENDATION_TYPES)}?limit=5"
+        else:
+            raise ValueError(f"Unknown endpoint in mix: {endpoint}")
+        plan.append((endpoint, path))
+    return plan
+
+
+def latency_histogram(latencies_ms: List[float]) -> Dict[str, int]:
+    """Non-cumulative bucket counts keyed by upper bound"""
+    counts = Counter()
+    for value in latencies_ms:
+        for bound in HISTOGRAM_BUCKETS_MS:
+            if value <= bound:
+                counts[f"le_{bound}ms"] += 1
+                break
+        else:
+            counts["gt_5000ms"] += 1
+    return {label: counts.get(label, 0) for label in [f"le_{b}ms" for b in HISTOGRAM_BUCKETS_MS] + ["gt_5000ms"]}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples: List[Tuple[str, float, int]], wall_seconds: float) -> Dict[str, Any]:
+    """Aggregate (endpoint, latency_ms, status) samples into a level report"""
+    latencies = sorted(s[1] for s in samples)
+    errors = sum(1 for s in samples if s[2] >= 500 or s[2] == 0)
+    by_endpoint = {}
+    for endpoint in sorted({s[0] for s in samples}):
+        endpoint_latencies = sorted(s[1] for s in samples if s[0] == endpoint)
+        by_endpoint[endpoint] = {
+            "requests": len(endpoint_latencies),
+            "p50_ms": percentile(endpoint_latencies, 50),
+            "p95_ms": percentile(endpoint_latencies, 95),
+            "p99_ms": percentile(endpoint_latencies, 99),
+        }
+    return {
+        "requests": len(samples),
+        "throughput_rps": len(samples) / wall_seconds if wall_seconds > 0 else 0.0,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "status_codes": dict(Counter(str(s[2]) for s in samples)),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1] if latencies else 0.0,
+        "histogram": latency_histogram(latencies),
+        "by_endpoint": by_endpoint,
+    }
+
+
+async def run_level(client: httpx.AsyncClient, plan: List[Tuple[str, str]], concurrency: int) -> Dict[str, Any]:
+    """Replay the plan with a fixed number of concurrent workers"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in plan:
+        queue.put_nowait(item)
+    samples: List[Tuple[str, float, int]] = []
+
+    async def worker():
+        while True:
+            try:
+                endpoint, path = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            samples.append((endpoint, (time.perf_counter() - start) * 1000, status))
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(samples, time.perf_counter() - wall_start)
+
+
+def create_inprocess_client(retailers_file: str, transactions_file: str) -> Tuple[httpx.AsyncClient, List[str]]:
+    """ASGI client for the app with an in-process graph engine in place of Neo4j"""
+    import recommendation_api
+    from in_memory_graph import InMemoryRecommendationGraph
+    from recommendation_engine import QwipoRecommendationEngine
+
+    graph = InMemoryRecommendationGraph.from_files(retailers_file, transactions_file)
+    recommendation_api.recommendation_engine = QwipoRecommendationEngine(local_graph=graph)
+    transport = httpx.ASGITransport(app=recommendation_api.app)
+    client = httpx.AsyncClient(transport=transport, base_url="http://loadtest")
+    return client, [r["id"] for r in graph.retailers]
+
+
+async def fetch_retailer_ids(client: httpx.AsyncClient) -> List[str]:
+    """Discover retailer ids from a running server"""
+    response = await client.get("/retailers", params={"limit": 100})
+    response.raise_for_status()
+    return [r["retailer_id"] for r in response.json()["retailers"]]
+
+
+async def run(args) -> Dict[str, Any]:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        retailer_ids = await fetch_retailer_ids(client)
+    else:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            client, retailer_ids = create_inprocess_client(args.retailers_file, args.transactions_file)
+
+    mix = parse_mix(args.mix)
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "target": args.url or "in-process (ASGI, in-memory graph engine)",
+        "mix": mix,
+        "zipf_s": args.zipf_s,
+        "levels": {},
+    }
+
+    async with client:
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            plan = build_request_plan(retailer_ids, args.requests, mix, args.zipf_s, args.seed)
+            # Engine progress output would otherwise dominate the in-process measurement
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                result = await run_level(client, plan, concurrency)
+            report["levels"][str(concurrency)] = result
+            print(f"   c={concurrency:<4} {result['throughput_rps']:9.1f} req/s  "
+                  f"p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  "
+                  f"p99 {result['p99_ms']:8.2f}ms  errors {result['error_rate']:.2%}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Qwipo recommendation API")
+    parser.add_argument("--url", help="Base URL of a running server (default: in-process ASGI app)")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per concurrency level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Endpoint weights, e.g. 'profile=3,recommendations=4'")
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="Zipf exponent for retailer popularity")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout for --url mode")
+    parser.add_argument("--retailers-file", default=os.getenv("RETAILERS_FILE", "mock_data/retailers.json"))
+    parser.add_argument("--transactions-file", default=os.getenv("TRANSACTIONS_FILE", "mock_data/transactions.json"))
+    parser.add_argument("--output", help="Results file (default: benchmarks/load_test_<timestamp>.json)")
+    args = parser.parse_args()
+
+    print("🔥 QWIPO API LOAD TEST")
+    print(f"Target: {args.url or 'in-process ASGI app'} | Requests per level: {args.requests}")
+    print("=" * 60)
+
+    report = asyncio.run(run(args))
+
+    output_file = args.output or os.path.join(
+        "benchmarks", f"load_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    with open(output_file, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
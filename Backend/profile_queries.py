@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Qwipo Query Plan Profiler
+Captures PROFILE/EXPLAIN plans for every recommendation engine query, stores
+them per graph version and flags plan changes or db-hit growth
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+from dotenv import load_dotenv
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from recommendation_engine import QwipoRecommendationEngine, ENGINE_QUERIES, RECENCY_VARIANTS, WRITE_QUERIES, Recency
+from query_profiler import QueryPlanProfiler, compare_captures, PLAN_STORE_FILE
+
+
+# Recency the windowed and recency-weighted variants are profiled with
+PROFILE_RECENCY = Recency(window_days=30, half_life_days=14)
+
+
+def build_query_set(retailer_id: str, limit: int, as_of_day: int):
+    """Engine queries paired with representative parameters"""
+    recommender_params = {"retailer_id": retailer_id, "limit": limit}
+    recency_params = {**recommender_params, **PROFILE_RECENCY.query_params(as_of_day)}
+    params = {
+        "list_retailers": {"limit": 20},
+        "top_retailers": {"limit": limit},
+        "list_products": {},
+        "peer_group_popularity": {},
+        "latest_purchase_day": {},
+        "purchased_products": {"retailer_id": retailer_id},
+        "retailer_peer_groups": {"retailer_ids": [retailer_id]},
+        "retailer_profile": {"retailer_id": retailer_id},
+        # Only planned (EXPLAIN), never executed
+        "purchase_events": {"rows": [{"retailer_id": retailer_id, "product_name": "", "day": as_of_day}]},
+    }
+    variant_suffixes = tuple(f"_{variant}" for variant in RECENCY_VARIANTS)
+    return {
+        name: (cypher, params.get(name, recency_params if name.endswith(variant_suffixes) else recommender_params))
+        for name, cypher in ENGINE_QUERIES.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture and compare Cypher plans for the recommendation engine")
+    parser.add_argument("--mode", choices=["PROFILE", "EXPLAIN"], default="PROFILE",
+                        help="PROFILE executes the queries and records db hits; EXPLAIN only plans them")
+    parser.add_argument("--retailer-id", help="Retailer to profile with (default: first retailer by name)")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--store", default=PLAN_STORE_FILE, help="Plan history file")
+    parser.add_argument("--graph-version", help="Override the fingerprint-derived graph version label")
+    parser.add_argument("--baseline-version", help="Version to compare against (default: previous capture)")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed db-hit growth (0.25 = 25%%)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 when anything is flagged")
+    args = parser.parse_args()
+
+    load_dotenv(override=True)
+
+    print("🔬 QWIPO QUERY PLAN PROFILER")
+    print("=" * 60)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        engine = QwipoRecommendationEngine()
+    profiler = QueryPlanProfiler(engine.pool.driver("read"), database=engine.pool.database, store_path=args.store)
+
+    retailer_id = args.retailer_id
+    if not retailer_id:
+        retailers = engine.list_retailers(limit=1)
+        if not retailers:
+            print("❌ No retailers found in the knowledge graph.")
+            sys.exit(1)
+        retailer_id = retailers[0]["retailer_id"]
+
+    fingerprint = profiler.graph_fingerprint()
+    version = args.graph_version or profiler.graph_version(fingerprint)
+    print(f"📌 Graph version: {version}  ({sum(fingerprint['labels'].values())} nodes, "
+          f"{sum(fingerprint['relationships'].values())} relationships, {len(fingerprint['indexes'])} indexes)")
+    print(f"🏢 Profiling with retailer: {retailer_id} ({args.mode})")
+
+    query_set = build_query_set(retailer_id, args.limit, engine.latest_purchase_day())
+    captures = profiler.capture(query_set, mode=args.mode, explain_only=WRITE_QUERIES)
+
+    print(f"\n{'query':<32} {'db hits':>10} {'est rows':>10} {'rows':>8}  index / scan operators")
+    for name, capture in captures.items():
+        estimated = capture["estimated_rows"]
+        print(f"{name:<32} {capture['total_db_hits']:>10} "
+              f"{(f'{estimated:.0f}' if estimated is not None else '-'):>10} {str(capture['rows'] or '-'):>8}  "
+              f"{', '.join(capture['index_operators']) or 'no index'} / {', '.join(capture['scan_operators']) or 'no scans'}")
+
+    history = profiler.load_history()
+    baseline_version = args.baseline_version or profiler.previous_version(history, version)
+    history = profiler.save(version, fingerprint, captures)
+    print(f"\n💾 Plans stored in {args.store} under version {version}")
+
+    if not baseline_version or baseline_version not in history["versions"]:
+        print("ℹ️ No baseline version to compare against yet")
+        return
+
+    flags = compare_captures(captures, history["versions"][baseline_version]["queries"], args.threshold)
+    if not flags:
+        print(f"✅ No plan changes or db-hit growth beyond {args.threshold:.0%} vs {baseline_version}")
+        return
+
+    print(f"\n⚠️ {len(flags)} change(s) vs {baseline_version}:")
+    for flag in flags:
+        print(f"   - {flag}")
+    if args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Qwipo API Startup Profiler
+Measures cold start of the recommendation API in fresh interpreters: module
+import time (python -X importtime), engine start-up and time to the first
+/health response, and checks that serving does not load the LLM stack
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Packages only the ingestion pipeline needs; serving processes must not import them
+LLM_STACK = ("langchain", "langchain_core", "langchain_community", "langchain_openai",
+             "langchain_experimental", "langchain_neo4j", "openai", "tiktoken")
+TRACKED_PACKAGES = LLM_STACK + ("pandas", "neo4j", "numpy", "fastapi", "pydantic")
+
+# Runs in a fresh interpreter; prints one JSON line with its phase timings
+PROBE = """
+import time
+t0 = time.perf_counter()
+import asyncio, json, sys
+sys.path.append("src")
+import recommendation_api as api
+t1 = time.perf_counter()
+asyncio.run(api.startup_event())
+t2 = time.perf_counter()
+health = asyncio.run(api.health_check())
+t3 = time.perf_counter()
+tracked = {tracked!r}
+print(json.dumps({{
+    "import_s": t1 - t0,
+    "engine_startup_s": t2 - t1,
+    "first_response_s": t3 - t2,
+    "ready_s": t3 - t0,
+    "status": health.status,
+    "loaded": sorted(name for name in tracked if name in sys.modules),
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Rows of `-X importtime` output as {module, depth, self_us, cumulative_us}"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return rows
+
+
+def importtime_report(env: Dict[str, str], top: int) -> Dict[str, Any]:
+    """Import recommendation_api once under -X importtime and rank top-level imports"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import sys; sys.path.append('src'); import recommendation_api"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = parse_importtime(completed.stderr)
+    api_index = max(i for i, row in enumerate(rows) if row["module"] == "recommendation_api")
+    # Output is post-order: the API's direct imports are the depth-1 rows since the previous top-level row
+    children = []
+    for row in reversed(rows[:api_index]):
+        if row["depth"] == 0:
+            break
+        if row["depth"] == 1:
+            children.append(row)
+    top_level = sorted(children, key=lambda row: row["cumulative_us"], reverse=True)
+    api_row = rows[api_index]
+    return {
+        "api_import_ms": api_row["cumulative_us"] / 1000,
+        "modules_imported": len(rows),
+        "top_imports": [
+            {"module": row["module"], "cumulative_ms": row["cumulative_us"] / 1000} for row in top_level[:top]
+        ],
+    }
+
+
+def measure_cold_start(env: Dict[str, str], runs: int) -> Dict[str, Any]:
+    """Spawn fresh interpreters and time each phase up to the first health response"""
+    probe = PROBE.format(tracked=TRACKED_PACKAGES)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", probe], cwd=BACKEND_DIR, env=env,
+                                   capture_output=True, text=True, check=True)
+        process_s = time.perf_counter() - start
+        sample = json.loads(completed.stdout.strip().splitlines()[-1])
+        sample["process_s"] = process_s
+        samples.append(sample)
+
+    phases = ["import_s", "engine_startup_s", "first_response_s", "ready_s", "process_s"]
+    return {
+        "runs": runs,
+        "median_ms": {phase[:-2] + "_ms": statistics.median(s[phase] for s in samples) * 1000 for phase in phases},
+        "max_ms": {phase[:-2] + "_ms": max(s[phase] for s in samples) * 1000 for phase in phases},
+        "status": samples[-1]["status"],
+        "loaded_packages": samples[-1]["loaded"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile Qwipo API import time and cold start")
+    parser.add_argument("--backend", choices=["local", "snapshot", "neo4j"], default="local",
+                        help="Engine backend used for the start-up measurement")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=15, help="Slowest top-level imports to list")
+    parser.add_argument("--output", help="Report file (default: benchmarks/startup_<timestamp>.json)")
+    parser.add_argument("--compare", help="Baseline report to check the median time-to-ready against")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Allowed growth before flagging (0.20 = 20%%)")
+    parser.add_argument("--fail-on-llm-stack", action="store_true",
+                        help="Exit 1 if serving imports any LLM/langchain package")
+    args = parser.parse_args()
+
+    env = dict(os.environ, QWIPO_ENGINE_BACKEND=args.backend, QWIPO_LOG_LEVEL="WARNING")
+
+    print("🧊 QWIPO API STARTUP PROFILE")
+    print(f"Backend: {args.backend} | Runs: {args.runs}")
+    print("=" * 60)
+
+    imports = importtime_report(env, args.top)
+    print(f"\n📦 recommendation_api import: {imports['api_import_ms']:.0f}ms "
+          f"({imports['modules_imported']} modules)")
+    for row in imports["top_imports"]:
+        print(f"   {row['module']:<40} {row['cumulative_ms']:8.1f}ms")
+
+    cold_start = measure_cold_start(env, args.runs)
+    median = cold_start["median_ms"]
+    print(f"\n🚀 Cold start (median of {args.runs}):")
+    print(f"   imports {median['import_ms']:.0f}ms + engine {median['engine_startup_ms']:.0f}ms "
+          f"+ first response {median['first_response_ms']:.0f}ms = ready in {median['ready_ms']:.0f}ms "
+          f"(process {median['process_ms']:.0f}ms incl. interpreter)")
+    print(f"   Health status: {cold_start['status']}")
+    print(f"   Tracked packages loaded: {', '.join(cold_start['loaded_packages']) or 'none'}")
+
+    llm_loaded = [name for name in cold_start["loaded_packages"] if name in LLM_STACK]
+    if llm_loaded:
+        print(f"⚠️ Serving imported the LLM stack: {', '.join(llm_loaded)}")
+    else:
+        print("✅ LLM stack not loaded by the API")
+
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "backend": args.backend,
+        "python": sys.version.split()[0],
+        "imports": imports,
+        "cold_start": cold_start,
+    }
+    output_file = args.output or os.path.join(
+        "benchmarks", f"startup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    with open(output_file, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Report written to: {output_file}")
+
+    failed = bool(llm_loaded and args.fail_on_llm_stack)
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        old = baseline["cold_start"]["median_ms"]["ready_ms"]
+        change = median["ready_ms"] / old - 1.0
+        if change > args.threshold:
+            print(f"❌ Time to ready regressed: {old:.0f}ms -> {median['ready_ms']:.0f}ms (+{change:.0%})")
+            failed = True
+        else:
+            print(f"✅ Time to ready {median['ready_ms']:.0f}ms vs baseline {old:.0f}ms ({change:+.0%})")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
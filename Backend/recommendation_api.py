@@ -6,18 +6,38 @@ Provides RESTful endpoints for the Neo4j-powered recommendation engine
 
 import sys
 import os
-from typing import List, Dict, Any, Optional
+import time
+import json
+import base64
+import hmac
+import asyncio
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from functools import partial
 from datetime import datetime
 from pydantic import BaseModel, Field
-from fastapi import FastAPI, HTTPException, Query, Path
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Query, Path, Header, Body
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
-import uvicorn
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from recommendation_engine import QwipoRecommendationEngine, Recommendation
+from recommendation_engine import (QwipoRecommendationEngine, Recency, Recommendation, create_recommendation_engine,
+                                   submit_recommender)
+from metrics import REGISTRY, ENGINE_STARTUP_SECONDS, PrometheusMiddleware
+from admission import AdmissionController, AdmissionMiddleware
+from neo4j_pool import close_neo4j_pools
+from serialization import FastJSONResponse, comprehensive_payload, dumps
+from search_index import RetailerSearchIndex
+from catalog_index import SORT_ORDERS, ProductCatalogIndex, build_catalog_index, merge_product_rows
+from cache_warmup import HotRetailers, warm_cache, warmup_candidates
+from purchase_events import PurchaseEventBatcher, QueueFull, validate_purchase_events
+from structured_logging import get_logger
+from tracing import TracingMiddleware, span
+from graph_snapshot import DEFAULT_SNAPSHOT_FILE
+from worker_sync import GENERATION_FILE, ReloadWatcher, bump_generation, file_signature
 
 # Load environment variables
 load_dotenv(override=True)
@@ -30,9 +50,62 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc"
 )
+# Routes that run graph queries per request go through admission control; everything else
+# (health, readiness, metrics, index-backed listings) bypasses it and is never queued
+HEAVY_ROUTE = re.compile(r"^/retailers/[^/]+/(profile|recommendations)")
+admission = AdmissionController.from_env()
+
+# Innermost first: shed requests are still timed by the Prometheus and tracing middleware
+app.add_middleware(AdmissionMiddleware, controller=admission, is_heavy=lambda path: bool(HEAVY_ROUTE.match(path)))
+app.add_middleware(PrometheusMiddleware)
+app.add_middleware(TracingMiddleware)
+
+logger = get_logger("api")
 
 # Global recommendation engine instance
 recommendation_engine = None
+engine_startup_seconds = None
+
+# In-memory indexes derived from the graph; rebuilt by POST /admin/reload after ingestion
+search_index: Optional[RetailerSearchIndex] = None
+catalog_index: Optional[ProductCatalogIndex] = None
+
+# Overall time budget of a recommendation request; recommenders finishing later are left out
+REQUEST_DEADLINE_SECONDS = float(os.getenv("QWIPO_REQUEST_DEADLINE_SECONDS", "3.0"))
+
+def remaining_seconds(deadline: float) -> float:
+    return max(deadline - time.perf_counter(), 0.0)
+
+class RecommenderBusy(Exception):
+    """No recommender thread freed up before the request deadline"""
+
+async def run_recommender(task: Callable[[], Any], deadline: float) -> Any:
+    """Result of task run on a free recommender thread; RecommenderBusy if none frees up by the deadline"""
+    future = await run_in_threadpool(submit_recommender, task, remaining_seconds(deadline))
+    if future is None:
+        raise RecommenderBusy()
+    return await asyncio.wrap_future(future)
+
+# Recency query parameters shared by the recommendation endpoints (omitted: full purchase history, unweighted)
+WINDOW_DAYS_DESCRIPTION = "Only count purchases from the last N days (counted back from the newest purchase)"
+HALF_LIFE_DESCRIPTION = "Rank by recency-weighted buyers, each purchase counting half as much every N days"
+
+def recency_from(window_days: Optional[int], half_life_days: Optional[float]) -> Optional[Recency]:
+    if window_days is None and half_life_days is None:
+        return None
+    return Recency(window_days, half_life_days)
+
+# Multi-worker serving: memory-mapped indexes and reload signals live in QWIPO_SHARED_INDEX_DIR
+reload_watcher: Optional[ReloadWatcher] = None
+reload_lock = asyncio.Lock()
+
+# Result cache warm-up after startup and reloads; /ready answers 503 until the first one ends
+hot_retailers = HotRetailers()
+warmup_status: Dict[str, Any] = {"ready": False, "status": "pending"}
+
+# Purchase events are applied in batches by a background task; larger requests get 413
+purchase_events: Optional[PurchaseEventBatcher] = None
+MAX_EVENTS_PER_REQUEST = int(os.getenv("QWIPO_MAX_EVENTS_PER_REQUEST", "1000"))
 
 # Pydantic models for API requests/responses
 class RecommendationResponse(BaseModel):
@@ -53,6 +126,7 @@ class ComprehensiveRecommendationsResponse(BaseModel):
     retailer_id: str
     retailer_profile: Dict[str, Any]
     recommendations: Dict[str, List[RecommendationResponse]]
+    recommendation_status: Dict[str, str] = Field(default_factory=dict, description="Per type: ok, timeout or error")
     generated_at: str
     total_recommendations: int
 
@@ -63,11 +137,63 @@ class RetailerInfo(BaseModel):
     location: str
     business_type: str
     size: str
+    segment: Optional[str] = None
 
 class RetailersListResponse(BaseModel):
     """Response model for retailers list"""
     retailers: List[RetailerInfo]
     total_count: int
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to fetch the next page; null on the last page")
+
+class RetailerSearchResult(RetailerInfo):
+    """Retailer search hit with its ranking score"""
+    score: float
+    matched_terms: int
+
+class RetailerSearchResponse(BaseModel):
+    """Response model for retailer search"""
+    query: str
+    results: List[RetailerSearchResult]
+    total_count: int
+    took_ms: float
+
+class ProductInfo(BaseModel):
+    """Response model for a catalog product"""
+    product_name: str
+    brand: Optional[str] = None
+    category: Optional[str] = None
+    sub_category: Optional[str] = None
+    supplier: Optional[str] = None
+    price: Optional[float] = None
+    unit: Optional[str] = None
+    margin: Optional[float] = None
+    popularity: Optional[float] = None
+    retailer_count: Optional[int] = None
+
+class SimilarProduct(ProductInfo):
+    """Catalog product with its content similarity to the requested product"""
+    similarity: float
+
+class SimilarProductsResponse(BaseModel):
+    """Response model for similar products"""
+    product_name: str
+    similar_products: List[SimilarProduct]
+    took_ms: float
+
+class PriceRange(BaseModel):
+    """Lowest and highest price among the matching products"""
+    min: float
+    max: float
+
+class ProductsListResponse(BaseModel):
+    """Response model for the product catalog"""
+    products: List[ProductInfo]
+    total_count: int = Field(..., description="Products matching the filters across all pages")
+    facets: Dict[str, Dict[str, int]] = Field(
+        ..., description="Per facet value, the matches if that value were selected (other facets' filters applied)"
+    )
+    price_range: Optional[PriceRange] = Field(None, description="Price bounds of the matches, ignoring the price filter")
+    took_ms: float
 
 class HealthResponse(BaseModel):
     """Response model for health check"""
@@ -75,18 +201,177 @@ class HealthResponse(BaseModel):
     service: str
     neo4j_connected: bool
     timestamp: str
+    backend: Optional[str] = None
+    startup_seconds: Optional[float] = None
 
 # Startup event
 @app.on_event("startup")
 async def startup_event():
     """Initialize the recommendation engine on startup"""
-    global recommendation_engine
+    global recommendation_engine, engine_startup_seconds
     try:
-        recommendation_engine = QwipoRecommendationEngine()
-        print("✅ Recommendation engine initialized successfully")
-    except Exception as e:
-        print(f"❌ Failed to initialize recommendation engine: {e}")
+        start = time.perf_counter()
+        recommendation_engine = create_recommendation_engine()
+        engine_startup_seconds = time.perf_counter() - start
+        ENGINE_STARTUP_SECONDS.set(engine_startup_seconds, recommendation_engine.backend)
+        logger.info(
+            "Recommendation engine initialized",
+            extra={"backend": recommendation_engine.backend, "startup_s": round(engine_startup_seconds, 3)}
+        )
+    except Exception:
+        logger.exception("Failed to initialize recommendation engine")
         raise
+    
+    try:
+        build_indexes()
+    except Exception:
+        # Indexes are optional: keep serving recommendations and report 503 on /retailers/search and /products
+        logger.exception("Failed to build in-memory indexes")
+    
+    start_warmup()
+    start_reload_watcher()
+    start_purchase_events()
+
+def start_warmup():
+    """Warm the result cache in the background, replacing a warm-up still running for older data"""
+    previous = getattr(app.state, "warmup_task", None)
+    if previous is not None and not previous.done():
+        previous.cancel()
+    app.state.warmup_task = asyncio.create_task(run_warmup())
+
+async def run_warmup():
+    """Precompute results for the hottest retailers with bounded concurrency, up to a deadline"""
+    count = int(os.getenv("QWIPO_WARMUP_RETAILERS", "100"))
+    if count <= 0 or recommendation_engine.result_cache is None:
+        warmup_status.update(ready=True, status="disabled")
+        return
+    warmup_status["status"] = "warming"
+    try:
+        retailer_ids = await run_in_threadpool(warmup_candidates, recommendation_engine, hot_retailers, count)
+        stats = await warm_cache(
+            recommendation_engine, retailer_ids,
+            concurrency=int(os.getenv("QWIPO_WARMUP_CONCURRENCY", "8")),
+            deadline_seconds=float(os.getenv("QWIPO_WARMUP_DEADLINE_SECONDS", "30"))
+        )
+        warmup_status.update(status="warm", **stats)
+        logger.info("Result cache warmed", extra=stats)
+    except Exception:
+        logger.exception("Cache warm-up failed")
+        warmup_status["status"] = "failed"
+    finally:
+        # A failed or timed-out warm-up only costs latency, so the worker is ready either way
+        warmup_status["ready"] = True
+
+def watched_files() -> List[str]:
+    """Files whose change means this worker must reload: the reload generation and the graph snapshot"""
+    paths = []
+    shared_dir = os.getenv("QWIPO_SHARED_INDEX_DIR")
+    if shared_dir:
+        paths.append(os.path.join(shared_dir, GENERATION_FILE))
+    if os.getenv("QWIPO_ENGINE_BACKEND", "neo4j").lower() == "snapshot":
+        paths.append(os.getenv("QWIPO_SNAPSHOT_FILE", DEFAULT_SNAPSHOT_FILE))
+    return paths
+
+def start_reload_watcher():
+    """Poll the watched files in the background so every worker follows reloads and new snapshots"""
+    global reload_watcher
+    paths = watched_files()
+    if not paths:
+        return
+    reload_watcher = ReloadWatcher(paths)
+    interval = float(os.getenv("QWIPO_RELOAD_POLL_SECONDS", "5"))
+    
+    async def watch():
+        while True:
+            await asyncio.sleep(interval)
+            if not reload_watcher.changed():
+                continue
+            async with reload_lock:
+                signatures = reload_watcher.current()
+                try:
+                    await run_in_threadpool(reload_graph)
+                    logger.info("Reloaded after a change in shared state", extra={"pid": os.getpid()})
+                    start_warmup()
+                except Exception:
+                    logger.exception("Background reload failed")
+                reload_watcher.accept(signatures)
+    
+    app.state.reload_watch_task = asyncio.create_task(watch())
+
+def build_indexes():
+    """Rebuild the in-memory indexes from the current graph and swap them in"""
+    global search_index, catalog_index
+    start = time.perf_counter()
+    index = RetailerSearchIndex(recommendation_engine.iter_retailers())
+    products = recommendation_engine.list_products()
+    catalog = build_catalog_index(products, os.getenv("PRODUCT_CATALOG_FILE", "mock_data/product_catalog.json"))
+    search_index, catalog_index = index, catalog
+    cold_start = recommendation_engine.build_cold_start_tables(products)
+    # Vectors cover the whole catalog, so never-purchased products can be recommended too
+    recommendation_engine.build_product_vectors(catalog.products, os.getenv("QWIPO_SHARED_INDEX_DIR"))
+    # Cached results were computed from the previous graph and tables
+    recommendation_engine.clear_cache()
+    logger.info(
+        "In-memory indexes built",
+        extra={"retailers": len(index), "products": len(catalog), "peer_groups": len(cold_start),
+               "build_s": round(time.perf_counter() - start, 3)}
+    )
+
+def reload_graph():
+    """Reload the local graph from its data files (neo4j reads live data), then rebuild indexes"""
+    global recommendation_engine
+    if recommendation_engine.backend == "local":
+        recommendation_engine = create_recommendation_engine()
+    build_indexes()
+
+def start_purchase_events():
+    """Start the background task applying queued purchase events"""
+    global purchase_events
+    purchase_events = PurchaseEventBatcher.from_env(apply_purchase_events)
+    app.state.purchase_events_task = asyncio.create_task(purchase_events.run())
+
+async def apply_purchase_events(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Apply a batch of purchase events; serialized with reloads, which replace the engine"""
+    async with reload_lock:
+        return await run_in_threadpool(record_purchases, events)
+
+def record_purchases(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Update the graph and its derived tables, then the catalog index and product vectors"""
+    global catalog_index
+    stats = recommendation_engine.record_purchases(events)
+    catalog = catalog_index
+    if catalog is not None:
+        catalog.add_buyers(stats["new_buyers"])
+        if stats["new_products"]:
+            catalog = ProductCatalogIndex(merge_product_rows(catalog.products, stats["new_products"]))
+            catalog_index = catalog
+            recommendation_engine.build_product_vectors(catalog.products, os.getenv("QWIPO_SHARED_INDEX_DIR"))
+    return stats
+
+def require_admin_token(x_admin_token: Optional[str]):
+    """403 unless the request carries QWIPO_ADMIN_TOKEN; with no token configured the write and admin
+    endpoints are closed (503) unless QWIPO_ALLOW_UNAUTHENTICATED_WRITES opts out for local use"""
+    admin_token = os.getenv("QWIPO_ADMIN_TOKEN")
+    if not admin_token:
+        if os.getenv("QWIPO_ALLOW_UNAUTHENTICATED_WRITES", "false").lower() in ("1", "true", "yes"):
+            return
+        raise HTTPException(status_code=503, detail="QWIPO_ADMIN_TOKEN is not configured")
+    if not hmac.compare_digest(x_admin_token or "", admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Apply queued purchase events, stop background tasks and release pooled Neo4j connections"""
+    if purchase_events is not None:
+        try:
+            await purchase_events.drain()
+        except Exception:
+            logger.exception("Failed to apply queued purchase events")
+    for name in ("reload_watch_task", "warmup_task", "purchase_events_task"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    close_neo4j_pools()
 
 # Health check endpoint
 @app.get("/health", response_model=HealthResponse, tags=["Health"])
@@ -94,9 +379,8 @@ async def health_check():
     """Check the health of the recommendation service"""
     neo4j_connected = True
     try:
-        # Test Neo4j connection with a simple query
-        result = recommendation_engine.neo4j_graph.query("MATCH (n) RETURN count(n) as total LIMIT 1")
-        neo4j_connected = len(result) > 0
+        # Test the graph connection with a simple query
+        neo4j_connected = recommendation_engine.check_connection()
     except Exception:
         neo4j_connected = False
     
@@ -104,25 +388,61 @@ async def health_check():
         status="healthy" if neo4j_connected else "degraded",
         service="Qwipo Recommendation API",
         neo4j_connected=neo4j_connected,
-        timestamp=datetime.now().isoformat()
+        timestamp=datetime.now().isoformat(),
+        backend=getattr(recommendation_engine, "backend", None),
+        startup_seconds=round(engine_startup_seconds, 3) if engine_startup_seconds is not None else None
     )
 
+# Readiness endpoint for load balancers: healthy is not enough while the cache is still cold
+@app.get("/ready", tags=["Health"])
+async def readiness_check():
+    """Ready once the startup cache warm-up has finished or hit its deadline (503 until then)"""
+    return JSONResponse(status_code=200 if warmup_status["ready"] else 503, content=dict(warmup_status))
+
+# Prometheus metrics endpoint
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Expose request, engine and cache metrics in Prometheus text format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Keyset cursors: opaque url-safe base64 of the last row's (name, id) sort key
+def encode_cursor(row: Dict[str, Any]) -> str:
+    key = json.dumps([row["retailer_name"], row["retailer_id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        name, retailer_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(name, str) or not isinstance(retailer_id, str):
+        raise ValueError("Invalid cursor")
+    return name, retailer_id
+
 # Get available retailers
 @app.get("/retailers", response_model=RetailersListResponse, tags=["Retailers"])
 async def get_retailers(
-    limit: int = Query(20, ge=1, le=100, description="Maximum number of retailers to return")
+    limit: int = Query(20, ge=1, le=1000, description="Maximum number of retailers to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    location: Optional[str] = Query(None, description="Only retailers in this location"),
+    business_type: Optional[str] = Query(None, description="Only retailers of this business type"),
+    size: Optional[str] = Query(None, description="Only retailers of this size"),
+    segment: Optional[str] = Query(None, description="Only retailers in this customer segment")
 ):
-    """Get list of available retailers from the knowledge graph"""
+    """Page through retailers ordered by name, optionally filtered; cost per page is independent of depth"""
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
-        cypher = """
-        MATCH (r:Retailer)
-        RETURN r.id as retailer_id, r.name as retailer_name, 
-               r.location as location, r.business_type as business_type,
-               r.size as size
-        ORDER BY r.name
-        LIMIT $limit
-        """
-        results = recommendation_engine.neo4j_graph.query(cypher, params={"limit": limit})
+        # One extra row tells us whether another page exists
+        results = recommendation_engine.list_retailers(
+            limit + 1,
+            after=after,
+            filters={"location": location, "business_type": business_type, "size": size, "segment": segment}
+        )
+        page = results[:limit]
         
         retailers = [
             RetailerInfo(
@@ -130,19 +450,42 @@ async def get_retailers(
                 retailer_name=row["retailer_name"],
                 location=row["location"],
                 business_type=row["business_type"],
-                size=row["size"]
+                size=row["size"],
+                segment=row.get("segment")
             )
-            for row in results
+            for row in page
         ]
         
         return RetailersListResponse(
             retailers=retailers,
-            total_count=len(retailers)
+            total_count=len(retailers),
+            next_cursor=encode_cursor(page[-1]) if len(results) > limit else None
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch retailers: {str(e)}")
 
+# Search retailers by partial name, city or id
+@app.get("/retailers/search", response_model=RetailerSearchResponse, tags=["Retailers"])
+async def search_retailers(
+    q: str = Query(..., min_length=1, max_length=200, description="Partial retailer name, city or id; typos tolerated"),
+    limit: int = Query(10, ge=1, le=100, description="Maximum number of results")
+):
+    """Prefix and typo-tolerant retailer lookup from the in-memory search index"""
+    if search_index is None:
+        raise HTTPException(status_code=503, detail="Search index is not built yet")
+    
+    start = time.perf_counter()
+    results = search_index.search(q, limit)
+    took_ms = (time.perf_counter() - start) * 1000
+    
+    return RetailerSearchResponse(
+        query=q,
+        results=[RetailerSearchResult(**row) for row in results],
+        total_count=len(results),
+        took_ms=round(took_ms, 3)
+    )
+
 # Get retailer profile
 @app.get("/retailers/{retailer_id}/profile", tags=["Retailers"])
 async def get_retailer_profile(
@@ -150,7 +493,7 @@ async def get_retailer_profile(
 ):
     """Get detailed profile information for a specific retailer"""
     try:
-        profile = recommendation_engine.get_retailer_profile(retailer_id)
+        profile = await run_in_threadpool(recommendation_engine.get_retailer_profile, retailer_id)
         if not profile:
             raise HTTPException(status_code=404, detail=f"Retailer {retailer_id} not found")
         return profile
@@ -165,82 +508,330 @@ async def get_retailer_profile(
          tags=["Recommendations"])
 async def get_comprehensive_recommendations(
     retailer_id: str = Path(..., description="Retailer ID from the knowledge graph"),
-    limit_per_type: int = Query(5, ge=1, le=20, description="Maximum recommendations per type")
+    limit_per_type: int = Query(5, ge=1, le=20, description="Maximum recommendations per type"),
+    window_days: Optional[int] = Query(None, ge=1, le=3650, description=WINDOW_DAYS_DESCRIPTION),
+    half_life_days: Optional[float] = Query(None, gt=0, le=3650, description=HALF_LIFE_DESCRIPTION)
 ):
     """Get comprehensive recommendations for a retailer using all available algorithms"""
+    deadline = time.perf_counter() + REQUEST_DEADLINE_SECONDS
     try:
-        # Get retailer profile first
-        profile = recommendation_engine.get_retailer_profile(retailer_id)
+        # Engine calls run off the event loop, so concurrent requests for the same
+        # retailer overlap and coalesce into one computation
+        profile = await run_in_threadpool(recommendation_engine.get_retailer_profile, retailer_id)
         if not profile:
             raise HTTPException(status_code=404, detail=f"Retailer {retailer_id} not found")
+        # Only retailers that exist count towards warm-up, so unknown ids cannot crowd them out
+        hot_retailers.record(retailer_id)
         
-        # Get recommendations
-        recommendations = recommendation_engine.get_comprehensive_recommendations(
+        # Recommenders still running at the deadline are left out and reported as "timeout"
+        recommendations, status = await run_in_threadpool(
+            recommendation_engine.get_comprehensive_within,
             retailer_id=retailer_id,
-            limit_per_type=limit_per_type
+            limit_per_type=limit_per_type,
+            deadline_seconds=remaining_seconds(deadline),
+            profile=profile,
+            recency=recency_from(window_days, half_life_days)
         )
         
-        # Convert recommendations to response format
-        formatted_recommendations = {}
-        total_count = 0
-        
-        for rec_type, recs in recommendations.items():
-            formatted_recommendations[rec_type] = [
-                RecommendationResponse(**rec.to_dict()) for rec in recs
-            ]
-            total_count += len(recs)
-        
-        return ComprehensiveRecommendationsResponse(
-            retailer_id=retailer_id,
-            retailer_profile=profile,
-            recommendations=formatted_recommendations,
-            generated_at=datetime.now().isoformat(),
-            total_recommendations=total_count
-        )
+        # Encode straight to bytes; the engine's results already match RecommendationResponse,
+        # so returning the Response directly skips re-validating every recommendation
+        with span("serialization"):
+            return FastJSONResponse(comprehensive_payload(retailer_id, profile, recommendations, status))
         
     except Exception as e:
         if "not found" in str(e).lower():
             raise HTTPException(status_code=404, detail=f"Retailer {retailer_id} not found")
         raise HTTPException(status_code=500, detail=f"Failed to generate recommendations: {str(e)}")
 
+# Stream comprehensive recommendations (declared before the {recommendation_type} route it would match)
+@app.get("/retailers/{retailer_id}/recommendations/stream", tags=["Recommendations"])
+async def stream_comprehensive_recommendations(
+    retailer_id: str = Path(..., description="Retailer ID from the knowledge graph"),
+    limit_per_type: int = Query(5, ge=1, le=20, description="Maximum recommendations per type"),
+    window_days: Optional[int] = Query(None, ge=1, le=3650, description=WINDOW_DAYS_DESCRIPTION),
+    half_life_days: Optional[float] = Query(None, gt=0, le=3650, description=HALF_LIFE_DESCRIPTION)
+):
+    """Stream the retailer profile, then each recommender's results as it completes (NDJSON)"""
+    deadline = time.perf_counter() + REQUEST_DEADLINE_SECONDS
+    try:
+        profile = await run_in_threadpool(recommendation_engine.get_retailer_profile, retailer_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch retailer profile: {str(e)}")
+    if not profile:
+        raise HTTPException(status_code=404, detail=f"Retailer {retailer_id} not found")
+    hot_retailers.record(retailer_id)
+    
+    def line(payload: Dict[str, Any]) -> bytes:
+        return dumps(payload) + b"\n"
+    
+    async def chunks():
+        yield line({"type": "profile", "retailer_id": retailer_id, "retailer_profile": profile})
+        
+        # Run every recommender concurrently and emit each list the moment it is ready;
+        # retailers without purchase history get the cold-start lists instead
+        if recommendation_engine.is_cold_start(profile):
+            pending = {
+                asyncio.ensure_future(run_recommender(partial(
+                    recommendation_engine.get_cold_start_recommendations, retailer_id, profile, limit_per_type
+                ), deadline)): "cold_start"
+            }
+        else:
+            pending = {
+                asyncio.ensure_future(run_recommender(partial(recommender, retailer_id, limit_per_type), deadline)): rec_type
+                for rec_type, recommender in recommendation_engine.recommenders(
+                    recency_from(window_days, half_life_days)).items()
+            }
+        total_count = 0
+        status = {}
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=remaining_seconds(deadline),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Deadline passed: report what is still running instead of waiting for it
+                    for rec_type in pending.values():
+                        status[rec_type] = "timeout"
+                        yield line({"type": "timeout", "recommendation_type": rec_type})
+                    break
+                for task in done:
+                    rec_type = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except RecommenderBusy:
+                        status[rec_type] = "timeout"
+                        yield line({"type": "timeout", "recommendation_type": rec_type})
+                        continue
+                    except Exception as e:
+                        logger.exception("Recommender failed", extra={"retailer_id": retailer_id, "type": rec_type})
+                        status[rec_type] = "error"
+                        yield line({"type": "error", "recommendation_type": rec_type, "detail": str(e)})
+                        continue
+                    # The cold-start task answers several lists at once
+                    for list_type, recs in (result.items() if isinstance(result, dict) else [(rec_type, result)]):
+                        total_count += len(recs)
+                        status[list_type] = "ok"
+                        yield line({
+                            "type": "recommendations",
+                            "recommendation_type": list_type,
+                            "recommendations": recs,
+                            "count": len(recs)
+                        })
+        finally:
+            # Client went away or the deadline passed: stop waiting on recommenders that have not finished
+            # (they run to completion on their threads, which admit no new work meanwhile)
+            for task in pending:
+                task.cancel()
+        
+        yield line({
+            "type": "done",
+            "total_recommendations": total_count,
+            "recommendation_status": status,
+            "generated_at": datetime.now().isoformat()
+        })
+    
+    return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
 # Get specific recommendation type
 @app.get("/retailers/{retailer_id}/recommendations/{recommendation_type}", 
          tags=["Recommendations"])
 async def get_specific_recommendations(
     retailer_id: str = Path(..., description="Retailer ID from the knowledge graph"),
-    recommendation_type: str = Path(..., description="Type of recommendations (collaborative, category_expansion, etc.)"),
-    limit: int = Query(5, ge=1, le=20, description="Maximum number of recommendations")
+    recommendation_type: str = Path(..., description="Type of recommendations (collaborative, category_expansion, brand_loyalty or blended)"),
+    limit: int = Query(5, ge=1, le=20, description="Maximum number of recommendations"),
+    window_days: Optional[int] = Query(None, ge=1, le=3650, description=WINDOW_DAYS_DESCRIPTION),
+    half_life_days: Optional[float] = Query(None, gt=0, le=3650, description=HALF_LIFE_DESCRIPTION)
 ):
-    """Get specific type of recommendations for a retailer"""
+    """Get specific type of recommendations for a retailer ("blended" merges all types into one ranked list)"""
+    deadline = time.perf_counter() + REQUEST_DEADLINE_SECONDS
+    recency = recency_from(window_days, half_life_days)
     try:
-        # Get all recommendations and filter for the requested type
-        all_recommendations = recommendation_engine.get_comprehensive_recommendations(
-            retailer_id=retailer_id,
-            limit_per_type=limit
-        )
+        # Cached, and read by the recommenders below anyway
+        profile = await run_in_threadpool(recommendation_engine.get_retailer_profile, retailer_id)
+        if not profile:
+            raise HTTPException(status_code=404, detail=f"Retailer {retailer_id} not found")
+        hot_retailers.record(retailer_id)
         
-        if recommendation_type not in all_recommendations:
-            available_types = list(all_recommendations.keys())
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Invalid recommendation type. Available types: {available_types}"
+        if recommendation_type == "blended":
+            # Blends whichever recommenders finish by the deadline
+            recommendations, status = await run_in_threadpool(
+                recommendation_engine.get_blended_within, retailer_id, limit, remaining_seconds(deadline), recency
+            )
+        else:
+            available_types = list(recommendation_engine.recommenders()) + ["blended", "cold_start", "content_based"]
+            if recommendation_type not in available_types:
+                raise HTTPException(
+                    status_code=400, 
+                    detail=f"Invalid recommendation type. Available types: {available_types}"
+                )
+            
+            # Only the requested recommender runs; cold-start retailers only get the "cold_start"
+            # and "content_based" lists, so other types come back empty with status "skipped"
+            recommendations, status = await run_in_threadpool(
+                recommendation_engine.get_type_within, retailer_id, recommendation_type, limit,
+                remaining_seconds(deadline), recency
             )
         
-        recommendations = all_recommendations[recommendation_type]
-        
-        return {
+        return FastJSONResponse({
             "retailer_id": retailer_id,
             "recommendation_type": recommendation_type,
-            "recommendations": [rec.to_dict() for rec in recommendations],
+            "recommendations": recommendations,
             "count": len(recommendations),
+            "recommendation_status": status,
             "generated_at": datetime.now().isoformat()
-        }
+        })
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate recommendations: {str(e)}")
 
+# Product catalog with faceted filters
+@app.get("/products", response_model=ProductsListResponse, tags=["Products"])
+async def get_products(
+    category: Optional[List[str]] = Query(None, description="Categories to include (repeat for several)"),
+    brand: Optional[List[str]] = Query(None, description="Brands to include (repeat for several)"),
+    supplier: Optional[List[str]] = Query(None, description="Suppliers to include (repeat for several)"),
+    min_price: Optional[float] = Query(None, ge=0, description="Lowest unit price"),
+    max_price: Optional[float] = Query(None, ge=0, description="Highest unit price"),
+    sort: str = Query("popularity", description=f"One of: {', '.join(SORT_ORDERS)}"),
+    limit: int = Query(20, ge=1, le=200, description="Maximum number of products to return"),
+    offset: int = Query(0, ge=0, description="Number of matching products to skip")
+):
+    """Filter the catalog by category, brand, supplier and price, with facet counts for the filter sidebar"""
+    if catalog_index is None:
+        raise HTTPException(status_code=503, detail="Product catalog index is not built yet")
+    if sort not in SORT_ORDERS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort. Must be one of: {', '.join(SORT_ORDERS)}")
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="min_price must not exceed max_price")
+    
+    start = time.perf_counter()
+    result = catalog_index.query(
+        {"category": category, "brand": brand, "supplier": supplier},
+        min_price=min_price,
+        max_price=max_price,
+        sort=sort,
+        limit=limit,
+        offset=offset
+    )
+    took_ms = (time.perf_counter() - start) * 1000
+    
+    return ProductsListResponse(**result, took_ms=round(took_ms, 3))
+
+# Products similar by name, brand, category and unit
+@app.get("/products/{product_name}/similar", response_model=SimilarProductsResponse, tags=["Products"])
+async def get_similar_products(
+    product_name: str = Path(..., description="Exact product name"),
+    limit: int = Query(10, ge=1, le=50, description="Maximum number of similar products")
+):
+    """Nearest products in the content vector index, including products nobody has bought yet"""
+    if recommendation_engine is None or recommendation_engine.product_vectors is None:
+        raise HTTPException(status_code=503, detail="Product vector index is not built yet")
+    
+    start = time.perf_counter()
+    similar = recommendation_engine.product_vectors.similar(product_name, limit)
+    took_ms = (time.perf_counter() - start) * 1000
+    if similar is None:
+        raise HTTPException(status_code=404, detail=f"Product {product_name} not found")
+    
+    return SimilarProductsResponse(
+        product_name=product_name,
+        similar_products=[SimilarProduct(**row) for row in similar],
+        took_ms=round(took_ms, 3)
+    )
+
+# Real-time purchase events
+@app.post("/events/purchases", status_code=202, tags=["Events"])
+async def record_purchase_events(
+    events: List[Dict[str, Any]] = Body(..., description="Transaction records, shaped like transactions.json"),
+    wait: bool = Query(False, description="Respond once the events are applied, with what they changed"),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """Queue purchase events for the graph, cold-start tables and catalog (applied in batches within about a second)"""
+    require_admin_token(x_admin_token)
+    if purchase_events is None:
+        raise HTTPException(status_code=503, detail="Purchase events are not being accepted yet")
+    if len(events) > MAX_EVENTS_PER_REQUEST:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_EVENTS_PER_REQUEST} events per request")
+    try:
+        events = validate_purchase_events(events)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    try:
+        submission = purchase_events.submit(events, wait=wait)
+    except QueueFull:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Too many purchase events waiting, retry later"},
+            headers={"Retry-After": str(purchase_events.retry_after())}
+        )
+    if submission.future is None:
+        return {"status": "queued", "submission_id": submission.id,
+                "status_url": f"/events/purchases/{submission.id}",
+                "accepted": len(events), "queued": purchase_events.pending}
+    
+    try:
+        stats = await submission.future
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to apply purchase events (submission {submission.id} "
+                                                    f"was dead-lettered): {str(e)}")
+    # Counts for the whole batch the events were applied in
+    return JSONResponse(status_code=200, content={
+        "status": "applied",
+        "submission_id": submission.id,
+        "accepted": len(events),
+        "batch_events": stats["events"],
+        "purchases": stats["purchases"],
+        "new_purchases": stats["new_purchases"],
+        "retailers": stats["retailers"],
+        "new_products": len(stats["new_products"]),
+        "invalidated": stats["invalidated"],
+        "took_ms": stats["took_ms"],
+    })
+
+@app.get("/events/purchases/{submission_id}", tags=["Events"])
+async def get_purchase_event_status(submission_id: str = Path(..., description="Id returned when the events were queued"),
+                                    x_admin_token: Optional[str] = Header(None)):
+    """Outcome of queued purchase events: queued, retrying, applied or dead_lettered"""
+    require_admin_token(x_admin_token)
+    status = purchase_events.status(submission_id) if purchase_events is not None else None
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired submission: {submission_id}")
+    return status
+
+# Refresh in-memory indexes after ingestion
+@app.post("/admin/reload", tags=["Admin"])
+async def reload_indexes(x_admin_token: Optional[str] = Header(None)):
+    """Rebuild in-memory indexes from the graph (called by the ingestion pipeline when it finishes)"""
+    require_admin_token(x_admin_token)
+    
+    start = time.perf_counter()
+    async with reload_lock:
+        signatures = reload_watcher.current() if reload_watcher else {}
+        try:
+            await run_in_threadpool(reload_graph)
+        except Exception as e:
+            logger.exception("Index reload failed")
+            raise HTTPException(status_code=500, detail=f"Failed to reload indexes: {str(e)}")
+        
+        # Only this worker received the request; the generation bump tells the others
+        shared_dir = os.getenv("QWIPO_SHARED_INDEX_DIR")
+        if shared_dir:
+            generation = bump_generation(shared_dir)
+            signatures[generation] = file_signature(generation)
+        if reload_watcher:
+            reload_watcher.accept(signatures)
+    start_warmup()
+    
+    return {
+        "status": "reloaded",
+        "retailers_indexed": len(search_index),
+        "products_indexed": len(catalog_index),
+        "peer_groups": len(recommendation_engine.cold_start),
+        "took_ms": round((time.perf_counter() - start) * 1000, 1)
+    }
+
 # Root endpoint
 @app.get("/", tags=["Root"])
 async def root():
@@ -251,10 +842,17 @@ async def root():
         "description": "B2B marketplace recommendation system powered by Neo4j",
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
             "retailers": "/retailers",
+            "retailer_search": "/retailers/search?q={query}",
             "retailer_profile": "/retailers/{retailer_id}/profile",
+            "products": "/products",
+            "similar_products": "/products/{product_name}/similar",
+            "purchase_events": "/events/purchases",
             "comprehensive_recommendations": "/retailers/{retailer_id}/recommendations",
+            "streaming_recommendations": "/retailers/{retailer_id}/recommendations/stream",
             "specific_recommendations": "/retailers/{retailer_id}/recommendations/{type}",
+            "metrics": "/metrics",
             "documentation": "/docs"
         }
     }
@@ -280,6 +878,8 @@ if __name__ == "__main__":
     print("📊 Powered by Neo4j Knowledge Graph")
     print("🌐 API Documentation: http://localhost:8000/docs")
     
+    import uvicorn
+    
     uvicorn.run(
         "recommendation_api:app",
         host="0.0.0.0",
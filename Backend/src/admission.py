@@ -0,0 +1,144 @@
+"""
+Admission control for expensive API routes.
+
+At most max_in_flight heavy requests (recommendations, profiles: the ones that
+run graph queries) are served at once per worker. Further heavy requests wait
+in a bounded queue; once the queue holds max_queue requests, or a request has
+waited queue_timeout seconds, it is shed at once with 503 and a Retry-After
+estimated from the queue length and recent service times, instead of piling up
+behind synchronous graph calls until every client times out. Everything else
+(/health, /ready, /metrics, listings served from in-memory indexes) bypasses
+the controller, so cheap endpoints are never starved by heavy ones.
+"""
+
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from typing import Callable, Deque, Optional
+
+from metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED
+
+DEFAULT_MAX_IN_FLIGHT = 16
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_QUEUE_TIMEOUT_SECONDS = 5.0
+
+
+class Overloaded(Exception):
+    """The request was shed; retry after retry_after seconds"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded in-flight slots plus a bounded, time-limited wait queue"""
+
+    def __init__(self, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, max_queue: int = DEFAULT_MAX_QUEUE,
+                 queue_timeout: float = DEFAULT_QUEUE_TIMEOUT_SECONDS):
+        self.max_in_flight = max(max_in_flight, 1)
+        self.max_queue = max(max_queue, 0)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        # Waiting requests in arrival order; a released slot is handed to the first one directly
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Moving average of how long an admitted request holds its slot
+        self._service_seconds = 0.1
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            int(os.getenv("QWIPO_MAX_IN_FLIGHT", str(DEFAULT_MAX_IN_FLIGHT))),
+            int(os.getenv("QWIPO_MAX_QUEUE", str(DEFAULT_MAX_QUEUE))),
+            float(os.getenv("QWIPO_QUEUE_TIMEOUT_SECONDS", str(DEFAULT_QUEUE_TIMEOUT_SECONDS))),
+        )
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has drained at the recent service rate"""
+        return max(1, math.ceil((self.queued + 1) * self._service_seconds / self.max_in_flight))
+
+    def _reject(self, reason: str) -> Overloaded:
+        ADMISSION_REJECTED.inc(1.0, reason)
+        return Overloaded(reason, self.retry_after())
+
+    def _admitted(self) -> float:
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+        ADMISSION_QUEUE_DEPTH.set(self.queued)
+        return time.perf_counter()
+
+    async def acquire(self) -> float:
+        """Take a slot, waiting in the queue if needed; raises Overloaded when it is full or the wait times out"""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return self._admitted()
+        if self.queued >= self.max_queue:
+            raise self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        ADMISSION_QUEUE_DEPTH.set(self.queued)
+        try:
+            await asyncio.wait((waiter,), timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # Client went away while queued: give back a slot that was already handed over
+            if waiter.done():
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+                ADMISSION_QUEUE_DEPTH.set(self.queued)
+            raise
+        if not waiter.done():
+            self._waiters.remove(waiter)
+            ADMISSION_QUEUE_DEPTH.set(self.queued)
+            raise self._reject("queue_timeout")
+        return self._admitted()
+
+    def release(self, admitted_at: Optional[float] = None):
+        if admitted_at is not None:
+            self._service_seconds = 0.8 * self._service_seconds + 0.2 * (time.perf_counter() - admitted_at)
+        if self._waiters:
+            # The slot passes straight to the longest waiter, so in_flight is unchanged
+            self._waiters.popleft().set_result(None)
+            ADMISSION_QUEUE_DEPTH.set(self.queued)
+            return
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying the controller to requests whose path is_heavy"""
+
+    def __init__(self, app, controller: AdmissionController, is_heavy: Callable[[str], bool]):
+        self.app = app
+        self.controller = controller
+        self.is_heavy = is_heavy
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.is_heavy(scope.get("path", "")):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            admitted_at = await self.controller.acquire()
+        except Overloaded as e:
+            body = json.dumps({"detail": "Server overloaded, retry later", "reason": e.reason}).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                            (b"retry-after", str(e.retry_after).encode())],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(admitted_at)
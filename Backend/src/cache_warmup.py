@@ -0,0 +1,97 @@
+"""
+Cache warm-up: precompute results for the retailers most likely to be asked for next.
+
+After a deploy or an ingestion reload the result cache is empty (and, on the
+snapshot backend, the graph's pages are not yet in the page cache), so the
+first request for a busy retailer pays the full query cost. Warm-up picks the
+retailers with the most recent recommendation requests in this process, tops
+the list up with the retailers that purchase the most products (all there is
+right after a deploy), and runs their recommendations through the engine with
+bounded concurrency until done or a deadline passes.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Sequence
+
+from structured_logging import get_logger
+
+logger = get_logger("cache_warmup")
+
+# Result limit the warmed calls use: the API's default limit per type
+WARMUP_LIMIT = 5
+
+
+class HotRetailers:
+    """Request counts per retailer, halved every half_life_seconds so old traffic fades"""
+
+    def __init__(self, half_life_seconds: float = 600.0, max_tracked: int = 10000):
+        self.half_life_seconds = half_life_seconds
+        self.max_tracked = max_tracked
+        self._counts: Dict[str, float] = {}
+        self._decayed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _decay(self, now: float):
+        halvings = int((now - self._decayed_at) // self.half_life_seconds)
+        if halvings <= 0:
+            return
+        factor = 0.5 ** halvings
+        self._counts = {key: count * factor for key, count in self._counts.items() if count * factor >= 0.5}
+        self._decayed_at += halvings * self.half_life_seconds
+
+    def record(self, retailer_id: str):
+        with self._lock:
+            self._decay(time.monotonic())
+            self._counts[retailer_id] = self._counts.get(retailer_id, 0.0) + 1.0
+            if len(self._counts) > self.max_tracked:
+                # Forget the coldest half rather than trimming on every request
+                keep = sorted(self._counts.items(), key=lambda item: -item[1])[:self.max_tracked // 2]
+                self._counts = dict(keep)
+
+    def top(self, n: int) -> List[str]:
+        with self._lock:
+            self._decay(time.monotonic())
+            ranked = sorted(self._counts.items(), key=lambda item: (-item[1], item[0]))
+        return [retailer_id for retailer_id, _ in ranked[:n]]
+
+
+def warmup_candidates(engine, hot: HotRetailers, n: int) -> List[str]:
+    """Up to n retailers: recently requested first, then the biggest buyers"""
+    candidates = dict.fromkeys(hot.top(n))
+    if len(candidates) < n:
+        for row in engine.top_retailers(n):
+            candidates.setdefault(row["retailer_id"])
+            if len(candidates) == n:
+                break
+    return list(candidates)
+
+
+async def warm_cache(engine, retailer_ids: Sequence[str], concurrency: int,
+                     deadline_seconds: float) -> Dict[str, Any]:
+    """Compute comprehensive and blended results for each retailer; returns counts and timing"""
+    start = time.perf_counter()
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    stats = {"retailers": len(retailer_ids), "warmed": 0, "failed": 0}
+
+    async def warm(retailer_id: str):
+        async with semaphore:
+            try:
+                await asyncio.to_thread(engine.get_comprehensive_recommendations, retailer_id, WARMUP_LIMIT)
+                await asyncio.to_thread(engine.get_blended_recommendations, retailer_id, WARMUP_LIMIT)
+                stats["warmed"] += 1
+            except Exception:
+                stats["failed"] += 1
+                logger.warning("Warm-up failed for retailer", extra={"retailer_id": retailer_id}, exc_info=True)
+
+    tasks = [asyncio.ensure_future(warm(retailer_id)) for retailer_id in retailer_ids]
+    pending = set()
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=deadline_seconds)
+        # Past the deadline: stop starting new retailers (calls already running finish in their threads)
+        for task in pending:
+            task.cancel()
+    stats["timed_out"] = bool(pending)
+    stats["took_s"] = round(time.perf_counter() - start, 3)
+    return stats
@@ -0,0 +1,226 @@
+"""
+In-memory product catalog: faceted filtering by category, brand and supplier plus price ranges.
+
+Products are numbered in ascending price order (unpriced products last), so a
+price range is a contiguous run of product numbers found by bisecting the
+sorted prices. Every facet value has a posting list kept as a bitset (packed
+uint64 words, bit i set for product i), one row per value in a per-facet
+matrix: selected values within a facet are OR-ed, facets are AND-ed, and the
+counts for a whole facet are one vectorized AND + popcount of its matrix
+against the other facets' filters, so no query scans the products.
+"""
+
+import bisect
+import json
+import os
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+FACETS = ("category", "brand", "supplier")
+PRODUCT_FIELDS = ("product_name", "brand", "category", "sub_category", "supplier",
+                  "price", "unit", "margin", "popularity", "retailer_count")
+SORT_ORDERS = ("popularity", "price_asc", "price_desc", "name")
+
+
+if hasattr(np, "bitwise_count"):  # numpy 2.0+
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        """Set bits per row of a uint64 bitset matrix"""
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        """Set bits per row of a uint64 bitset matrix"""
+        return np.unpackbits(words.view(np.uint8), axis=-1).sum(axis=-1, dtype=np.int64)
+
+
+def load_catalog_file(path: str) -> List[Dict[str, Any]]:
+    """Flatten product_catalog.json ({brand: {company, category, products: [...]}}) into product rows"""
+    with open(path, "r") as f:
+        catalog = json.load(f)
+    rows = []
+    for brand, info in catalog.items():
+        for product in info.get("products", []):
+            rows.append({
+                "product_name": product["name"],
+                "brand": brand,
+                "category": info.get("category"),
+                "sub_category": info.get("sub_category"),
+                "supplier": info.get("company"),
+                "price": product.get("price"),
+                "unit": product.get("unit"),
+                "margin": product.get("margin"),
+                "popularity": product.get("popularity"),
+            })
+    return rows
+
+
+def merge_product_rows(*sources: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """Union of product rows by name; later sources only fill fields the earlier ones left empty"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for rows in sources:
+        for row in rows:
+            name = row.get("product_name")
+            if not name:
+                continue
+            product = merged.setdefault(name, dict.fromkeys(PRODUCT_FIELDS))
+            for field in PRODUCT_FIELDS:
+                if product[field] is None and row.get(field) not in (None, "Unknown"):
+                    product[field] = row[field]
+    return list(merged.values())
+
+
+class ProductCatalogIndex:
+    """Bitset posting lists per facet value over products numbered in price order"""
+
+    def __init__(self, products: Iterable[Mapping[str, Any]]):
+        rows = [{field: row.get(field) for field in PRODUCT_FIELDS} for row in products]
+        # Price order, unpriced last; ties by name so numbering is deterministic
+        rows.sort(key=lambda row: (row["price"] is None, row["price"] or 0.0, row["product_name"]))
+        self.products = rows
+        self._prices = [float(row["price"]) for row in rows if row["price"] is not None]
+        n = len(rows)
+        self._words = (n + 63) // 64
+        self._all = self._range(0, n)
+        self._priced = self._range(0, len(self._prices))
+
+        self._values: Dict[str, List[str]] = {}
+        self._value_rows: Dict[str, Dict[str, int]] = {}
+        self._postings: Dict[str, np.ndarray] = {}
+        for facet in FACETS:
+            values = sorted({row[facet] for row in rows if row[facet] is not None})
+            value_rows = {value: i for i, value in enumerate(values)}
+            codes = np.array([value_rows.get(row[facet], -1) for row in rows], dtype=np.int64)
+            known = np.flatnonzero(codes >= 0)
+            members = np.zeros((len(values), self._words * 64), dtype=bool)
+            members[codes[known], known] = True
+            self._values[facet] = values
+            self._value_rows[facet] = value_rows
+            self._postings[facet] = self._pack(members)
+
+        # Rank of every product under each sort order; a page is the matches with the lowest ranks
+        self._positions = {row["product_name"]: i for i, row in enumerate(rows)}
+        name_rank = np.empty(n, dtype=np.int64)
+        name_rank[np.argsort(np.array([row["product_name"] for row in rows], dtype=object), kind="stable")] = \
+            np.arange(n)
+        price_desc = np.arange(n)
+        priced = len(self._prices)
+        price_desc[:priced] = priced - 1 - price_desc[:priced]
+        self._ranks = {
+            "price_asc": np.arange(n),
+            "price_desc": price_desc,
+            "name": name_rank,
+        }
+        self._ranks["popularity"] = self._popularity_rank()
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def _popularity_rank(self) -> np.ndarray:
+        n = len(self.products)
+        popularity = np.array([(row["retailer_count"] or 0, row["popularity"] or 0) for row in self.products],
+                              dtype=np.float64).reshape(n, 2)
+        rank = np.empty(n, dtype=np.int64)
+        rank[np.lexsort((self._ranks["name"], -popularity[:, 1], -popularity[:, 0]))] = np.arange(n)
+        return rank
+
+    def add_buyers(self, counts: Mapping[str, int]) -> int:
+        """Raise the retailer counts of indexed products by counts (new buying retailers per product name)
+        and re-rank by popularity; returns how many products were updated"""
+        updated = 0
+        for name, count in counts.items():
+            position = self._positions.get(name)
+            if position is not None and count:
+                row = self.products[position]
+                row["retailer_count"] = (row["retailer_count"] or 0) + count
+                updated += 1
+        if updated:
+            self._ranks["popularity"] = self._popularity_rank()
+        return updated
+
+    @staticmethod
+    def _pack(members: np.ndarray) -> np.ndarray:
+        """Bool rows (length a multiple of 64) to uint64 bitset rows"""
+        return np.packbits(members, axis=-1, bitorder="little").view(np.uint64)
+
+    def _range(self, lo: int, hi: int) -> np.ndarray:
+        members = np.zeros(self._words * 64, dtype=bool)
+        members[lo:hi] = True
+        return self._pack(members)
+
+    def _members(self, bits: np.ndarray) -> np.ndarray:
+        """Product numbers set in a bitset, ascending"""
+        return np.flatnonzero(np.unpackbits(bits.view(np.uint8), bitorder="little")[:len(self.products)])
+
+    def facet_values(self, facet: str) -> List[str]:
+        return list(self._values[facet])
+
+    def _price_bits(self, min_price: Optional[float], max_price: Optional[float]) -> np.ndarray:
+        if min_price is None and max_price is None:
+            return self._all
+        lo = bisect.bisect_left(self._prices, min_price) if min_price is not None else 0
+        hi = bisect.bisect_right(self._prices, max_price) if max_price is not None else len(self._prices)
+        return self._range(lo, hi)
+
+    def _facet_bits(self, facet: str, values: Sequence[str]) -> np.ndarray:
+        value_rows = self._value_rows[facet]
+        rows = [value_rows[value] for value in values if value in value_rows]
+        return np.bitwise_or.reduce(self._postings[facet][rows], axis=0) if rows else np.zeros_like(self._all)
+
+    def query(self, filters: Optional[Mapping[str, Sequence[str]]] = None, min_price: Optional[float] = None,
+              max_price: Optional[float] = None, sort: str = "popularity", limit: int = 20,
+              offset: int = 0) -> Dict[str, Any]:
+        """Matching products (one page), total count, per-facet counts and the matches' price range"""
+        if sort not in self._ranks:
+            raise ValueError(f"Unknown sort order: {sort}")
+        filters = {facet: values for facet, values in (filters or {}).items() if values}
+        selected = {facet: self._facet_bits(facet, values) for facet, values in filters.items()}
+        price_bits = self._price_bits(min_price, max_price)
+
+        facet_match = self._all
+        for bits in selected.values():
+            facet_match = facet_match & bits
+        matches = facet_match & price_bits
+
+        # Each facet's counts apply every filter except its own, so the sidebar shows
+        # how many products picking another value of that facet would give
+        facets = {}
+        for facet in FACETS:
+            base = price_bits
+            for other, bits in selected.items():
+                if other != facet:
+                    base = base & bits
+            counts = _popcount(self._postings[facet] & base).tolist()
+            chosen = set(filters.get(facet, ()))
+            facets[facet] = {value: count for value, count in zip(self._values[facet], counts)
+                             if count or value in chosen}
+
+        # Bounds of the facet matches ignoring the price filter, for the price slider
+        priced = self._members(facet_match & self._priced)
+        price_range = None
+        if priced.size:
+            price_range = {"min": self._prices[priced[0]], "max": self._prices[priced[-1]]}
+
+        members = self._members(matches)
+        total_count = int(members.size)
+        ranks = self._ranks[sort][members]
+        end = offset + limit
+        if members.size > end:
+            # Only the first `end` matches by rank need ordering
+            top = np.argpartition(ranks, end - 1)[:end]
+            members, ranks = members[top], ranks[top]
+        page = members[np.argsort(ranks)][offset:end]
+        return {
+            "products": [self.products[i] for i in page.tolist()],
+            "total_count": total_count,
+            "facets": facets,
+            "price_range": price_range,
+        }
+
+
+def build_catalog_index(graph_products: Iterable[Mapping[str, Any]],
+                        catalog_file: Optional[str] = None) -> ProductCatalogIndex:
+    """Index the graph's products, enriched with (and extended by) the catalog file when present"""
+    sources = [graph_products]
+    if catalog_file and os.path.exists(catalog_file):
+        sources.append(load_catalog_file(catalog_file))
+    return ProductCatalogIndex(merge_product_rows(*sources))
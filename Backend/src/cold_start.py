@@ -0,0 +1,119 @@
+"""
+Popularity fallbacks for retailers with too little purchase history to recommend from.
+
+Collaborative filtering needs shared purchases and brand loyalty needs preferred
+brands, so a new retailer gets nothing from either. Instead their peer group
+answers: retailers with the same customer segment, size, location and business
+type. Tables of the most-bought products are precomputed per peer group and per
+coarser group (dropping location, then segment, down to all retailers), so a
+lookup is a few dict reads that back off until enough products are found.
+"""
+
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+# Retailers with at most this many distinct products are served from the tables
+COLD_START_MAX_PURCHASES = 2
+
+# Peer group keys from most to least specific; the last level is every retailer
+PEER_GROUP_LEVELS: Tuple[Tuple[str, ...], ...] = (
+    ("segment", "size", "location", "business_type"),
+    ("segment", "size", "business_type"),
+    ("size", "business_type"),
+    ("business_type",),
+    (),
+)
+
+LEVEL_LABELS = {
+    PEER_GROUP_LEVELS[0]: "same segment, size, city and business type",
+    PEER_GROUP_LEVELS[1]: "same segment, size and business type",
+    PEER_GROUP_LEVELS[2]: "same size and business type",
+    PEER_GROUP_LEVELS[3]: "same business type",
+    PEER_GROUP_LEVELS[4]: "all retailers",
+}
+
+
+def is_cold_start(profile: Mapping[str, Any]) -> bool:
+    """Whether a (found) retailer has too few purchases for the graph recommenders"""
+    return bool(profile) and (profile.get("products_bought") or 0) <= COLD_START_MAX_PURCHASES
+
+
+class ColdStartTables:
+    """Top products by share of buyers, per peer group at every back-off level"""
+
+    def __init__(self, group_rows: Iterable[Mapping[str, Any]], products: Iterable[Mapping[str, Any]],
+                 top_n: int = 50):
+        self.products = {row["product_name"]: row for row in products}
+        self.top_n = top_n
+        finest = PEER_GROUP_LEVELS[0]
+
+        # Buyers add up exactly across levels: every retailer belongs to one finest group
+        self._buyers: Dict[Tuple, Dict[Tuple, Dict[str, int]]] = {level: {} for level in PEER_GROUP_LEVELS}
+        self._retailers: Dict[Tuple, Dict[Tuple, int]] = {level: {} for level in PEER_GROUP_LEVELS}
+        self._groups = set()
+        for row in group_rows:
+            group = tuple(row.get(field) for field in finest)
+            for level in PEER_GROUP_LEVELS:
+                key = tuple(row.get(field) for field in level)
+                counts = self._buyers[level].setdefault(key, {})
+                counts[row["product_name"]] = counts.get(row["product_name"], 0) + row["buyers"]
+                if group not in self._groups:
+                    self._retailers[level][key] = self._retailers[level].get(key, 0) + row["retailers"]
+            self._groups.add(group)
+
+        # (product_name, buyers, share of the group) lists, most bought first
+        self._tables: Dict[Tuple, Dict[Tuple, List[Tuple[str, int, float]]]] = {level: {} for level in PEER_GROUP_LEVELS}
+        for level in PEER_GROUP_LEVELS:
+            for key in self._buyers[level]:
+                self._rank(level, key)
+        self.group_count = len(self._groups)
+
+    def _rank(self, level: Tuple[str, ...], key: Tuple):
+        group_size = self._retailers[level][key]
+        ranked = sorted(self._buyers[level][key].items(), key=lambda item: (-item[1], item[0]))[:self.top_n]
+        self._tables[level][key] = [(name, count, count / group_size) for name, count in ranked]
+
+    def add_purchases(self, buyers: Iterable[Tuple[Mapping[str, Any], str]],
+                      new_members: Iterable[Mapping[str, Any]] = (),
+                      products: Iterable[Mapping[str, Any]] = ()):
+        """Count new buyers ((peer group profile, product) pairs) and retailers making their first purchase,
+        re-ranking only the groups they touch"""
+        for row in products:
+            self.products.setdefault(row["product_name"], row)
+        touched = set()
+        for profile in new_members:
+            self._groups.add(tuple(profile.get(field) for field in PEER_GROUP_LEVELS[0]))
+            for level in PEER_GROUP_LEVELS:
+                key = tuple(profile.get(field) for field in level)
+                self._retailers[level][key] = self._retailers[level].get(key, 0) + 1
+                touched.add((level, key))
+        for profile, product_name in buyers:
+            for level in PEER_GROUP_LEVELS:
+                key = tuple(profile.get(field) for field in level)
+                counts = self._buyers[level].setdefault(key, {})
+                counts[product_name] = counts.get(product_name, 0) + 1
+                touched.add((level, key))
+        # Readers see either the old or the new list of a group, never a partial one
+        for level, key in touched:
+            self._rank(level, key)
+        self.group_count = len(self._groups)
+
+    def __len__(self) -> int:
+        return self.group_count
+
+    def lookup(self, profile: Mapping[str, Any], limit: int,
+               exclude: Sequence[str] = ()) -> List[Tuple[str, int, float, Tuple[str, ...]]]:
+        """(product_name, buyers, share, level) for the retailer's peer group, backing off to coarser groups"""
+        results = []
+        seen = set(exclude)
+        for level in PEER_GROUP_LEVELS:
+            key = tuple(profile.get(field) for field in level)
+            for name, count, share in self._tables[level].get(key, ()):
+                if name not in seen:
+                    seen.add(name)
+                    results.append((name, count, share, level))
+                    if len(results) == limit:
+                        return results
+        return results
+
+    def product(self, name: str) -> Optional[Mapping[str, Any]]:
+        return self.products.get(name)
@@ -0,0 +1,319 @@
+"""
+Versioned binary snapshot of the in-process recommendation graph.
+
+One file holds everything InMemoryRecommendationGraph needs to serve: string
+tables for retailer ids/names and product names (UTF-8 bytes plus offsets, with
+a sorted permutation for id lookups), categorical retailer attributes as codes,
+product attribute arrays, both CSR adjacencies with per-edge last purchase days,
+the day-ordered edge index behind time windows and the retailer listing index.
+
+Layout: 8-byte magic, uint32 format version, uint32 header length, a JSON
+header (counts, small value tables and an array directory of dtype/shape/
+offset), then every array at a 64-byte aligned offset. Loading memory-maps the
+file and wraps the arrays in place, so nothing is parsed or rebuilt and every
+worker on the host shares the same pages through the OS cache. Snapshots are
+written to a temporary file and renamed, so running workers keep reading the
+file they mapped.
+"""
+
+import bisect
+import json
+import mmap
+import os
+import struct
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from in_memory_graph import InMemoryRecommendationGraph
+
+MAGIC = b"QWPGRAPH"
+FORMAT_VERSION = 2
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<8sII")
+DEFAULT_SNAPSHOT_FILE = "snapshots/graph.qsnap"
+
+# Adjacency and purchase-day arrays, stored as they are held in memory
+GRAPH_ARRAYS = ("retailer_indptr", "retailer_products", "product_indptr", "product_retailers", "product_degree",
+                "retailer_days", "product_days", "edges_by_day", "purchase_days", "day_offsets")
+
+# Low-cardinality retailer fields stored as int32 codes into a value table (-1 = missing)
+CATEGORICAL_FIELDS = ("location", "business_type", "size", "customer_segment")
+
+
+class SnapshotError(ValueError):
+    """The file is not a graph snapshot this version can read"""
+
+
+class StringTable(Sequence):
+    """Read-only sequence of optional strings stored as UTF-8 bytes and offsets"""
+
+    def __init__(self, buffer, data_offset: int, offsets: np.ndarray, missing: np.ndarray):
+        self._buffer = buffer
+        self._data_offset = data_offset
+        self._offsets = offsets
+        self._missing = missing
+
+    def __len__(self) -> int:
+        return len(self._missing)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = int(i)
+        if self._missing[i]:
+            return None
+        start = self._data_offset + int(self._offsets[i])
+        return self._buffer[start:self._data_offset + int(self._offsets[i + 1])].decode("utf-8")
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        return (self[i] for i in range(len(self)))
+
+
+class StringIndex:
+    """value -> position lookup over a StringTable by binary search on its sorted permutation"""
+
+    def __init__(self, table: StringTable, order: np.ndarray):
+        self._table = table
+        self._order = order
+        self._keys = _OrderedView(table, order)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def get(self, value: str, default: Optional[int] = None) -> Optional[int]:
+        pos = bisect.bisect_left(self._keys, value)
+        if pos < len(self._order) and self._keys[pos] == value:
+            return int(self._order[pos])
+        return default
+
+    def __contains__(self, value: str) -> bool:
+        return self.get(value) is not None
+
+    def __getitem__(self, value: str) -> int:
+        position = self.get(value)
+        if position is None:
+            raise KeyError(value)
+        return position
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table)
+
+
+class _OrderedView(Sequence):
+    """A string table read in a given order (for bisect)"""
+
+    def __init__(self, table: StringTable, order: np.ndarray):
+        self._table = table
+        self._order = order
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __getitem__(self, i):
+        return self._table[self._order[i]]
+
+
+class RetailerRows(Sequence):
+    """Retailer dicts materialized on access from the snapshot's columns"""
+
+    def __init__(self, ids: StringTable, names: StringTable, codes: Dict[str, np.ndarray],
+                 values: Dict[str, List[Any]]):
+        self._ids = ids
+        self._names = names
+        self._codes = codes
+        self._values = values
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = int(i)
+        row = {"id": self._ids[i], "name": self._names[i]}
+        for field in CATEGORICAL_FIELDS:
+            code = int(self._codes[field][i])
+            row[field] = self._values[field][code] if code >= 0 else None
+        return row
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self[i] for i in range(len(self)))
+
+
+class ListingKeys(Sequence):
+    """(name, id) of retailers in listing order, for the keyset cursor bisect"""
+
+    def __init__(self, ids: StringTable, names: StringTable, order: np.ndarray):
+        self._ids = ids
+        self._names = names
+        self._order = order
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __getitem__(self, i):
+        r = self._order[i]
+        return self._names[r], self._ids[r]
+
+
+def _encode_strings(values: Sequence[Optional[str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(utf-8 data, offsets, missing flags, sorted permutation of the present values)"""
+    encoded = [b"" if value is None else str(value).encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    missing = np.array([value is None for value in values], dtype=np.uint8)
+    order = np.array(sorted((i for i, value in enumerate(values) if value is not None), key=lambda i: values[i]),
+                     dtype=np.int64)
+    return data, offsets, missing, order
+
+
+def write_snapshot(graph: InMemoryRecommendationGraph, path: str, source: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Write the graph to path atomically; returns the header"""
+    arrays: Dict[str, np.ndarray] = {}
+    retailers = list(graph.retailers)
+    for name, values in (("retailer_id", [r["id"] for r in retailers]),
+                         ("retailer_name", [r.get("name") for r in retailers]),
+                         ("product_name", list(graph.product_names))):
+        data, offsets, missing, order = _encode_strings(values)
+        arrays.update({f"{name}.data": data, f"{name}.offsets": offsets,
+                       f"{name}.missing": missing, f"{name}.sorted": order})
+
+    categorical_values = {}
+    for field in CATEGORICAL_FIELDS:
+        values = sorted({r.get(field) for r in retailers if r.get(field) is not None}, key=str)
+        codes = {value: i for i, value in enumerate(values)}
+        categorical_values[field] = values
+        arrays[f"retailer_{field}"] = np.array([codes.get(r.get(field), -1) for r in retailers], dtype=np.int32)
+
+    for name in ("product_brand", "product_category", "product_supplier", "product_price", "product_margin",
+                 *GRAPH_ARRAYS):
+        arrays[name] = np.ascontiguousarray(getattr(graph, name))
+    arrays["listing_order"] = np.asarray(graph._listing_order, dtype=np.int64)
+
+    # Listing postings as one CSR: keys in the header, positions concatenated
+    posting_keys = sorted(graph._listing_postings, key=lambda key: (key[0], str(key[1])))
+    postings = [np.asarray(graph._listing_postings[key], dtype=np.int64) for key in posting_keys]
+    arrays["listing_postings.indptr"] = np.concatenate(([0], np.cumsum([len(p) for p in postings]))).astype(np.int64)
+    arrays["listing_postings.positions"] = (np.concatenate(postings) if postings else np.empty(0)).astype(np.int64)
+
+    directory = {}
+    offset = 0
+    for name, array in arrays.items():
+        directory[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = {
+        "format_version": FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "source": source or {},
+        "counts": {"retailers": len(retailers), "products": len(graph.product_names), "purchases": graph.edge_count},
+        "brand_names": list(graph.brand_names),
+        "category_names": list(graph.category_names),
+        "supplier_names": list(graph.supplier_names),
+        "categorical_values": categorical_values,
+        "listing_posting_keys": [list(key) for key in posting_keys],
+        "arrays": directory,
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(_PREAMBLE.size + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary = f"{path}.tmp{os.getpid()}"
+    with open(temporary, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + directory[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+    return header
+
+
+def read_header(path: str) -> Dict[str, Any]:
+    """Snapshot header (counts, creation time, source) without mapping the arrays"""
+    with open(path, "rb") as f:
+        return _parse_header(f.read(_PREAMBLE.size), f)[0]
+
+
+def snapshot_is_current(path: str) -> bool:
+    """Whether path holds a snapshot this version can load (missing and older formats need a rebuild)"""
+    try:
+        read_header(path)
+    except (OSError, SnapshotError):
+        return False
+    return True
+
+
+def _parse_header(preamble: bytes, f) -> Tuple[Dict[str, Any], int]:
+    if len(preamble) < _PREAMBLE.size:
+        raise SnapshotError("File too short for a graph snapshot")
+    magic, version, header_length = _PREAMBLE.unpack(preamble)
+    if magic != MAGIC:
+        raise SnapshotError("Not a Qwipo graph snapshot")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"Snapshot format version {version} is not supported (expected {FORMAT_VERSION})")
+    header = json.loads(f.read(header_length))
+    data_start = -(-(_PREAMBLE.size + header_length) // ALIGNMENT) * ALIGNMENT
+    return header, data_start
+
+
+def load_snapshot(path: str) -> InMemoryRecommendationGraph:
+    """Memory-map a snapshot and serve the graph straight from its pages"""
+    with open(path, "rb") as f:
+        header, data_start = _parse_header(f.read(_PREAMBLE.size), f)
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def array(name: str) -> np.ndarray:
+        entry = header["arrays"][name]
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        return np.frombuffer(buffer, dtype=dtype, count=count,
+                             offset=data_start + entry["offset"]).reshape(entry["shape"])
+
+    def strings(name: str) -> Tuple[StringTable, np.ndarray]:
+        table = StringTable(buffer, data_start + header["arrays"][f"{name}.data"]["offset"],
+                            array(f"{name}.offsets"), array(f"{name}.missing"))
+        return table, array(f"{name}.sorted")
+
+    retailer_ids, retailer_order = strings("retailer_id")
+    retailer_names, _ = strings("retailer_name")
+    product_names, product_order = strings("product_name")
+    retailers = RetailerRows(
+        retailer_ids, retailer_names,
+        {field: array(f"retailer_{field}") for field in CATEGORICAL_FIELDS},
+        header["categorical_values"],
+    )
+    listing_order = array("listing_order")
+    indptr, positions = array("listing_postings.indptr"), array("listing_postings.positions")
+    listing_postings = {
+        (name, value): positions[indptr[i]:indptr[i + 1]]
+        for i, (name, value) in enumerate(header["listing_posting_keys"])
+    }
+
+    return InMemoryRecommendationGraph.from_state({
+        "retailers": retailers,
+        "retailer_index": StringIndex(retailer_ids, retailer_order),
+        "product_names": product_names,
+        "product_index": StringIndex(product_names, product_order),
+        "brand_names": header["brand_names"],
+        "category_names": header["category_names"],
+        "supplier_names": header["supplier_names"],
+        **{name: array(name) for name in (
+            "product_brand", "product_category", "product_supplier", "product_price", "product_margin",
+            *GRAPH_ARRAYS)},
+        "_listing_order": listing_order,
+        "_listing_keys": ListingKeys(retailer_ids, retailer_names, listing_order),
+        "_listing_postings": listing_postings,
+    })
+
+
+def snapshot_graph_files(retailers_file: str, transactions_file: str, path: str) -> Dict[str, Any]:
+    """Build the graph from the JSON data files and write its snapshot"""
+    graph = InMemoryRecommendationGraph.from_files(retailers_file, transactions_file)
+    return write_snapshot(graph, path, source={"retailers_file": retailers_file,
+                                               "transactions_file": transactions_file})
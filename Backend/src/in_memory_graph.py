@@ -0,0 +1,699 @@
+"""
+In-process purchase graph for the Qwipo recommendation engine.
+
+Holds the Retailer -[:PURCHASES]-> Product graph as CSR adjacency arrays and
+answers the engine's recommender queries with vectorized numpy operations,
+returning rows shaped exactly like the Cypher results. Used for benchmarking,
+load testing and serving without a Neo4j round trip.
+
+Every edge carries the day of the retailer's last purchase of the product, and
+edges are also indexed in day order, so a trailing window ("last N days") is a
+suffix of that order: its adjacency is built from just the edges inside it
+(and cached per window start) instead of filtering the full history per query.
+"""
+
+import bisect
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from report_engine import iter_json_records
+
+RETAILER_FIELDS = ("name", "location", "business_type", "size", "customer_segment")
+
+# Listing filter name -> retailer field, matching the engine's RETAILER_FILTERS
+LISTING_FILTERS = {"location": "location", "business_type": "business_type", "size": "size",
+                   "segment": "customer_segment"}
+_EMPTY = np.empty(0, dtype=np.int64)
+
+# Purchase days are stored as days since 1970-01-01, the unit of PURCHASES.last_purchase_day in Neo4j
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Windowed adjacencies kept per window start day
+WINDOW_CACHE_SIZE = 8
+
+
+def purchase_day(value: Optional[str]) -> int:
+    """Days since 1970-01-01 of an ISO purchase date; undated purchases count as the oldest"""
+    if not value:
+        return 0
+    return date.fromisoformat(value[:10]).toordinal() - _EPOCH_ORDINAL
+
+
+def _decay(days: np.ndarray, as_of_day: int, half_life_days: float) -> np.ndarray:
+    """Weight of purchases made on days: 1 on the reference day, halving every half_life_days before it"""
+    return np.exp2((days - as_of_day) / half_life_days)
+
+
+def _confidence(counts: np.ndarray, thresholds: Tuple[Tuple[int, float], ...], default: float) -> np.ndarray:
+    """Vectorized CASE WHEN ladder over a count array"""
+    conditions = [counts >= threshold for threshold, _ in thresholds]
+    return np.select(conditions, [value for _, value in thresholds], default=default)
+
+
+def _gather_positions(indptr: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions of the CSR neighbour lists of several rows, concatenated, and their lengths"""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return _EMPTY, lengths
+    offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return offsets + np.arange(total), lengths
+
+
+def _build_csr(rows: np.ndarray, cols: np.ndarray, days: np.ndarray,
+               n_rows: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Build CSR (indptr, indices, days) from edge arrays, columns sorted within each row"""
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[order].astype(np.int32), days[order].astype(np.int32)
+
+
+def _encode(values: List[Optional[str]]) -> Tuple[List[str], np.ndarray]:
+    """Sorted distinct names and each value's code into them (-1 for None)"""
+    names = sorted({v for v in values if v is not None})
+    codes = {v: i for i, v in enumerate(names)}
+    return names, np.array([codes.get(v, -1) for v in values], dtype=np.int32)
+
+
+def _transaction_retailer(t: Mapping[str, Any]) -> Dict[str, Any]:
+    """Retailer row of a retailer only known through its transactions"""
+    return {
+        "id": t["retailer_id"], "name": t.get("retailer_name"), "location": t.get("retailer_location"),
+        "business_type": t.get("business_type"), "size": t.get("retailer_size"),
+        "customer_segment": t.get("retailer_segment"),
+    }
+
+
+class PurchaseEdges:
+    """Both adjacencies over a set of purchase edges, with each edge's last purchase day"""
+
+    __slots__ = ("retailer_indptr", "retailer_products", "retailer_days",
+                 "product_indptr", "product_retailers", "product_days", "product_degree")
+
+    def __init__(self, retailer_indptr, retailer_products, retailer_days,
+                 product_indptr, product_retailers, product_days, product_degree):
+        self.retailer_indptr = retailer_indptr
+        self.retailer_products = retailer_products
+        self.retailer_days = retailer_days
+        self.product_indptr = product_indptr
+        self.product_retailers = product_retailers
+        self.product_days = product_days
+        self.product_degree = product_degree
+
+    @classmethod
+    def build(cls, edge_retailers: np.ndarray, edge_products: np.ndarray, edge_days: np.ndarray,
+              n_retailers: int, n_products: int) -> "PurchaseEdges":
+        retailer_csr = _build_csr(edge_retailers, edge_products, edge_days, n_retailers)
+        product_csr = _build_csr(edge_products, edge_retailers, edge_days, n_products)
+        return cls(*retailer_csr, *product_csr, np.diff(product_csr[0]))
+
+    def popularity(self, as_of_day: Optional[int] = None, half_life_days: Optional[float] = None) -> np.ndarray:
+        """Buyers per product, each weighted by the recency of its purchase when half_life_days is set"""
+        if half_life_days is None:
+            return self.product_degree
+        totals = np.concatenate(([0.0], np.cumsum(_decay(self.product_days, as_of_day, half_life_days))))
+        return totals[self.product_indptr[1:]] - totals[self.product_indptr[:-1]]
+
+
+class InMemoryRecommendationGraph:
+    """Retailer/product purchase graph held as CSR arrays"""
+
+    # Attributes a snapshot must restore; everything else is bound in _bind_queries
+    STATE = (
+        "retailers", "retailer_index", "product_names", "product_index",
+        "brand_names", "category_names", "supplier_names",
+        "product_brand", "product_category", "product_supplier", "product_price", "product_margin",
+        "retailer_indptr", "retailer_products", "product_indptr", "product_retailers", "product_degree",
+        "retailer_days", "product_days", "edges_by_day", "purchase_days", "day_offsets",
+        "_listing_order", "_listing_keys", "_listing_postings",
+    )
+
+    def __init__(self, retailers: List[Dict[str, Any]], product_names: List[str],
+                 brand_names: List[str], category_names: List[str], supplier_names: List[str],
+                 product_brand: np.ndarray, product_category: np.ndarray, product_supplier: np.ndarray,
+                 product_price: np.ndarray, product_margin: np.ndarray,
+                 edge_retailers: np.ndarray, edge_products: np.ndarray, edge_days: Optional[np.ndarray] = None):
+        self.retailers = retailers
+        self.retailer_index = {r["id"]: i for i, r in enumerate(retailers)}
+        self.product_names = product_names
+        self.product_index = {name: i for i, name in enumerate(product_names)}
+        self.brand_names = brand_names
+        self.category_names = category_names
+        self.supplier_names = supplier_names
+
+        self.product_brand = product_brand
+        self.product_category = product_category
+        self.product_supplier = product_supplier
+        self.product_price = product_price
+        self.product_margin = product_margin
+
+        if edge_days is None:
+            edge_days = np.zeros(len(edge_retailers), dtype=np.int32)
+        edges = PurchaseEdges.build(edge_retailers, edge_products, edge_days, len(retailers), len(product_names))
+        for name in PurchaseEdges.__slots__:
+            setattr(self, name, getattr(edges, name))
+
+        # Retailer-CSR edge positions in last-purchase-day order; the edges of day purchase_days[i]
+        # onwards start at edges_by_day[day_offsets[i]]
+        self.edges_by_day = np.argsort(self.retailer_days, kind="stable")
+        self.purchase_days, day_counts = np.unique(self.retailer_days, return_counts=True)
+        self.day_offsets = np.zeros(self.purchase_days.size + 1, dtype=np.int64)
+        np.cumsum(day_counts, out=self.day_offsets[1:])
+
+        # Listing order by (name, id) with per-filter posting lists of positions in that order
+        self._listing_order = sorted((i for i, r in enumerate(retailers) if r.get("name") is not None),
+                                     key=lambda i: (retailers[i]["name"], retailers[i]["id"]))
+        self._listing_keys = [(retailers[i]["name"], retailers[i]["id"]) for i in self._listing_order]
+        postings: Dict[Tuple[str, Any], List[int]] = {}
+        for pos, i in enumerate(self._listing_order):
+            for name, field in LISTING_FILTERS.items():
+                postings.setdefault((name, retailers[i].get(field)), []).append(pos)
+        self._listing_postings = {key: np.array(positions, dtype=np.int64) for key, positions in postings.items()}
+        self._bind_queries()
+
+    @classmethod
+    def from_state(cls, state: Mapping[str, Any]) -> "InMemoryRecommendationGraph":
+        """Graph over already-built adjacency and indexes (e.g. memory-mapped from a snapshot), no rebuilding"""
+        graph = cls.__new__(cls)
+        for name in cls.STATE:
+            setattr(graph, name, state[name])
+        graph._bind_queries()
+        return graph
+
+    def _bind_queries(self):
+        self._all_edges = PurchaseEdges(*(getattr(self, name) for name in PurchaseEdges.__slots__))
+        self._windows: "OrderedDict[int, PurchaseEdges]" = OrderedDict()
+        self._windows_lock = threading.Lock()
+        self._queries: Dict[str, Callable[..., Any]] = {
+            "retailer_profile": self.retailer_profile,
+            "collaborative": self.collaborative_rows,
+            "category_expansion": self.category_expansion_rows,
+            "brand_loyalty": self.brand_loyalty_rows,
+            "list_retailers": self.list_retailers,
+            "top_retailers": self.top_retailers,
+            "list_products": self.list_products,
+            "peer_group_popularity": self.peer_group_popularity,
+            "purchased_products": self.purchased_products,
+            "retailer_peer_groups": self.retailer_peer_groups,
+            "latest_purchase_day": self.latest_purchase_day,
+        }
+
+    @classmethod
+    def from_transactions(cls, retailers: Iterable[Mapping[str, Any]],
+                          transactions: Iterable[Mapping[str, Any]]) -> "InMemoryRecommendationGraph":
+        """Aggregate raw transactions into one PURCHASES edge per (retailer, product), dated by its last purchase"""
+        retailer_rows = [
+            {"id": r["id"], **{field: r.get(field) for field in RETAILER_FIELDS}} for r in retailers
+        ]
+        retailer_index = {r["id"]: i for i, r in enumerate(retailer_rows)}
+
+        product_index: Dict[str, int] = {}
+        product_rows: List[Tuple[str, str, str, float, float]] = []
+        edges: Dict[Tuple[int, int], int] = {}
+        days: Dict[str, int] = {}
+
+        for t in transactions:
+            retailer_id = t["retailer_id"]
+            r_idx = retailer_index.get(retailer_id)
+            if r_idx is None:
+                # Retailer only known through its transactions
+                r_idx = len(retailer_rows)
+                retailer_index[retailer_id] = r_idx
+                retailer_rows.append(_transaction_retailer(t))
+            name = t["product_name"]
+            p_idx = product_index.get(name)
+            if p_idx is None:
+                p_idx = len(product_rows)
+                product_index[name] = p_idx
+                product_rows.append((t.get("brand"), t.get("category"), t.get("supplier"),
+                                     t.get("unit_price"), t.get("margin_percent")))
+            purchase_date = (t.get("purchase_date") or "")[:10]
+            day = days.get(purchase_date)
+            if day is None:
+                day = days[purchase_date] = purchase_day(purchase_date)
+            if edges.get((r_idx, p_idx), -1) < day:
+                edges[(r_idx, p_idx)] = day
+
+        brand_names, product_brand = _encode([p[0] for p in product_rows])
+        category_names, product_category = _encode([p[1] for p in product_rows])
+        supplier_names, product_supplier = _encode([p[2] for p in product_rows])
+
+        edge_array = np.array([(r, p, day) for (r, p), day in sorted(edges.items())], dtype=np.int32).reshape(-1, 3)
+        return cls(
+            retailers=retailer_rows,
+            product_names=list(product_index),
+            brand_names=brand_names,
+            category_names=category_names,
+            supplier_names=supplier_names,
+            product_brand=product_brand,
+            product_category=product_category,
+            product_supplier=product_supplier,
+            product_price=np.array([np.nan if p[3] is None else p[3] for p in product_rows], dtype=np.float64),
+            product_margin=np.array([np.nan if p[4] is None else p[4] for p in product_rows], dtype=np.float64),
+            edge_retailers=edge_array[:, 0],
+            edge_products=edge_array[:, 1],
+            edge_days=edge_array[:, 2],
+        )
+
+    @classmethod
+    def from_files(cls, retailers_file: str, transactions_file: str) -> "InMemoryRecommendationGraph":
+        """Build the graph by streaming the mock data JSON files"""
+        return cls.from_transactions(iter_json_records(retailers_file), iter_json_records(transactions_file))
+
+    @property
+    def edge_count(self) -> int:
+        return int(self.retailer_products.size)
+
+    @property
+    def latest_day(self) -> Optional[int]:
+        """Day of the newest purchase in the graph"""
+        return int(self.purchase_days[-1]) if self.purchase_days.size else None
+
+    def run(self, query_name: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Answer a named engine query with the same row shape as its Cypher"""
+        return self._queries[query_name](**params)
+
+    # ------------------------------------------------------------------ helpers
+
+    def _purchased(self, r_idx: int) -> np.ndarray:
+        return self.retailer_products[self.retailer_indptr[r_idx]:self.retailer_indptr[r_idx + 1]]
+
+    def _edges(self, since_day: Optional[int] = None) -> PurchaseEdges:
+        """Adjacency over the edges last purchased on or after since_day (all edges when None)"""
+        if since_day is None:
+            return self._all_edges
+        with self._windows_lock:
+            edges = self._windows.get(since_day)
+            if edges is not None:
+                self._windows.move_to_end(since_day)
+                return edges
+            start = int(self.day_offsets[np.searchsorted(self.purchase_days, since_day)])
+            positions = self.edges_by_day[start:]
+            edge_retailers = (np.searchsorted(self.retailer_indptr, positions, side="right") - 1).astype(np.int32)
+            edges = PurchaseEdges.build(edge_retailers, self.retailer_products[positions],
+                                        self.retailer_days[positions], len(self.retailers), len(self.product_names))
+            self._windows[since_day] = edges
+            if len(self._windows) > WINDOW_CACHE_SIZE:
+                self._windows.popitem(last=False)
+            return edges
+
+    @staticmethod
+    def _label(names: List[str], code: int) -> Optional[str]:
+        return names[code] if code >= 0 else None
+
+    def _product_row(self, p_idx: int) -> Dict[str, Any]:
+        price = self.product_price[p_idx]
+        margin = self.product_margin[p_idx]
+        return {
+            "product_name": self.product_names[p_idx],
+            "brand": self._label(self.brand_names, self.product_brand[p_idx]) or "Unknown",
+            "category": self._label(self.category_names, self.product_category[p_idx]) or "Unknown",
+            "supplier": self._label(self.supplier_names, self.product_supplier[p_idx]) or "Unknown",
+            "avg_price": None if np.isnan(price) else float(price),
+            "avg_margin": None if np.isnan(margin) else float(margin),
+        }
+
+    @staticmethod
+    def _top(primary: np.ndarray, secondary: np.ndarray, limit: int) -> np.ndarray:
+        """Positions ordered by primary DESC, secondary DESC, truncated to limit"""
+        return np.lexsort((-secondary, -primary))[:limit]
+
+    @classmethod
+    def _ranked(cls, confidence: np.ndarray, counts: np.ndarray, recency: Optional[np.ndarray],
+                limit: int) -> np.ndarray:
+        """Recommender order: by recency weight then confidence when decaying, else confidence then count"""
+        if recency is None:
+            return cls._top(confidence, counts, limit)
+        return cls._top(recency, confidence, limit)
+
+    # ------------------------------------------------------------------ queries
+
+    def retailer_profile(self, retailer_id: str) -> List[Dict[str, Any]]:
+        r_idx = self.retailer_index.get(retailer_id)
+        if r_idx is None:
+            return []
+        retailer = self.retailers[r_idx]
+        purchased = self._purchased(r_idx)
+        brands = np.unique(self.product_brand[purchased])
+        categories = np.unique(self.product_category[purchased])
+        brands, categories = brands[brands >= 0], categories[categories >= 0]
+        return [{
+            "retailer_name": retailer.get("name"),
+            "location": retailer.get("location"),
+            "business_type": retailer.get("business_type"),
+            "size": retailer.get("size"),
+            "segment": retailer.get("customer_segment"),
+            "products_bought": int(purchased.size),
+            "brands_used": int(brands.size),
+            "categories_explored": int(categories.size),
+            "preferred_categories": [self.category_names[c] for c in categories],
+            "preferred_brands": [self.brand_names[b] for b in brands],
+        }]
+
+    def collaborative_rows(self, retailer_id: str, limit: int, since_day: Optional[int] = None,
+                           as_of_day: Optional[int] = None, half_life_days: Optional[float] = None
+                           ) -> List[Dict[str, Any]]:
+        r_idx = self.retailer_index.get(retailer_id)
+        if r_idx is None:
+            return []
+        purchased = self._purchased(r_idx)
+        if purchased.size == 0:
+            return []
+        edges = self._edges(since_day)
+        decayed = half_life_days is not None
+
+        # Common purchases between the target and every other retailer (other retailers' purchases
+        # inside the window); recency only ranks candidates, it never decides eligibility
+        positions, _ = _gather_positions(edges.product_indptr, purchased)
+        common = np.bincount(edges.product_retailers[positions], minlength=len(self.retailers))
+        common[r_idx] = 0
+        similar = np.flatnonzero(common >= 2)
+        if similar.size == 0:
+            return []
+
+        # Products the similar retailers bought, weighted by their similarity
+        positions, lengths = _gather_positions(edges.retailer_indptr, similar)
+        products = edges.retailer_products[positions]
+        n_products = len(self.product_names)
+        similar_count = np.bincount(products, minlength=n_products)
+        similarity_sum = np.bincount(products, weights=np.repeat(common[similar], lengths), minlength=n_products)
+        similar_count[purchased] = 0
+
+        candidates = np.flatnonzero(similar_count)
+        counts = similar_count[candidates]
+        avg_similarity = similarity_sum[candidates] / counts
+        confidence = np.select(
+            [counts >= 5, counts >= 3, counts >= 2],
+            [0.8 + avg_similarity / 10.0, 0.6 + avg_similarity / 15.0, 0.4 + avg_similarity / 20.0],
+            default=0.2 + avg_similarity / 25.0,
+        )
+        keep = confidence > 0.3
+        candidates, counts, avg_similarity, confidence = (
+            candidates[keep], counts[keep], avg_similarity[keep], confidence[keep]
+        )
+        recency = None
+        if decayed:
+            weights = _decay(edges.retailer_days[positions], as_of_day, half_life_days)
+            recency = np.bincount(products, weights=weights, minlength=n_products)[candidates]
+
+        rows = []
+        for pos in self._ranked(confidence, counts, recency, limit):
+            row = self._product_row(candidates[pos])
+            row.update(
+                confidence_score=float(confidence[pos]),
+                similar_retailer_count=int(counts[pos]),
+                avg_similarity=float(avg_similarity[pos]),
+                anchor_products=int(counts[pos]),
+                recency_weight=None if recency is None else round(float(recency[pos]), 4),
+            )
+            rows.append(row)
+        return rows
+
+    def category_expansion_rows(self, retailer_id: str, limit: int, since_day: Optional[int] = None,
+                                as_of_day: Optional[int] = None, half_life_days: Optional[float] = None
+                                ) -> List[Dict[str, Any]]:
+        r_idx = self.retailer_index.get(retailer_id)
+        if r_idx is None:
+            return []
+        purchased = self._purchased(r_idx)
+        if purchased.size == 0:
+            return []
+
+        # Products in categories the target already buys from are never candidates,
+        # so the target itself never contributes to a candidate's popularity
+        current = np.unique(self.product_category[purchased])
+        edges = self._edges(since_day)
+        popularity = edges.popularity()
+        keep = (self.product_category >= 0) & ~np.isin(self.product_category, current) & (popularity >= 3)
+        candidates = np.flatnonzero(keep)
+        counts = popularity[candidates]
+        confidence = _confidence(counts, ((10, 0.7), (7, 0.6), (5, 0.5)), 0.4)
+        recency = edges.popularity(as_of_day, half_life_days)[candidates] if half_life_days is not None else None
+
+        retailer = self.retailers[r_idx]
+        rows = []
+        for pos in self._ranked(confidence, counts, recency, limit):
+            row = self._product_row(candidates[pos])
+            row.update(
+                confidence_score=float(confidence[pos]),
+                popularity_score=int(counts[pos]),
+                recency_weight=None if recency is None else round(float(recency[pos]), 4),
+                business_type=retailer.get("business_type"),
+                retailer_size=retailer.get("size"),
+            )
+            rows.append(row)
+        return rows
+
+    def brand_loyalty_rows(self, retailer_id: str, limit: int, since_day: Optional[int] = None,
+                           as_of_day: Optional[int] = None, half_life_days: Optional[float] = None
+                           ) -> List[Dict[str, Any]]:
+        r_idx = self.retailer_index.get(retailer_id)
+        if r_idx is None:
+            return []
+        purchased = self._purchased(r_idx)
+        if purchased.size == 0:
+            return []
+
+        preferred = np.unique(self.product_brand[purchased])
+        preferred = preferred[preferred >= 0]
+        edges = self._edges(since_day)
+        popularity = edges.popularity()
+        keep = np.isin(self.product_brand, preferred) & (popularity >= 2)
+        keep[purchased] = False
+        candidates = np.flatnonzero(keep)
+        counts = popularity[candidates]
+        confidence = _confidence(counts, ((8, 0.8), (5, 0.7), (3, 0.6)), 0.5)
+        recency = edges.popularity(as_of_day, half_life_days)[candidates] if half_life_days is not None else None
+
+        rows = []
+        for pos in self._ranked(confidence, counts, recency, limit):
+            row = self._product_row(candidates[pos])
+            row.update(confidence_score=float(confidence[pos]), product_popularity=int(counts[pos]),
+                       recency_weight=None if recency is None else round(float(recency[pos]), 4))
+            rows.append(row)
+        return rows
+
+    def list_retailers(self, limit: int, after_name: Optional[str] = None, after_id: Optional[str] = None,
+                       **filters: str) -> List[Dict[str, Any]]:
+        start = bisect.bisect_right(self._listing_keys, (after_name, after_id)) if after_name is not None else 0
+        if filters:
+            # Walk the shortest posting list from the cursor and check the remaining filters per row
+            postings = sorted((self._listing_postings.get(key, _EMPTY) for key in filters.items()), key=len)
+            candidates = postings[0][np.searchsorted(postings[0], start):].tolist()
+        else:
+            candidates = range(start, len(self._listing_order))
+
+        rows = []
+        for pos in candidates:
+            r = self.retailers[self._listing_order[pos]]
+            if all(r.get(LISTING_FILTERS[name]) == value for name, value in filters.items()):
+                rows.append({"retailer_id": r["id"], "retailer_name": r.get("name"), "location": r.get("location"),
+                             "business_type": r.get("business_type"), "size": r.get("size"),
+                             "segment": r.get("customer_segment")})
+                if len(rows) == limit:
+                    break
+        return rows
+
+    def top_retailers(self, limit: int) -> List[Dict[str, Any]]:
+        degrees = np.diff(self.retailer_indptr)
+        if limit < degrees.size:
+            # Everything tied with the limit-th degree competes on id, as in the Cypher
+            threshold = np.partition(degrees, degrees.size - limit)[degrees.size - limit]
+            candidates = np.flatnonzero(degrees >= max(int(threshold), 1))
+        else:
+            candidates = np.flatnonzero(degrees > 0)
+        rows = sorted(((-int(degrees[r]), self.retailers[r]["id"]) for r in candidates.tolist()))[:limit]
+        return [{"retailer_id": retailer_id, "products_bought": -negative} for negative, retailer_id in rows]
+
+    def list_products(self) -> List[Dict[str, Any]]:
+        rows = []
+        for p_idx in np.argsort(np.array(self.product_names, dtype=object), kind="stable").tolist():
+            price = self.product_price[p_idx]
+            margin = self.product_margin[p_idx]
+            rows.append({
+                "product_name": self.product_names[p_idx],
+                "brand": self._label(self.brand_names, self.product_brand[p_idx]),
+                "category": self._label(self.category_names, self.product_category[p_idx]),
+                "supplier": self._label(self.supplier_names, self.product_supplier[p_idx]),
+                "price": None if np.isnan(price) else float(price),
+                "margin": None if np.isnan(margin) else float(margin),
+                "retailer_count": int(self.product_degree[p_idx]),
+            })
+        return rows
+
+    def peer_group_popularity(self) -> List[Dict[str, Any]]:
+        # Peer group (segment, size, location, business_type) of every retailer
+        groups: Dict[Tuple, int] = {}
+        retailer_group = np.array([
+            groups.setdefault((r.get("customer_segment"), r.get("size"), r.get("location"), r.get("business_type")),
+                              len(groups))
+            for r in self.retailers
+        ], dtype=np.int64)
+        degrees = np.diff(self.retailer_indptr)
+        group_sizes = np.bincount(retailer_group[degrees > 0], minlength=len(groups))
+
+        # Edges are unique per (retailer, product), so edge counts per (group, product) are distinct buyers
+        n_products = len(self.product_names)
+        pairs = np.repeat(retailer_group, degrees) * n_products + self.retailer_products
+        pairs, buyers = np.unique(pairs, return_counts=True)
+        keys = list(groups)
+        return [
+            {"segment": keys[g][0], "size": keys[g][1], "location": keys[g][2], "business_type": keys[g][3],
+             "retailers": int(group_sizes[g]), "product_name": self.product_names[p], "buyers": int(count)}
+            for g, p, count in zip((pairs // n_products).tolist(), (pairs % n_products).tolist(), buyers.tolist())
+        ]
+
+    def purchased_products(self, retailer_id: str) -> List[Dict[str, Any]]:
+        r_idx = self.retailer_index.get(retailer_id)
+        if r_idx is None:
+            return []
+        return [{"product_name": self.product_names[p]} for p in self._purchased(r_idx).tolist()]
+
+    def retailer_peer_groups(self, retailer_ids: List[str]) -> List[Dict[str, Any]]:
+        rows = []
+        for retailer_id in retailer_ids:
+            r_idx = self.retailer_index.get(retailer_id)
+            if r_idx is None:
+                continue
+            r = self.retailers[r_idx]
+            rows.append({"retailer_id": retailer_id, "segment": r.get("customer_segment"), "size": r.get("size"),
+                         "location": r.get("location"), "business_type": r.get("business_type"),
+                         "products_bought": int(self.retailer_indptr[r_idx + 1] - self.retailer_indptr[r_idx])})
+        return rows
+
+    def latest_purchase_day(self) -> List[Dict[str, Any]]:
+        return [{"day": self.latest_day}]
+
+    # ------------------------------------------------------------------ updates
+
+    def with_purchases(self, rows: Iterable[Mapping[str, Any]]) -> Tuple["InMemoryRecommendationGraph", List[bool]]:
+        """Copy of the graph with purchase rows (one per retailer and product, dated by "day") merged in,
+        plus whether each row added a new edge
+
+        This graph is left untouched, so queries in flight keep reading it until the caller swaps the
+        copy in. Retailers and products already in the graph keep their attributes; new ones take the
+        row's transaction fields.
+        """
+        rows = list(rows)
+        retailers = list(self.retailers)
+        # Plain dicts: on a snapshot-loaded graph the indexes are StringIndex lookups, not mappings
+        retailer_index = {retailer["id"]: i for i, retailer in enumerate(retailers)}
+        product_names = list(self.product_names)
+        product_index = {name: i for i, name in enumerate(product_names)}
+        new_products: List[Mapping[str, Any]] = []
+        row_retailers, row_products = [], []
+        for row in rows:
+            r_idx = retailer_index.get(row["retailer_id"])
+            if r_idx is None:
+                r_idx = retailer_index[row["retailer_id"]] = len(retailers)
+                retailers.append(_transaction_retailer(row))
+            p_idx = product_index.get(row["product_name"])
+            if p_idx is None:
+                p_idx = product_index[row["product_name"]] = len(product_names)
+                product_names.append(row["product_name"])
+                new_products.append(row)
+            row_retailers.append(r_idx)
+            row_products.append(p_idx)
+
+        def attribute(names: List[str], codes: np.ndarray, field: str) -> Tuple[List[str], np.ndarray]:
+            return _encode([self._label(names, code) for code in codes.tolist()] + [p.get(field) for p in new_products])
+
+        def measure(values: np.ndarray, field: str) -> np.ndarray:
+            added = [np.nan if p.get(field) is None else p[field] for p in new_products]
+            return np.concatenate((values, np.array(added, dtype=np.float64)))
+
+        brand_names, product_brand = attribute(self.brand_names, self.product_brand, "brand")
+        category_names, product_category = attribute(self.category_names, self.product_category, "category")
+        supplier_names, product_supplier = attribute(self.supplier_names, self.product_supplier, "supplier")
+
+        # Edges keyed retailer * products + product: the CSR order makes the existing keys sorted
+        n_products = len(product_names)
+        old_keys = (np.repeat(np.arange(len(self.retailers), dtype=np.int64), np.diff(self.retailer_indptr))
+                    * n_products + self.retailer_products)
+        new_keys = np.array(row_retailers, dtype=np.int64) * n_products + np.array(row_products, dtype=np.int64)
+        new_days = np.array([row["day"] for row in rows], dtype=np.int32)
+        positions = np.searchsorted(old_keys, new_keys)
+        inside = positions < old_keys.size
+        existing = np.zeros(new_keys.size, dtype=bool)
+        existing[inside] = old_keys[positions[inside]] == new_keys[inside]
+
+        days = np.array(self.retailer_days, dtype=np.int32)
+        np.maximum.at(days, positions[existing], new_days[existing])
+        keys = np.concatenate((old_keys, new_keys[~existing]))
+        days = np.concatenate((days, new_days[~existing]))
+        graph = type(self)(
+            retailers=retailers,
+            product_names=product_names,
+            brand_names=brand_names,
+            category_names=category_names,
+            supplier_names=supplier_names,
+            product_brand=product_brand,
+            product_category=product_category,
+            product_supplier=product_supplier,
+            product_price=measure(self.product_price, "unit_price"),
+            product_margin=measure(self.product_margin, "margin_percent"),
+            edge_retailers=(keys // n_products).astype(np.int32),
+            edge_products=(keys % n_products).astype(np.int32),
+            edge_days=days,
+        )
+        return graph, (~existing).tolist()
+
+    # ------------------------------------------------------------------ export
+
+    def write_to_neo4j(self, neo4j_graph, batch_size: int = 5000) -> Dict[str, int]:
+        """Load the graph into Neo4j with the node/relationship layout the engine queries"""
+        retailer_rows = [
+            {"id": r["id"], **{field: r.get(field) for field in RETAILER_FIELDS}} for r in self.retailers
+        ]
+        product_rows = []
+        for p_idx in range(len(self.product_names)):
+            row = self._product_row(p_idx)
+            product_rows.append({
+                "name": row["product_name"], "brand": row["brand"], "category": row["category"],
+                "supplier": row["supplier"], "price": row["avg_price"], "margin": row["avg_margin"],
+            })
+        edge_rows = np.repeat(np.arange(len(self.retailers)), np.diff(self.retailer_indptr))
+
+        statements = [
+            ("""
+            UNWIND $rows AS row
+            MERGE (r:Retailer {id: row.id})
+            SET r.name = row.name, r.location = row.location, r.business_type = row.business_type,
+                r.size = row.size, r.customer_segment = row.customer_segment
+            """, retailer_rows),
+            ("""
+            UNWIND $rows AS row
+            // Keyed on id with name set to the same value, as ingestion and purchase events write them
+            MERGE (p:Product {id: row.name})
+            SET p.name = row.name, p.brand = row.brand, p.category = row.category, p.supplier = row.supplier,
+                p.price = row.price, p.margin = row.margin
+            MERGE (b:Brand {id: row.brand}) SET b.name = row.brand
+            MERGE (c:Category {id: row.category}) SET c.name = row.category
+            MERGE (s:Supplier {id: row.supplier}) SET s.name = row.supplier
+            MERGE (p)-[:BELONGS_TO]->(b)
+            MERGE (p)-[:BELONGS_TO]->(c)
+            MERGE (s)-[:SUPPLIES]->(p)
+            """, product_rows),
+            ("""
+            UNWIND $rows AS row
+            MATCH (r:Retailer {id: row.retailer_id})
+            MATCH (p:Product {id: row.product_name})
+            MERGE (r)-[purchase:PURCHASES]->(p)
+            SET purchase.last_purchase_day = row.day
+            """, [
+                {"retailer_id": self.retailers[r]["id"], "product_name": self.product_names[p], "day": day}
+                for r, p, day in zip(edge_rows.tolist(), self.retailer_products.tolist(), self.retailer_days.tolist())
+            ]),
+        ]
+
+        for cypher, rows in statements:
+            for start in range(0, len(rows), batch_size):
+                neo4j_graph.query(cypher, {"rows": rows[start:start + batch_size]})
+
+        return {"retailers": len(retailer_rows), "products": len(product_rows), "purchases": self.edge_count}
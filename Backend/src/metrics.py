@@ -0,0 +1,284 @@
+"""
+Lightweight Prometheus-style metrics for the Qwipo services.
+
+Counters, gauges and histograms are kept in process memory behind a single
+uncontended lock per metric and rendered in the Prometheus text exposition
+format (0.0.4). No client library is required; the API serves the registry at
+/metrics and batch jobs such as ingestion can dump it to a textfile.
+"""
+
+import bisect
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; spans sub-millisecond in-process lookups up to slow Cypher and LLM calls
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RESULT_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class holding one value per label combination"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _labels(self, values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(f'{extra[0]}="{extra[1]}"')
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._labels(k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, *labels: str):
+        self.inc(-amount, *labels)
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._labels(k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Bucketed distribution with sum and count"""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def count(self, *labels: str) -> int:
+        state = self._values.get(labels)
+        return int(sum(state[:-1])) if state else 0
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for labels, state in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), state[:-1]):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{self._labels(labels, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """Atomically write the registry for a node_exporter textfile collector"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = MetricsRegistry()
+
+# API
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "qwipo_http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"))
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "qwipo_http_requests_in_flight", "HTTP requests currently being served")
+ADMISSION_IN_FLIGHT = REGISTRY.gauge(
+    "qwipo_admission_in_flight", "Heavy requests holding an admission slot")
+ADMISSION_QUEUE_DEPTH = REGISTRY.gauge(
+    "qwipo_admission_queue_depth", "Heavy requests waiting for an admission slot")
+ADMISSION_REJECTED = REGISTRY.counter(
+    "qwipo_admission_rejected_total", "Heavy requests shed with 503 by reason (queue_full/queue_timeout)",
+    ("reason",))
+
+# Recommendation engine
+RECOMMENDER_QUERY_SECONDS = REGISTRY.histogram(
+    "qwipo_recommender_query_duration_seconds", "Graph query execution time per engine query",
+    ("query", "backend"))
+RECOMMENDER_RESULTS = REGISTRY.histogram(
+    "qwipo_recommender_results", "Rows returned per engine query", ("query",), buckets=RESULT_COUNT_BUCKETS)
+RECOMMENDER_DEADLINE_MISSES = REGISTRY.counter(
+    "qwipo_recommender_deadline_misses_total", "Recommenders left out of a response because they missed its deadline",
+    ("type",))
+RECOMMENDER_QUERY_ERRORS = REGISTRY.counter(
+    "qwipo_recommender_query_errors_total", "Engine queries that raised", ("query", "backend"))
+ENGINE_STARTUP_SECONDS = REGISTRY.gauge(
+    "qwipo_engine_startup_seconds", "Time to construct the recommendation engine and connect its backend",
+    ("backend",))
+CACHE_REQUESTS = REGISTRY.counter(
+    "qwipo_cache_requests_total", "Cache lookups by cache and result (hit/miss)", ("cache", "result"))
+SINGLE_FLIGHT_REQUESTS = REGISTRY.counter(
+    "qwipo_singleflight_requests_total",
+    "Engine computations by kind: executed, or coalesced into an identical one already in flight",
+    ("kind", "result"))
+
+# Purchase events
+PURCHASE_EVENTS = REGISTRY.counter(
+    "qwipo_purchase_events_total", "Purchase events by outcome (accepted/rejected/applied/retried/dead_lettered)", ("result",))
+PURCHASE_EVENT_QUEUE_DEPTH = REGISTRY.gauge(
+    "qwipo_purchase_event_queue_depth", "Purchase events accepted but not yet applied")
+PURCHASE_EVENT_BATCH_SECONDS = REGISTRY.histogram(
+    "qwipo_purchase_event_batch_duration_seconds", "Time to apply one batch of purchase events")
+
+# Neo4j connection pools
+NEO4J_POOL_MAX_SIZE = REGISTRY.gauge(
+    "qwipo_neo4j_pool_max_size", "Configured maximum connections per pool", ("pool",))
+NEO4J_POOL_ACTIVE = REGISTRY.gauge(
+    "qwipo_neo4j_pool_active_transactions", "Transactions holding or waiting for a pooled connection", ("pool",))
+NEO4J_POOL_ACQUIRE_SECONDS = REGISTRY.histogram(
+    "qwipo_neo4j_pool_acquire_duration_seconds", "Wait until a transaction obtained a pooled connection",
+    ("pool",))
+
+# Ingestion
+INGESTION_LLM_CALL_SECONDS = REGISTRY.histogram(
+    "qwipo_ingestion_llm_call_duration_seconds", "LLM graph extraction latency per batch", ("status",))
+INGESTION_LLM_TOKENS = REGISTRY.counter(
+    "qwipo_ingestion_llm_tokens_total", "Tokens consumed by LLM extraction", ("kind",))
+INGESTION_WRITES = REGISTRY.counter(
+    "qwipo_ingestion_writes_total", "Graph elements written to Neo4j", ("kind",))
+INGESTION_WRITE_SECONDS = REGISTRY.histogram(
+    "qwipo_ingestion_write_duration_seconds", "Neo4j write time per graph document")
+INGESTION_WRITE_THROUGHPUT = REGISTRY.gauge(
+    "qwipo_ingestion_write_throughput_per_second", "Graph elements written per second in the last run")
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """Count a cache hit or miss; the hit ratio is hits / (hits + misses)"""
+    CACHE_REQUESTS.inc(1.0, cache, "hit" if hit else "miss")
+
+
+class PrometheusMiddleware:
+    """Pure ASGI middleware recording per-route latency and in-flight requests"""
+
+    def __init__(self, app, skip_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status_holder = ["500"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = str(message["status"])
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # The router stores the matched route in the shared scope; label by its
+            # template so per-retailer paths do not explode label cardinality
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, scope.get("method", ""),
+                getattr(route, "path", "unmatched"), status_holder[0])
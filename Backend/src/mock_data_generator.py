@@ -3,7 +3,6 @@ import json
 import uuid
 from datetime import datetime, timedelta
 from typing import List, Dict, Tuple
-import pandas as pd
 from dataclasses import asdict
 
 class QwipoMockDataGenerator:
@@ -0,0 +1,151 @@
+"""
+Shared Neo4j driver pools for the engine, API and ingestion.
+
+One process keeps a single pair of drivers per (uri, user, database): a read
+driver whose sessions run in READ access mode (routed to followers/read
+replicas on neo4j:// clusters) and a write driver for ingestion and admin
+queries. Each has its own bounded connection pool, so a bulk ingestion run
+cannot exhaust the connections the API needs to answer recommendations.
+Sessions are reused per thread instead of being opened for every query.
+Reads can carry a transaction timeout that the server enforces, so a slow
+query is terminated on the database instead of holding a connection and a
+worker thread after the request that issued it has given up.
+"""
+
+import dataclasses
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config.ingestion_config import IngestionConfig
+from metrics import NEO4J_POOL_ACQUIRE_SECONDS, NEO4J_POOL_ACTIVE, NEO4J_POOL_MAX_SIZE
+
+_pools: Dict[tuple, "Neo4jConnectionPool"] = {}
+_pools_lock = threading.Lock()
+
+
+class Neo4jConnectionPool:
+    """Read and write drivers with separately sized pools and per-thread sessions"""
+
+    def __init__(self, config: IngestionConfig):
+        # Imported here so processes serving the in-process graph never load the driver
+        from neo4j import GraphDatabase, READ_ACCESS, WRITE_ACCESS, unit_of_work
+        from neo4j.exceptions import ClientError
+
+        self.config = config
+        self.database = config.NEO4J_DATABASE
+        auth = (config.NEO4J_USERNAME, config.NEO4J_PASSWORD)
+        self._drivers = {
+            "read": GraphDatabase.driver(config.NEO4J_URI, auth=auth, **self.driver_config("read")),
+            "write": GraphDatabase.driver(config.NEO4J_URI, auth=auth, **self.driver_config("write")),
+        }
+        self._access_modes = {"read": READ_ACCESS, "write": WRITE_ACCESS}
+        self._unit_of_work = unit_of_work
+        self._client_error = ClientError
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+        NEO4J_POOL_MAX_SIZE.set(config.NEO4J_READ_POOL_SIZE, "read")
+        NEO4J_POOL_MAX_SIZE.set(config.NEO4J_WRITE_POOL_SIZE, "write")
+
+    def driver_config(self, pool: str) -> Dict[str, Any]:
+        """Keyword arguments for GraphDatabase.driver for the read or write pool"""
+        return {
+            "max_connection_pool_size": (self.config.NEO4J_READ_POOL_SIZE if pool == "read"
+                                         else self.config.NEO4J_WRITE_POOL_SIZE),
+            "connection_acquisition_timeout": self.config.NEO4J_ACQUISITION_TIMEOUT,
+            "max_connection_lifetime": self.config.NEO4J_MAX_CONNECTION_LIFETIME,
+            "fetch_size": self.config.NEO4J_FETCH_SIZE,
+            "user_agent": f"qwipo-{pool}",
+        }
+
+    def driver(self, pool: str = "read"):
+        return self._drivers[pool]
+
+    def session(self, pool: str = "read"):
+        """This thread's session for the pool, opened on first use"""
+        session = getattr(self._local, pool, None)
+        if session is None or session.closed():
+            session = self._drivers[pool].session(
+                database=self.database,
+                default_access_mode=self._access_modes[pool],
+                fetch_size=self.config.NEO4J_FETCH_SIZE,
+            )
+            setattr(self._local, pool, session)
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def _execute(self, pool: str, cypher: str, params: Optional[Dict[str, Any]],
+                 timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        session = self.session(pool)
+        requested = time.perf_counter()
+        acquired = []
+
+        def work(tx):
+            # Entered once the driver has handed the transaction a connection
+            if not acquired:
+                acquired.append(time.perf_counter())
+                NEO4J_POOL_ACQUIRE_SECONDS.observe(acquired[0] - requested, pool)
+            return tx.run(cypher, params or {}).data()
+
+        if timeout is not None:
+            work = self._unit_of_work(timeout=timeout)(work)
+
+        NEO4J_POOL_ACTIVE.inc(1.0, pool)
+        try:
+            if pool == "read":
+                return session.execute_read(work)
+            return session.execute_write(work)
+        except self._client_error as e:
+            if "TransactionTimedOut" in (e.code or ""):
+                raise TimeoutError(f"Query exceeded its {timeout}s transaction timeout") from e
+            raise
+        finally:
+            NEO4J_POOL_ACTIVE.dec(1.0, pool)
+
+    def read(self, cypher: str, params: Optional[Dict[str, Any]] = None,
+             timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Run a query in a managed read transaction on the read pool, terminated after timeout seconds"""
+        return self._execute("read", cypher, params, timeout)
+
+    def write(self, cypher: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Run a query in a managed write transaction on the write pool"""
+        return self._execute("write", cypher, params)
+
+    def query(self, cypher: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Neo4jGraph.query-compatible entry point; runs on the write pool like langchain does"""
+        return self.write(cypher, params)
+
+    def verify_connectivity(self):
+        self._drivers["read"].verify_connectivity()
+
+    def close(self):
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+        for driver in self._drivers.values():
+            driver.close()
+
+
+def get_neo4j_pool(config: Optional[IngestionConfig] = None, **overrides) -> Neo4jConnectionPool:
+    """Process-wide pool for the configured database, created on first use"""
+    config = config or IngestionConfig.from_env()
+    if overrides:
+        config = dataclasses.replace(config, **{k: v for k, v in overrides.items() if v is not None})
+    key = (config.NEO4J_URI, config.NEO4J_USERNAME, config.NEO4J_DATABASE)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = Neo4jConnectionPool(config)
+        return pool
+
+
+def close_neo4j_pools():
+    """Close every shared pool (API shutdown, end of an ingestion run)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
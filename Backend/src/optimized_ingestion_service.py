@@ -4,17 +4,25 @@ from typing import List, Dict, Any
 from datetime import datetime
 from dotenv import load_dotenv
 import time
+import urllib.request
 from tqdm import tqdm
 
 from langchain_experimental.graph_transformers import LLMGraphTransformer
 from langchain_openai import ChatOpenAI
 from langchain_core.documents import Document
-try:
-    from langchain_neo4j import Neo4jGraph
-except ImportError:
-    from langchain_community.graphs import Neo4jGraph
+from langchain_community.callbacks import get_openai_callback
 
+from neo4j_pool import get_neo4j_pool
+from purchase_events import aggregate_purchases
 from schema import NodeType, RelationshipType
+from metrics import (
+    REGISTRY, INGESTION_LLM_CALL_SECONDS, INGESTION_LLM_TOKENS, INGESTION_WRITES,
+    INGESTION_WRITE_SECONDS, INGESTION_WRITE_THROUGHPUT
+)
+from structured_logging import get_logger
+from tracing import span
+
+logger = get_logger("ingestion")
 
 class OptimizedQwipoIngestionService:
     def __init__(self, neo4j_uri: str, neo4j_username: str, neo4j_password: str, openai_api_key: str):
@@ -35,11 +43,11 @@ class OptimizedQwipoIngestionService:
             timeout=60  # Add timeout
         )
         
-        # Set up Neo4j connection
-        self.neo4j_graph = Neo4jGraph(
-            url=neo4j_uri,
-            username=neo4j_username,
-            password=neo4j_password
+        # Set up Neo4j connection (shared write pool, separate from the API's read pool)
+        self.neo4j_graph = get_neo4j_pool(
+            NEO4J_URI=neo4j_uri,
+            NEO4J_USERNAME=neo4j_username,
+            NEO4J_PASSWORD=neo4j_password
         )
         
         # Configure LLM Graph Transformer with Qwipo-specific schema
@@ -64,12 +72,20 @@ class OptimizedQwipoIngestionService:
             "CREATE CONSTRAINT brand_name IF NOT EXISTS FOR (b:Brand) REQUIRE b.name IS UNIQUE",
             "CREATE CONSTRAINT supplier_name IF NOT EXISTS FOR (s:Supplier) REQUIRE s.name IS UNIQUE",
             "CREATE CONSTRAINT category_name IF NOT EXISTS FOR (c:Category) REQUIRE c.name IS UNIQUE",
-            "CREATE CONSTRAINT location_name IF NOT EXISTS FOR (l:Location) REQUIRE l.name IS UNIQUE"
+            "CREATE CONSTRAINT location_name IF NOT EXISTS FOR (l:Location) REQUIRE l.name IS UNIQUE",
+            # Range indexes for the keyset-paginated, filtered /retailers listing
+            "CREATE INDEX retailer_name IF NOT EXISTS FOR (r:Retailer) ON (r.name)",
+            "CREATE INDEX retailer_location IF NOT EXISTS FOR (r:Retailer) ON (r.location)",
+            "CREATE INDEX retailer_business_type IF NOT EXISTS FOR (r:Retailer) ON (r.business_type)",
+            "CREATE INDEX retailer_size IF NOT EXISTS FOR (r:Retailer) ON (r.size)",
+            "CREATE INDEX retailer_segment IF NOT EXISTS FOR (r:Retailer) ON (r.customer_segment)",
+            # Relationship range index for the recency reference day (the newest purchase)
+            "CREATE INDEX purchases_last_day IF NOT EXISTS FOR ()-[p:PURCHASES]-() ON (p.last_purchase_day)"
         ]
         
         for constraint in constraints:
             try:
-                self.neo4j_graph.query(constraint)
+                self.neo4j_graph.write(constraint)
                 print(f"✅ Created constraint: {constraint.split('FOR')[1].split('REQUIRE')[0].strip()}")
             except Exception as e:
                 print(f"⚠️ Constraint may already exist: {e}")
@@ -134,12 +150,20 @@ Recent Purchases:"""
                 batch = documents[i:i + batch_size]
                 batch_num = (i // batch_size) + 1
                 
-                print(f"\n📦 Processing batch {batch_num}/{total_batches} ({len(batch)} documents)...")
+                logger.debug(
+                    "Processing batch",
+                    extra={"batch": batch_num, "total_batches": total_batches, "documents": len(batch)}
+                )
                 
                 try:
                     start_time = time.time()
-                    batch_graph_docs = self.llm_transformer.convert_to_graph_documents(batch)
+                    with span("ingestion.llm_batch", batch=batch_num, documents=len(batch)), \
+                            get_openai_callback() as usage:
+                        batch_graph_docs = self.llm_transformer.convert_to_graph_documents(batch)
                     processing_time = time.time() - start_time
+                    INGESTION_LLM_CALL_SECONDS.observe(processing_time, "ok")
+                    INGESTION_LLM_TOKENS.inc(usage.prompt_tokens, "prompt")
+                    INGESTION_LLM_TOKENS.inc(usage.completion_tokens, "completion")
                     
                     all_graph_documents.extend(batch_graph_docs)
                     
@@ -147,8 +171,18 @@ Recent Purchases:"""
                     total_nodes = sum(len(doc.nodes) for doc in batch_graph_docs)
                     total_rels = sum(len(doc.relationships) for doc in batch_graph_docs)
                     
-                    print(f"✅ Batch {batch_num} completed in {processing_time:.1f}s")
-                    print(f"   📊 Extracted: {total_nodes} nodes, {total_rels} relationships")
+                    logger.info(
+                        "Batch extracted",
+                        extra={
+                            "batch": batch_num,
+                            "total_batches": total_batches,
+                            "duration_s": round(processing_time, 2),
+                            "nodes": total_nodes,
+                            "relationships": total_rels,
+                            "prompt_tokens": usage.prompt_tokens,
+                            "completion_tokens": usage.completion_tokens,
+                        }
+                    )
                     
                     pbar.update(len(batch))
                     
@@ -156,8 +190,11 @@ Recent Purchases:"""
                     time.sleep(1)
                     
                 except Exception as e:
-                    print(f"❌ Error in batch {batch_num}: {e}")
-                    print("🔄 Continuing with next batch...")
+                    INGESTION_LLM_CALL_SECONDS.observe(time.time() - start_time, "error")
+                    logger.error(
+                        "Batch extraction failed, continuing with next batch",
+                        extra={"batch": batch_num, "error": str(e)}
+                    )
                     pbar.update(len(batch))
                     continue
         
@@ -170,10 +207,12 @@ Recent Purchases:"""
         
         total_nodes = 0
         total_relationships = 0
+        ingestion_start = time.time()
         
         try:
             with tqdm(total=len(graph_documents), desc="Ingesting to Neo4j") as pbar:
                 for i, graph_doc in enumerate(graph_documents):
+                    write_start = time.time()
                     # Batch nodes
                     node_queries = []
                     for node in graph_doc.nodes:
@@ -193,8 +232,9 @@ Recent Purchases:"""
                     
                     # Execute node queries
                     for node_query in node_queries:
-                        self.neo4j_graph.query(node_query["query"], node_query["params"])
+                        self.neo4j_graph.write(node_query["query"], node_query["params"])
                         total_nodes += 1
+                    INGESTION_WRITES.inc(len(node_queries), "node")
                     
                     # Batch relationships
                     rel_queries = []
@@ -216,14 +256,21 @@ Recent Purchases:"""
                     
                     # Execute relationship queries
                     for rel_query in rel_queries:
-                        self.neo4j_graph.query(rel_query["query"], rel_query["params"])
+                        self.neo4j_graph.write(rel_query["query"], rel_query["params"])
                         total_relationships += 1
+                    INGESTION_WRITES.inc(len(rel_queries), "relationship")
+                    INGESTION_WRITE_SECONDS.observe(time.time() - write_start)
                     
                     pbar.update(1)
             
+            elapsed = time.time() - ingestion_start
+            throughput = (total_nodes + total_relationships) / elapsed if elapsed > 0 else 0.0
+            INGESTION_WRITE_THROUGHPUT.set(throughput)
+            
             print(f"✅ Successfully ingested:")
             print(f"   📦 {total_nodes} nodes")
             print(f"   🔗 {total_relationships} relationships")
+            print(f"   ⚡ {throughput:.1f} writes/s")
             
             return {"nodes": total_nodes, "relationships": total_relationships}
             
@@ -258,8 +305,93 @@ Recent Purchases:"""
         # Ingest into Neo4j
         print("\n📊 Ingesting into Neo4j Knowledge Graph...")
         ingestion_stats = self.ingest_graph_documents_optimized(graph_documents)
+        ingestion_stats["dated_purchases"] = write_purchase_days(self.neo4j_graph, retailers_data, transactions_data)
+        print(f"📅 Purchase days set on {ingestion_stats['dated_purchases']} purchase edges")
         
         print("\n🎉 Optimized ingestion pipeline completed successfully!")
         print(f"📈 Final Stats: {ingestion_stats}")
+        print(f"🪙 LLM tokens used: {int(INGESTION_LLM_TOKENS.value('prompt'))} prompt, "
+              f"{int(INGESTION_LLM_TOKENS.value('completion'))} completion")
         
+        # Export run metrics for a node_exporter textfile collector / Pushgateway scrape
+        metrics_file = os.getenv("QWIPO_METRICS_TEXTFILE")
+        if metrics_file:
+            REGISTRY.write_textfile(metrics_file)
+            print(f"📊 Metrics written to: {metrics_file}")
+        
+        write_graph_snapshot(retailers_data, transactions_data)
+        notify_api_reload()
         return ingestion_stats
+
+
+# Latest purchase day of each ingested purchase edge, read by the windowed/decayed recommenders.
+# The LLM keys a retailer by its id or its name and a product by its name; kept as a maximum so
+# it never moves an edge back in time, the same as purchase events do.
+PURCHASE_DAYS_CYPHER = """
+UNWIND $rows AS row
+MATCH (r:Retailer) WHERE r.id IN [row.retailer_id, row.retailer_name]
+MATCH (r)-[purchase:PURCHASES]->(:Product {name: row.product_name})
+SET purchase.last_purchase_day = CASE
+    WHEN coalesce(purchase.last_purchase_day, -1) < row.day THEN row.day
+    ELSE purchase.last_purchase_day END
+RETURN count(purchase) AS edges
+"""
+
+
+def purchase_day_rows(retailers_data: List[Dict[str, Any]], transactions_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One PURCHASE_DAYS_CYPHER row per (retailer, product) with its latest purchase day"""
+    retailer_names = {retailer["id"]: retailer["name"] for retailer in retailers_data}
+    return [
+        {
+            "retailer_id": row["retailer_id"],
+            "retailer_name": retailer_names.get(row["retailer_id"], row["retailer_id"]),
+            "product_name": row["product_name"],
+            "day": row["day"],
+        }
+        for row in aggregate_purchases(transactions_data)
+    ]
+
+
+def write_purchase_days(neo4j_graph, retailers_data: List[Dict[str, Any]], transactions_data: List[Dict[str, Any]],
+                        batch_size: int = 1000) -> int:
+    """Set last_purchase_day on the purchase edges in the graph; returns how many edges were dated"""
+    rows = purchase_day_rows(retailers_data, transactions_data)
+    edges = 0
+    for start in range(0, len(rows), batch_size):
+        result = neo4j_graph.write(PURCHASE_DAYS_CYPHER, {"rows": rows[start:start + batch_size]})
+        edges += result[0]["edges"] if result else 0
+    INGESTION_WRITES.inc(edges, "purchase_day")
+    return edges
+
+
+def write_graph_snapshot(retailers_data: List[Dict[str, Any]], transactions_data: List[Dict[str, Any]]):
+    """Write the memory-mapped graph snapshot API workers load at startup (QWIPO_SNAPSHOT_FILE)"""
+    snapshot_file = os.getenv("QWIPO_SNAPSHOT_FILE")
+    if not snapshot_file:
+        return
+    
+    from in_memory_graph import InMemoryRecommendationGraph
+    from graph_snapshot import write_snapshot
+    
+    start = time.perf_counter()
+    graph = InMemoryRecommendationGraph.from_transactions(retailers_data, transactions_data)
+    header = write_snapshot(graph, snapshot_file, source={"pipeline": "ingestion"})
+    print(f"📸 Graph snapshot written to: {snapshot_file} ({header['counts']}, "
+          f"{time.perf_counter() - start:.2f}s)")
+
+
+def notify_api_reload():
+    """Ask a running API to rebuild its in-memory indexes from the updated graph (QWIPO_API_RELOAD_URL)"""
+    reload_url = os.getenv("QWIPO_API_RELOAD_URL")
+    if not reload_url:
+        return
+    
+    request = urllib.request.Request(reload_url, method="POST", data=b"")
+    admin_token = os.getenv("QWIPO_ADMIN_TOKEN")
+    if admin_token:
+        request.add_header("X-Admin-Token", admin_token)
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            print(f"🔄 API indexes reloaded: {json.loads(response.read())}")
+    except Exception as e:
+        logger.warning("API index reload failed", extra={"url": reload_url, "error": str(e)})
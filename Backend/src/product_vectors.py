@@ -0,0 +1,170 @@
+"""
+Content vectors for products: hashed TF-IDF over name, brand, category, sub_category and unit.
+
+Each product becomes a bag of field-tagged word tokens plus character trigrams of
+its name (so "Noodle" and "Noodles" overlap). Features are weighted by term
+frequency times inverse document frequency and hashed with a stable CRC32 into a
+fixed number of signed buckets, then every row is L2-normalized. Similarity is a
+dot product against the float32 matrix, so top-k search is one brute-force
+matrix-vector product. Everything is computed locally from catalog text; no model
+or network access is needed, and products with no purchases get vectors too.
+
+With a shared directory the matrix is written once as a .npy file named by a
+fingerprint of the products, and every API worker memory-maps that file instead
+of building its own copy.
+"""
+
+import glob
+import hashlib
+import json
+import math
+import os
+import zlib
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from search_index import tokenize, trigrams
+
+# Field -> weight of its tokens in the product vector
+VECTOR_FIELDS = {
+    "product_name": 1.0,
+    "brand": 0.8,
+    "sub_category": 0.7,
+    "category": 0.5,
+    "unit": 0.3,
+}
+# Weight of product-name character trigrams relative to whole name tokens
+TRIGRAM_WEIGHT = 0.5
+DEFAULT_DIMENSIONS = 512
+
+
+def product_features(product: Mapping[str, Any]) -> Dict[str, float]:
+    """Field-tagged features of a product with their term weights"""
+    features: Dict[str, float] = {}
+    for field, weight in VECTOR_FIELDS.items():
+        for token in tokenize(product.get(field)):
+            key = f"{field}:{token}"
+            features[key] = features.get(key, 0.0) + weight
+            if field == "product_name" and not token.isdigit():
+                for gram in trigrams(token):
+                    key = f"gram:{gram}"
+                    features[key] = features.get(key, 0.0) + weight * TRIGRAM_WEIGHT
+    return features
+
+
+def vectors_fingerprint(products: Sequence[Mapping[str, Any]], dimensions: int = DEFAULT_DIMENSIONS) -> str:
+    """Digest of everything the vector matrix depends on, to name its shared file"""
+    digest = hashlib.sha1(json.dumps({
+        "dimensions": dimensions,
+        "fields": VECTOR_FIELDS,
+        "trigram_weight": TRIGRAM_WEIGHT,
+        "products": [[row.get(field) for field in VECTOR_FIELDS] for row in products],
+    }, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class ProductVectorIndex:
+    """L2-normalized float32 product vectors with brute-force top-k cosine search"""
+
+    def __init__(self, products: Iterable[Mapping[str, Any]], dimensions: int = DEFAULT_DIMENSIONS,
+                 matrix: Optional[np.ndarray] = None):
+        self.products = [dict(row) for row in products if row.get("product_name")]
+        self.index = {row["product_name"]: i for i, row in enumerate(self.products)}
+        self.dimensions = dimensions
+        self.matrix = matrix if matrix is not None else self._build_matrix()
+
+    def _build_matrix(self) -> np.ndarray:
+        dimensions = self.dimensions
+        documents = [product_features(row) for row in self.products]
+        document_frequency: Dict[str, int] = {}
+        for features in documents:
+            for feature in features:
+                document_frequency[feature] = document_frequency.get(feature, 0) + 1
+
+        # Stable hashing (not hash(), which is salted per process) so vectors match across workers
+        buckets: Dict[str, Tuple[int, float]] = {}
+        for feature, df in document_frequency.items():
+            h = zlib.crc32(feature.encode("utf-8"))
+            idf = math.log((1 + len(documents)) / (1 + df)) + 1.0
+            buckets[feature] = (h % dimensions, idf if (h >> 31) & 1 else -idf)
+
+        rows, cols, values = [], [], []
+        for i, features in enumerate(documents):
+            for feature, tf in features.items():
+                bucket, signed_idf = buckets[feature]
+                rows.append(i)
+                cols.append(bucket)
+                values.append(tf * signed_idf)
+        cells = np.array(rows, dtype=np.int64) * dimensions + np.array(cols, dtype=np.int64)
+        matrix = np.bincount(cells, weights=np.array(values, dtype=np.float64),
+                             minlength=len(self.products) * dimensions)
+        matrix = matrix.reshape(len(self.products), dimensions).astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms > 0, norms, 1.0)
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def __contains__(self, product_name: str) -> bool:
+        return product_name in self.index
+
+    def profile_vector(self, product_names: Sequence[str]) -> Optional[np.ndarray]:
+        """Normalized centroid of the known products among product_names"""
+        rows = [self.index[name] for name in product_names if name in self.index]
+        if not rows:
+            return None
+        centroid = self.matrix[rows].sum(axis=0)
+        norm = np.linalg.norm(centroid)
+        return centroid / norm if norm > 0 else None
+
+    def nearest(self, vector: np.ndarray, k: int, exclude: Sequence[str] = ()) -> List[Tuple[int, float]]:
+        """(row, cosine similarity) of the k products closest to a normalized vector"""
+        scores = self.matrix @ vector.astype(np.float32, copy=False)
+        excluded = [self.index[name] for name in exclude if name in self.index]
+        scores[excluded] = -np.inf
+        k = min(k, len(self.products) - len(excluded))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((top, -scores[top]))]
+        return [(int(row), float(scores[row])) for row in top if scores[row] > 0]
+
+    def similar(self, product_name: str, k: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """Products most similar to product_name with their similarity, or None for an unknown product"""
+        row = self.index.get(product_name)
+        if row is None:
+            return None
+        return [
+            {**self.products[other], "similarity": round(score, 4)}
+            for other, score in self.nearest(self.matrix[row], k, exclude=(product_name,))
+        ]
+
+
+def load_or_build_vectors(products: Iterable[Mapping[str, Any]], shared_dir: Optional[str] = None,
+                          dimensions: int = DEFAULT_DIMENSIONS) -> ProductVectorIndex:
+    """Product vectors whose matrix is memory-mapped from shared_dir, built and written there on first use"""
+    rows = [dict(row) for row in products if row.get("product_name")]
+    if not shared_dir:
+        return ProductVectorIndex(rows, dimensions)
+    path = os.path.join(shared_dir, f"product_vectors-{vectors_fingerprint(rows, dimensions)}.npy")
+    try:
+        return ProductVectorIndex(rows, dimensions, matrix=np.load(path, mmap_mode="r"))
+    except (OSError, ValueError):
+        pass
+
+    index = ProductVectorIndex(rows, dimensions)
+    os.makedirs(shared_dir, exist_ok=True)
+    temporary = f"{path}.tmp{os.getpid()}"
+    with open(temporary, "wb") as f:
+        np.save(f, index.matrix)
+    os.replace(temporary, path)
+    # Workers still mapping an older matrix keep their pages after the unlink
+    for stale in glob.glob(os.path.join(shared_dir, "product_vectors-*.npy")):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    index.matrix = np.load(path, mmap_mode="r")
+    return index
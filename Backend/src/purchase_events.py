@@ -0,0 +1,252 @@
+"""
+Real-time purchase events: new orders reach recommendations without a full ingestion run.
+
+POST /events/purchases accepts transaction records shaped like transactions.json.
+They are queued and a background task applies them in batches: up to max_batch
+events, or whatever arrived within flush_seconds of the first one. Each batch is
+aggregated to one row per (retailer, product) and handed to the engine on a
+worker thread, so a burst of orders becomes one graph write and request latency
+never includes it. The queue is bounded; once max_pending events are waiting,
+submit() raises QueueFull and the API answers 503 instead of buffering without
+limit.
+
+A batch that fails is retried with backoff and, if it keeps failing, appended to a
+dead-letter file (QWIPO_EVENT_DEAD_LETTER_FILE) for replay. Accepted requests get
+a submission id whose outcome GET /events/purchases/{id} reports, so a client
+told 202 can still learn its orders were not applied.
+"""
+
+import asyncio
+import json
+import math
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from in_memory_graph import purchase_day
+from metrics import PURCHASE_EVENT_BATCH_SECONDS, PURCHASE_EVENT_QUEUE_DEPTH, PURCHASE_EVENTS
+from structured_logging import get_logger
+
+logger = get_logger("purchase_events")
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_SECONDS = 0.5
+DEFAULT_MAX_PENDING = 50000
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_SECONDS = 1.0
+DEFAULT_DEAD_LETTER_FILE = "dead_letter/purchase_events.jsonl"
+# Submission statuses kept for GET /events/purchases/{id}, oldest forgotten first
+STATUS_HISTORY = 10000
+
+REQUIRED_FIELDS = ("retailer_id", "product_name", "purchase_date")
+
+
+class QueueFull(Exception):
+    """Too many events are already waiting to be applied"""
+
+
+def validate_purchase_events(records: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """Transaction records with their required fields checked; raises ValueError naming the first bad one"""
+    events = []
+    for position, record in enumerate(records):
+        if not isinstance(record, Mapping):
+            raise ValueError(f"Event {position} is not an object")
+        missing = [field for field in REQUIRED_FIELDS if not record.get(field)]
+        if missing:
+            raise ValueError(f"Event {position} is missing {', '.join(missing)}")
+        try:
+            purchase_day(str(record["purchase_date"]))
+        except ValueError:
+            raise ValueError(f"Event {position} has an invalid purchase_date: {record['purchase_date']}")
+        events.append(dict(record))
+    return events
+
+
+def aggregate_purchases(events: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """One row per (retailer, product): its newest record plus "day", the latest purchase day"""
+    rows: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for event in events:
+        day = purchase_day(str(event["purchase_date"]))
+        key = (event["retailer_id"], event["product_name"])
+        row = rows.get(key)
+        if row is None or day >= row["day"]:
+            rows[key] = {**event, "day": day}
+    return list(rows.values())
+
+
+@dataclass
+class Submission:
+    """One accepted request's events, the future of a caller waiting for them, and its attempts so far"""
+    id: str
+    events: List[Dict[str, Any]]
+    future: Optional[asyncio.Future] = None
+    attempts: int = 0
+
+
+class PurchaseEventBatcher:
+    """Bounded queue of purchase events applied by a single background task in batches
+
+    A batch whose apply fails goes back to the front of the queue and is retried after an
+    exponential backoff; after max_attempts (or a failure while draining on shutdown) its events
+    are appended to dead_letter_file. Each submission's outcome is reported by status().
+    """
+
+    def __init__(self, apply: Callable[[List[Dict[str, Any]]], Awaitable[Dict[str, Any]]],
+                 max_batch: int = DEFAULT_BATCH_SIZE, flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+                 max_pending: int = DEFAULT_MAX_PENDING, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 retry_seconds: float = DEFAULT_RETRY_SECONDS, dead_letter_file: str = DEFAULT_DEAD_LETTER_FILE):
+        self.apply = apply
+        self.max_batch = max(max_batch, 1)
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.max_attempts = max(max_attempts, 1)
+        self.retry_seconds = retry_seconds
+        self.dead_letter_file = dead_letter_file
+        self.pending = 0
+        # Submissions in arrival order; retried ones go back to the front
+        self._submissions: Deque[Submission] = deque()
+        self._statuses: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self._full = asyncio.Event()
+
+    @classmethod
+    def from_env(cls, apply: Callable[[List[Dict[str, Any]]], Awaitable[Dict[str, Any]]]) -> "PurchaseEventBatcher":
+        return cls(
+            apply,
+            int(os.getenv("QWIPO_EVENT_BATCH_SIZE", str(DEFAULT_BATCH_SIZE))),
+            float(os.getenv("QWIPO_EVENT_FLUSH_SECONDS", str(DEFAULT_FLUSH_SECONDS))),
+            int(os.getenv("QWIPO_EVENT_QUEUE_SIZE", str(DEFAULT_MAX_PENDING))),
+            int(os.getenv("QWIPO_EVENT_MAX_ATTEMPTS", str(DEFAULT_MAX_ATTEMPTS))),
+            float(os.getenv("QWIPO_EVENT_RETRY_SECONDS", str(DEFAULT_RETRY_SECONDS))),
+            os.getenv("QWIPO_EVENT_DEAD_LETTER_FILE", DEFAULT_DEAD_LETTER_FILE),
+        )
+
+    def retry_after(self) -> int:
+        """Seconds until the queued events have been taken in batches"""
+        return max(1, math.ceil((self.pending / self.max_batch + 1) * self.flush_seconds))
+
+    def submit(self, events: List[Dict[str, Any]], wait: bool = False) -> Submission:
+        """Queue events; with wait, the submission's future resolves with the stats of the batch that applied them"""
+        if self.pending + len(events) > self.max_pending:
+            PURCHASE_EVENTS.inc(len(events), "rejected")
+            raise QueueFull(f"{self.pending} purchase events are already waiting")
+        future = asyncio.get_running_loop().create_future() if wait else None
+        submission = Submission(uuid.uuid4().hex, events, future)
+        self._submissions.append(submission)
+        self._set_status(submission, "queued")
+        self.pending += len(events)
+        PURCHASE_EVENTS.inc(len(events), "accepted")
+        PURCHASE_EVENT_QUEUE_DEPTH.set(self.pending)
+        self._ready.set()
+        if self.pending >= self.max_batch:
+            self._full.set()
+        return submission
+
+    def status(self, submission_id: str) -> Optional[Dict[str, Any]]:
+        """Outcome of a submission: queued, retrying, applied or dead_lettered (None once forgotten)"""
+        status = self._statuses.get(submission_id)
+        return dict(status) if status is not None else None
+
+    async def run(self):
+        """Apply queued events until cancelled"""
+        while True:
+            await self._ready.wait()
+            if self.pending < self.max_batch:
+                # Give a burst flush_seconds to accumulate into one write
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_seconds)
+                except asyncio.TimeoutError:
+                    pass
+            await self._apply_next(retry=True)
+            if not self._submissions:
+                self._ready.clear()
+            if self.pending < self.max_batch:
+                self._full.clear()
+
+    async def drain(self):
+        """Apply everything still queued (on shutdown); what fails goes straight to the dead-letter file"""
+        while self._submissions:
+            await self._apply_next(retry=False)
+
+    async def _apply_next(self, retry: bool):
+        submissions: List[Submission] = []
+        batch: List[Dict[str, Any]] = []
+        # Whole submissions only, so a caller's events land in one batch
+        while self._submissions and (not batch or len(batch) + len(self._submissions[0].events) <= self.max_batch):
+            submission = self._submissions.popleft()
+            submissions.append(submission)
+            batch.extend(submission.events)
+        self.pending -= len(batch)
+        PURCHASE_EVENT_QUEUE_DEPTH.set(self.pending)
+
+        start = time.perf_counter()
+        try:
+            stats = await self.apply(batch)
+        except Exception as e:
+            await self._failed(submissions, batch, e, retry)
+            return
+        finally:
+            PURCHASE_EVENT_BATCH_SECONDS.observe(time.perf_counter() - start)
+        PURCHASE_EVENTS.inc(len(batch), "applied")
+        for submission in submissions:
+            self._set_status(submission, "applied")
+            if submission.future is not None and not submission.future.done():
+                submission.future.set_result(stats)
+
+    async def _failed(self, submissions: List[Submission], batch: List[Dict[str, Any]], error: Exception,
+                      retry: bool):
+        attempts = max(submission.attempts for submission in submissions) + 1
+        for submission in submissions:
+            submission.attempts += 1
+        if retry and attempts < self.max_attempts:
+            PURCHASE_EVENTS.inc(len(batch), "retried")
+            delay = self.retry_seconds * 2 ** (attempts - 1)
+            logger.warning("Purchase event batch failed, retrying",
+                           extra={"events": len(batch), "attempt": attempts, "retry_in_s": delay, "error": str(error)})
+            # Back at the front, so the retried events still apply before later ones
+            self._submissions.extendleft(reversed(submissions))
+            self.pending += len(batch)
+            PURCHASE_EVENT_QUEUE_DEPTH.set(self.pending)
+            for submission in submissions:
+                self._set_status(submission, "retrying", error=str(error))
+            await asyncio.sleep(delay)
+            return
+
+        PURCHASE_EVENTS.inc(len(batch), "dead_lettered")
+        logger.error("Purchase event batch failed, writing it to the dead-letter file",
+                     extra={"events": len(batch), "attempts": attempts, "file": self.dead_letter_file,
+                            "error": str(error)})
+        self._write_dead_letters(submissions, error)
+        for submission in submissions:
+            self._set_status(submission, "dead_lettered", error=str(error))
+            if submission.future is not None and not submission.future.done():
+                submission.future.set_exception(error)
+
+    def _write_dead_letters(self, submissions: List[Submission], error: Exception):
+        try:
+            directory = os.path.dirname(self.dead_letter_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.dead_letter_file, "a") as f:
+                for submission in submissions:
+                    f.write(json.dumps({
+                        "submission_id": submission.id, "failed_at": time.time(), "attempts": submission.attempts,
+                        "error": str(error), "events": submission.events,
+                    }, default=str) + "\n")
+        except OSError:
+            logger.exception("Failed to write dead-lettered purchase events",
+                             extra={"file": self.dead_letter_file,
+                                    "submissions": [submission.id for submission in submissions]})
+
+    def _set_status(self, submission: Submission, status: str, error: Optional[str] = None):
+        entry = {"submission_id": submission.id, "status": status, "events": len(submission.events),
+                 "attempts": submission.attempts}
+        if error is not None:
+            entry["error"] = error
+        self._statuses[submission.id] = entry
+        self._statuses.move_to_end(submission.id)
+        while len(self._statuses) > STATUS_HISTORY:
+            self._statuses.popitem(last=False)
@@ -0,0 +1,153 @@
+"""
+Query plan capture and db-hit regression tracking for the engine's Cypher.
+
+Runs each engine query under PROFILE (or EXPLAIN), flattens the plan into
+operators with estimated rows, actual rows and db hits, and stores the result
+per graph version. A graph version is a fingerprint of label/relationship
+counts and the index set, so plans are only compared against plans captured
+for a known earlier state of the graph.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+PLAN_STORE_FILE = "query_plans/plan_history.json"
+
+# Operators that read every node (of a label) instead of seeking through an index
+SCAN_OPERATORS = {"AllNodesScan", "NodeByLabelScan", "DirectedAllRelationshipsScan",
+                  "UndirectedAllRelationshipsScan", "DirectedRelationshipTypeScan",
+                  "UndirectedRelationshipTypeScan"}
+
+
+def _operator_name(plan: Dict[str, Any]) -> str:
+    # Neo4j 5 suffixes the runtime, e.g. "NodeIndexSeek@neo4j"
+    return plan.get("operatorType", "Unknown").split("@")[0]
+
+
+def flatten_plan(plan: Dict[str, Any], depth: int = 0) -> List[Dict[str, Any]]:
+    """Pre-order list of plan operators with their row and db-hit statistics"""
+    args = plan.get("args", {})
+    operator = {
+        "operator": _operator_name(plan),
+        "depth": depth,
+        "details": args.get("Details"),
+        "estimated_rows": args.get("EstimatedRows"),
+        "rows": plan.get("rows", args.get("Rows")),
+        "db_hits": plan.get("dbHits", args.get("DbHits", 0)) or 0,
+    }
+    operators = [operator]
+    for child in plan.get("children", []):
+        operators.extend(flatten_plan(child, depth + 1))
+    return operators
+
+
+def summarize_plan(plan: Dict[str, Any], mode: str) -> Dict[str, Any]:
+    """Condense a raw plan into the fields tracked between runs"""
+    operators = flatten_plan(plan)
+    names = [op["operator"] for op in operators]
+    return {
+        "mode": mode,
+        "operator_signature": names,
+        "total_db_hits": sum(op["db_hits"] for op in operators),
+        "estimated_rows": operators[0]["estimated_rows"],
+        "rows": operators[0]["rows"],
+        "index_operators": sorted({n for n in names if "Index" in n}),
+        "scan_operators": sorted({n for n in names if n in SCAN_OPERATORS}),
+        "operators": operators,
+    }
+
+
+class QueryPlanProfiler:
+    """Capture, store and compare execution plans for named Cypher queries"""
+
+    def __init__(self, driver, database: Optional[str] = None, store_path: str = PLAN_STORE_FILE):
+        self.driver = driver
+        self.database = database
+        self.store_path = store_path
+
+    def _run(self, cypher: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        with self.driver.session(database=self.database) as session:
+            return [record.data() for record in session.run(cypher, params or {})]
+
+    def graph_fingerprint(self) -> Dict[str, Any]:
+        """Label and relationship counts (from the count store) plus the online index set"""
+        labels = {}
+        for row in self._run("CALL db.labels() YIELD label RETURN label"):
+            label = row["label"]
+            labels[label] = self._run(f"MATCH (n:`{label}`) RETURN count(n) AS c")[0]["c"]
+        relationships = {}
+        for row in self._run("CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType"):
+            rel_type = row["relationshipType"]
+            relationships[rel_type] = self._run(f"MATCH ()-[r:`{rel_type}`]->() RETURN count(r) AS c")[0]["c"]
+        indexes = sorted(
+            f"{row['labelsOrTypes']}{row['properties']}:{row['type']}"
+            for row in self._run(
+                "SHOW INDEXES YIELD labelsOrTypes, properties, type, state WHERE state = 'ONLINE' "
+                "RETURN labelsOrTypes, properties, type"
+            )
+        )
+        return {"labels": labels, "relationships": relationships, "indexes": indexes}
+
+    @staticmethod
+    def graph_version(fingerprint: Dict[str, Any]) -> str:
+        payload = json.dumps(fingerprint, sort_keys=True).encode("utf-8")
+        return hashlib.sha1(payload).hexdigest()[:12]
+
+    def capture(self, queries: Dict[str, Tuple[str, Dict[str, Any]]], mode: str = "PROFILE",
+                explain_only: Sequence[str] = ()) -> Dict[str, Any]:
+        """Run each (cypher, params) under PROFILE or EXPLAIN and summarize its plan; queries named in
+        explain_only (writes) are always just planned"""
+        mode = mode.upper()
+        captures = {}
+        with self.driver.session(database=self.database) as session:
+            for name, (cypher, params) in queries.items():
+                query_mode = "EXPLAIN" if name in explain_only else mode
+                summary = session.run(f"{query_mode} {cypher}", params).consume()
+                plan = summary.profile if query_mode == "PROFILE" else summary.plan
+                captures[name] = summarize_plan(plan or {}, query_mode)
+        return captures
+
+    def load_history(self) -> Dict[str, Any]:
+        if not os.path.exists(self.store_path):
+            return {"versions": {}}
+        with open(self.store_path, "r") as f:
+            return json.load(f)
+
+    def save(self, version: str, fingerprint: Dict[str, Any], captures: Dict[str, Any]) -> Dict[str, Any]:
+        """Record captures under the graph version, keeping earlier versions for comparison"""
+        history = self.load_history()
+        history["versions"][version] = {
+            "captured_at": datetime.now().isoformat(),
+            "fingerprint": fingerprint,
+            "queries": captures,
+        }
+        os.makedirs(os.path.dirname(self.store_path) or ".", exist_ok=True)
+        with open(self.store_path, "w") as f:
+            json.dump(history, f, indent=2, default=str)
+        return history
+
+    @staticmethod
+    def previous_version(history: Dict[str, Any], current: str) -> Optional[str]:
+        """Most recently captured version other than the current one"""
+        others = [(v["captured_at"], k) for k, v in history.get("versions", {}).items() if k != current]
+        return max(others)[1] if others else None
+
+
+def compare_captures(current: Dict[str, Any], baseline: Dict[str, Any], db_hit_threshold: float) -> List[str]:
+    """Flag plan shape changes and db-hit growth beyond the threshold (fraction)"""
+    flags = []
+    for name, capture in current.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        if capture["operator_signature"] != old["operator_signature"]:
+            flags.append(f"{name}: plan changed ({' > '.join(old['operator_signature'][:6])} ... -> "
+                         f"{' > '.join(capture['operator_signature'][:6])} ...)")
+        if capture["mode"] == "PROFILE" and old.get("total_db_hits"):
+            growth = capture["total_db_hits"] / old["total_db_hits"] - 1.0
+            if growth > db_hit_threshold:
+                flags.append(f"{name}: db hits {old['total_db_hits']} -> {capture['total_db_hits']} (+{growth:.0%})")
+    return flags
@@ -1,17 +1,564 @@
 import json
-from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass, asdict
-from datetime import datetime, timedelta
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from collections import Counter
+from functools import partial
+from typing import List, Dict, Any, Mapping, Optional, Sequence, Tuple, Callable, Iterator
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+import heapq
 import math
+import time
+import numpy as np
 from dotenv import load_dotenv
 import os
+import sys
 
-try:
-    from langchain_neo4j import Neo4jGraph
-except ImportError:
-    from langchain_community.graphs import Neo4jGraph
+from cold_start import LEVEL_LABELS, ColdStartTables, is_cold_start
+from metrics import (RECOMMENDER_DEADLINE_MISSES, RECOMMENDER_QUERY_ERRORS, RECOMMENDER_QUERY_SECONDS,
+                     RECOMMENDER_RESULTS)
+from neo4j_pool import get_neo4j_pool
+from product_vectors import ProductVectorIndex, load_or_build_vectors
+from purchase_events import aggregate_purchases
+from result_cache import MISSING, ResultCache
+from single_flight import SingleFlight
+from structured_logging import get_logger
+from tracing import span
 
-@dataclass
+logger = get_logger("recommendation_engine")
+
+# Retailer listing filters -> Retailer property (each backed by a range index)
+RETAILER_FILTERS = {
+    "location": "location",
+    "business_type": "business_type",
+    "size": "size",
+    "segment": "customer_segment",
+}
+
+
+def list_retailers_cypher(filters: Tuple[str, ...] = (), keyset: bool = False) -> str:
+    """Retailer listing in (name, id) order, keyset-paginated after ($after_name, $after_id)"""
+    # Only the filters in use are emitted so the planner can seek their indexes instead of
+    # evaluating `$x IS NULL OR ...` per retailer; the name range predicate lets the name
+    # index serve both the cursor seek and the ORDER BY
+    conditions = ["r.name IS NOT NULL"]
+    conditions.extend(f"r.{RETAILER_FILTERS[name]} = ${name}" for name in filters)
+    if keyset:
+        conditions.append("r.name >= $after_name AND (r.name > $after_name OR r.id > $after_id)")
+    return f"""
+    MATCH (r:Retailer)
+    WHERE {' AND '.join(conditions)}
+    RETURN r.id as retailer_id, r.name as retailer_name, 
+           r.location as location, r.business_type as business_type,
+           r.size as size, r.customer_segment as segment
+    ORDER BY r.name, r.id
+    LIMIT $limit
+    """
+
+
+# Cypher for every engine query, keyed by query name in ENGINE_QUERIES
+LIST_RETAILERS_CYPHER = list_retailers_cypher()
+
+RETAILER_PROFILE_CYPHER = """
+    MATCH (r:Retailer {id: $retailer_id})
+    OPTIONAL MATCH (r)-[p:PURCHASES]->(prod:Product)
+    OPTIONAL MATCH (prod)-[:BELONGS_TO]->(brand:Brand)
+    OPTIONAL MATCH (prod)-[:BELONGS_TO]->(cat:Category)
+    
+    WITH r, 
+         COUNT(DISTINCT prod) as products_bought,
+         COUNT(DISTINCT brand) as brands_used,
+         COUNT(DISTINCT cat) as categories_explored,
+         COLLECT(DISTINCT cat.name) as preferred_categories,
+         COLLECT(DISTINCT brand.name) as preferred_brands
+    
+    RETURN r.name as retailer_name,
+           r.location as location,
+           r.business_type as business_type,
+           r.size as size,
+           r.customer_segment as segment,
+           products_bought,
+           brands_used,
+           categories_explored,
+           preferred_categories,
+           preferred_brands
+    """
+
+def _purchase_weight(rel: str) -> str:
+    """Recency weight of a purchase edge: 1 on $as_of_day, halving every $half_life_days before it"""
+    return f"0.5 ^ (($as_of_day - {rel}.last_purchase_day) / toFloat($half_life_days))"
+
+
+def _recency_weight(rel: str, decay: bool) -> str:
+    """Summed recency weight of a candidate's purchase edges (null when not decaying)"""
+    return f"sum({_purchase_weight(rel)})" if decay else "null"
+
+
+def _recency_order(decay: bool, count: str) -> str:
+    """Order by recency weight when decaying, else by confidence and distinct count"""
+    return "recency_weight DESC, confidence_score DESC" if decay else f"confidence_score DESC, {count} DESC"
+
+
+def _in_window(rel: str, window: bool) -> str:
+    """Restrict a purchase edge to the $since_day window
+    
+    Applied to edges expanded from an already-matched retailer or product, so Neo4j plans it as a
+    filter over that node's full purchase history (the last_purchase_day index does not drive the
+    match); only the in-process backends read fewer edges for a short window.
+    """
+    return f" AND {rel}.last_purchase_day >= $since_day" if window else ""
+
+
+def collaborative_cypher(window: bool = False, decay: bool = False) -> str:
+    """Products bought by retailers with overlapping purchases; their purchases counted only inside
+    the $since_day window, and ranked by recency weight when asked (eligibility and confidence
+    always use distinct counts)"""
+    return f"""
+    // Find the target retailer and their purchases
+    MATCH (target:Retailer {{id: $retailer_id}})
+    MATCH (target)-[:PURCHASES]->(purchased:Product)
+    
+    // Find similar retailers who bought the same products
+    MATCH (similar:Retailer)-[sp:PURCHASES]->(purchased)
+    WHERE similar <> target{_in_window("sp", window)}
+    
+    // Calculate retailer similarity based on common purchases
+    WITH target, similar, COUNT(DISTINCT purchased) as common_purchases
+    WHERE common_purchases >= 2  // At least 2 products in common
+    
+    // Find products that similar retailers bought but target hasn't
+    MATCH (similar)-[rp:PURCHASES]->(recommended:Product)
+    WHERE NOT (target)-[:PURCHASES]->(recommended){_in_window("rp", window)}
+    
+    // Get product details
+    OPTIONAL MATCH (recommended)-[:BELONGS_TO]->(brand:Brand)
+    OPTIONAL MATCH (recommended)-[:BELONGS_TO]->(category:Category)
+    OPTIONAL MATCH (supplier:Supplier)-[:SUPPLIES]->(recommended)
+    
+    // Calculate recommendation metrics
+    WITH recommended, brand, category, supplier,
+         COUNT(DISTINCT similar) as similar_retailer_count,
+         AVG(common_purchases) as avg_similarity,
+         COUNT(DISTINCT similar) as anchor_products,
+         {_recency_weight("rp", decay)} as recency_weight,
+         AVG(CASE WHEN recommended.price IS NOT NULL THEN toFloat(recommended.price) END) as avg_price,
+         AVG(CASE WHEN recommended.margin IS NOT NULL THEN toFloat(recommended.margin) END) as avg_margin
+    
+    // Calculate confidence score based on multiple factors
+    WITH recommended, brand, category, supplier, avg_price, avg_margin,
+         similar_retailer_count,
+         avg_similarity,
+         anchor_products,
+         recency_weight,
+         // Confidence: more similar retailers + higher average similarity = higher confidence
+         CASE 
+             WHEN similar_retailer_count >= 5 THEN 0.8 + (avg_similarity / 10.0)
+             WHEN similar_retailer_count >= 3 THEN 0.6 + (avg_similarity / 15.0)
+             WHEN similar_retailer_count >= 2 THEN 0.4 + (avg_similarity / 20.0)
+             ELSE 0.2 + (avg_similarity / 25.0)
+         END as confidence_score
+    
+    WHERE confidence_score > 0.3  // Filter low-confidence recommendations
+    
+    ORDER BY {_recency_order(decay, "similar_retailer_count")}
+    LIMIT $limit
+    
+    RETURN recommended.name as product_name,
+           COALESCE(brand.name, recommended.brand, 'Unknown') as brand,
+           COALESCE(category.name, recommended.category, 'Unknown') as category,
+           COALESCE(supplier.name, recommended.supplier, 'Unknown') as supplier,
+           confidence_score,
+           similar_retailer_count,
+           avg_similarity,
+           anchor_products,
+           recency_weight,
+           avg_price,
+           avg_margin
+    """
+
+
+def category_expansion_cypher(window: bool = False, decay: bool = False) -> str:
+    """Popular products in categories the retailer has not bought from; popularity counted only
+    inside the $since_day window, and ranked by recency weight when asked"""
+    return f"""
+    // Get retailer's current categories
+    MATCH (target:Retailer {{id: $retailer_id}})-[:PURCHASES]->(purchased:Product)
+    OPTIONAL MATCH (purchased)-[:BELONGS_TO]->(purchased_cat:Category)
+    
+    WITH target, COLLECT(DISTINCT COALESCE(purchased_cat.name, purchased.category)) as current_categories
+    
+    // Find popular products in unexplored categories
+    MATCH (other:Retailer)-[op:PURCHASES]->(popular:Product)
+    WHERE other <> target{_in_window("op", window)}
+    OPTIONAL MATCH (popular)-[:BELONGS_TO]->(new_cat:Category)
+    
+    WITH target, current_categories, popular, new_cat,
+         COALESCE(new_cat.name, popular.category) as category_name,
+         COUNT(DISTINCT other) as popularity_score,
+         {_recency_weight("op", decay)} as recency_weight
+    
+    WHERE NOT category_name IN current_categories
+    AND popularity_score >= 3  // Must be purchased by at least 3 retailers
+    
+    // Get additional product details
+    OPTIONAL MATCH (popular)-[:BELONGS_TO]->(brand:Brand)
+    OPTIONAL MATCH (supplier:Supplier)-[:SUPPLIES]->(popular)
+    
+    // Calculate confidence based on category popularity and retailer business context
+    MATCH (target)
+    WITH popular, brand, new_cat, supplier, category_name, popularity_score, recency_weight,
+         target.business_type as business_type,
+         target.size as retailer_size,
+         AVG(CASE WHEN popular.price IS NOT NULL THEN toFloat(popular.price) END) as avg_price,
+         AVG(CASE WHEN popular.margin IS NOT NULL THEN toFloat(popular.margin) END) as avg_margin
+    
+    // Calculate confidence: higher for more popular categories
+    WITH popular, brand, new_cat, supplier, category_name, popularity_score, recency_weight,
+         business_type, retailer_size, avg_price, avg_margin,
+         CASE 
+             WHEN popularity_score >= 10 THEN 0.7
+             WHEN popularity_score >= 7 THEN 0.6
+             WHEN popularity_score >= 5 THEN 0.5
+             ELSE 0.4
+         END as confidence_score
+    
+    ORDER BY {_recency_order(decay, "popularity_score")}
+    LIMIT $limit
+    
+    RETURN popular.name as product_name,
+           COALESCE(brand.name, popular.brand, 'Unknown') as brand,
+           category_name as category,
+           COALESCE(supplier.name, popular.supplier, 'Unknown') as supplier,
+           confidence_score,
+           popularity_score,
+           recency_weight,
+           business_type,
+           retailer_size,
+           avg_price,
+           avg_margin
+    """
+
+
+def brand_loyalty_cypher(window: bool = False, decay: bool = False) -> str:
+    """Popular products of the brands the retailer buys; popularity counted only inside the
+    $since_day window, and ranked by recency weight when asked"""
+    return f"""
+    // Find retailer's preferred brands
+    MATCH (target:Retailer {{id: $retailer_id}})-[:PURCHASES]->(purchased:Product)
+    OPTIONAL MATCH (purchased)-[:BELONGS_TO]->(preferred_brand:Brand)
+    
+    WITH target, 
+         COLLECT(DISTINCT COALESCE(preferred_brand.name, purchased.brand)) as preferred_brands,
+         COUNT(DISTINCT purchased) as total_products_bought
+    
+    // Find other products from preferred brands that retailer hasn't bought
+    UNWIND preferred_brands as brand_name
+    
+    MATCH (brand_product:Product)
+    WHERE (brand_product.brand = brand_name OR EXISTS((brand_product)-[:BELONGS_TO]->(:Brand {{name: brand_name}})))
+    AND NOT (target)-[:PURCHASES]->(brand_product)
+    
+    // Get popularity of these products
+    MATCH (other:Retailer)-[op:PURCHASES]->(brand_product)
+    WHERE other <> target{_in_window("op", window)}
+    
+    // Get product details
+    OPTIONAL MATCH (brand_product)-[:BELONGS_TO]->(brand:Brand)
+    OPTIONAL MATCH (brand_product)-[:BELONGS_TO]->(category:Category)
+    OPTIONAL MATCH (supplier:Supplier)-[:SUPPLIES]->(brand_product)
+    
+    WITH target, brand_name, brand_product, brand, category, supplier,
+         COUNT(DISTINCT other) as product_popularity,
+         {_recency_weight("op", decay)} as recency_weight,
+         AVG(CASE WHEN brand_product.price IS NOT NULL THEN toFloat(brand_product.price) END) as avg_price,
+         AVG(CASE WHEN brand_product.margin IS NOT NULL THEN toFloat(brand_product.margin) END) as avg_margin
+    
+    WHERE product_popularity >= 2  // At least 2 other retailers bought it
+    
+    // Calculate confidence: higher for more popular products from preferred brands
+    WITH brand_product, brand, category, supplier, brand_name, product_popularity, recency_weight,
+         avg_price, avg_margin,
+         CASE 
+             WHEN product_popularity >= 8 THEN 0.8
+             WHEN product_popularity >= 5 THEN 0.7
+             WHEN product_popularity >= 3 THEN 0.6
+             ELSE 0.5
+         END as confidence_score
+    
+    ORDER BY {_recency_order(decay, "product_popularity")}
+    LIMIT $limit
+    
+    RETURN brand_product.name as product_name,
+           brand_name as brand,
+           COALESCE(category.name, brand_product.category, 'Unknown') as category,
+           COALESCE(supplier.name, brand_product.supplier, 'Unknown') as supplier,
+           confidence_score,
+           product_popularity,
+           recency_weight,
+           avg_price,
+           avg_margin
+    """
+
+
+COLLABORATIVE_CYPHER = collaborative_cypher()
+CATEGORY_EXPANSION_CYPHER = category_expansion_cypher()
+BRAND_LOYALTY_CYPHER = brand_loyalty_cypher()
+
+LIST_PRODUCTS_CYPHER = """
+    MATCH (p:Product)
+    OPTIONAL MATCH (p)-[:BELONGS_TO]->(brand:Brand)
+    OPTIONAL MATCH (p)-[:BELONGS_TO]->(cat:Category)
+    OPTIONAL MATCH (supplier:Supplier)-[:SUPPLIES]->(p)
+    
+    RETURN p.name as product_name,
+           COALESCE(brand.name, p.brand) as brand,
+           COALESCE(cat.name, p.category) as category,
+           COALESCE(supplier.name, p.supplier) as supplier,
+           toFloat(p.price) as price,
+           toFloat(p.margin) as margin,
+           size([(r:Retailer)-[:PURCHASES]->(p) | r]) as retailer_count
+    ORDER BY product_name
+    """
+
+# Per peer group (retailers with purchases sharing segment, size, location and business type):
+# group size and distinct buyers of every product, for the cold-start popularity tables
+PEER_GROUP_POPULARITY_CYPHER = """
+    MATCH (r:Retailer)
+    WHERE (r)-[:PURCHASES]->(:Product)
+    WITH r.customer_segment as segment, r.size as size, r.location as location,
+         r.business_type as business_type, COLLECT(r) as members
+    UNWIND members as member
+    MATCH (member)-[:PURCHASES]->(p:Product)
+    RETURN segment, size, location, business_type,
+           size(members) as retailers,
+           p.name as product_name,
+           COUNT(DISTINCT member) as buyers
+    """
+
+PURCHASED_PRODUCTS_CYPHER = """
+    MATCH (r:Retailer {id: $retailer_id})-[:PURCHASES]->(p:Product)
+    RETURN p.name as product_name
+    """
+
+# Retailers with the most purchased products, the default set to pre-warm the result cache with
+TOP_RETAILERS_CYPHER = """
+    MATCH (r:Retailer)-[:PURCHASES]->(:Product)
+    RETURN r.id as retailer_id, COUNT(*) as products_bought
+    ORDER BY products_bought DESC, retailer_id
+    LIMIT $limit
+    """
+
+# Day of the newest purchase, the reference point of recency windows and decay
+LATEST_PURCHASE_DAY_CYPHER = """
+    MATCH ()-[p:PURCHASES]->()
+    WHERE p.last_purchase_day IS NOT NULL
+    RETURN p.last_purchase_day as day
+    ORDER BY day DESC
+    LIMIT 1
+    """
+
+# Peer group and purchased-product count of given retailers, read after purchase events are applied
+RETAILER_PEER_GROUPS_CYPHER = """
+    UNWIND $retailer_ids as retailer_id
+    MATCH (r:Retailer {id: retailer_id})
+    RETURN r.id as retailer_id, r.customer_segment as segment, r.size as size,
+           r.location as location, r.business_type as business_type,
+           size([(r)-[:PURCHASES]->(p:Product) | p]) as products_bought
+    """
+
+# Upsert purchase events aggregated per (retailer, product): unknown retailers and products are
+# created from the transaction fields, the edge keeps the latest purchase day, and created tells
+# whether the retailer bought the product for the first time
+PURCHASE_EVENTS_CYPHER = """
+    UNWIND $rows AS row
+    // Ingestion keys some retailers by name (the LLM's choice): reuse that node, preferring an id match,
+    // so their purchases stay in one history; only a retailer known by neither gets a new node
+    CALL {
+        WITH row
+        OPTIONAL MATCH (existing:Retailer) WHERE existing.id IN [row.retailer_id, row.retailer_name]
+        RETURN existing ORDER BY existing.id = row.retailer_id DESC LIMIT 1
+    }
+    FOREACH (_ IN CASE WHEN existing IS NULL THEN [1] ELSE [] END |
+        MERGE (new:Retailer {id: row.retailer_id})
+        ON CREATE SET new.name = row.retailer_name, new.location = row.retailer_location,
+                      new.business_type = row.business_type, new.size = row.retailer_size,
+                      new.customer_segment = row.retailer_segment)
+    WITH row, coalesce(existing.id, row.retailer_id) as retailer_key
+    MATCH (r:Retailer {id: retailer_key})
+    // Keyed on id with name set to the same value, exactly as ingestion writes these nodes
+    MERGE (p:Product {id: row.product_name})
+    ON CREATE SET p.brand = row.brand, p.category = row.category, p.supplier = row.supplier,
+                  p.price = row.unit_price, p.margin = row.margin_percent
+    SET p.name = row.product_name
+    FOREACH (name IN CASE WHEN row.brand IS NULL THEN [] ELSE [row.brand] END |
+        MERGE (b:Brand {id: name}) SET b.name = name MERGE (p)-[:BELONGS_TO]->(b))
+    FOREACH (name IN CASE WHEN row.category IS NULL THEN [] ELSE [row.category] END |
+        MERGE (c:Category {id: name}) SET c.name = name MERGE (p)-[:BELONGS_TO]->(c))
+    FOREACH (name IN CASE WHEN row.supplier IS NULL THEN [] ELSE [row.supplier] END |
+        MERGE (s:Supplier {id: name}) SET s.name = name MERGE (s)-[:SUPPLIES]->(p))
+    WITH r, p, row
+    OPTIONAL MATCH (r)-[known:PURCHASES]->(p)
+    WITH r, p, row, known IS NULL as created
+    MERGE (r)-[purchase:PURCHASES]->(p)
+    SET purchase.last_purchase_day = CASE
+        WHEN coalesce(purchase.last_purchase_day, -1) < row.day THEN row.day
+        ELSE purchase.last_purchase_day END
+    RETURN row.retailer_id as retailer_id, row.product_name as product_name, created
+    """
+
+ENGINE_QUERIES = {
+    "list_retailers": LIST_RETAILERS_CYPHER,
+    "top_retailers": TOP_RETAILERS_CYPHER,
+    "list_products": LIST_PRODUCTS_CYPHER,
+    "peer_group_popularity": PEER_GROUP_POPULARITY_CYPHER,
+    "purchased_products": PURCHASED_PRODUCTS_CYPHER,
+    "retailer_profile": RETAILER_PROFILE_CYPHER,
+    "collaborative": COLLABORATIVE_CYPHER,
+    "category_expansion": CATEGORY_EXPANSION_CYPHER,
+    "brand_loyalty": BRAND_LOYALTY_CYPHER,
+    "retailer_peer_groups": RETAILER_PEER_GROUPS_CYPHER,
+    "latest_purchase_day": LATEST_PURCHASE_DAY_CYPHER,
+    "purchase_events": PURCHASE_EVENTS_CYPHER,
+}
+
+# Windowed and recency-weighted recommender variants filter and aggregate differently, so their
+# plans are tracked separately ("collaborative_window", "brand_loyalty_window_decay", ...)
+RECENCY_VARIANTS = {"window": (True, False), "decay": (False, True), "window_decay": (True, True)}
+ENGINE_QUERIES.update({
+    f"{name}_{variant}": build(window, decay)
+    for name, build in (("collaborative", collaborative_cypher), ("category_expansion", category_expansion_cypher),
+                        ("brand_loyalty", brand_loyalty_cypher))
+    for variant, (window, decay) in RECENCY_VARIANTS.items()
+})
+
+# Queries that write: only ever planned with EXPLAIN, never executed under PROFILE
+WRITE_QUERIES = ("purchase_events",)
+
+# Queries answered per request get a server-enforced transaction timeout on Neo4j
+# (QWIPO_QUERY_TIMEOUT_SECONDS, overridden per query as "category_expansion=1.5,..." in
+# QWIPO_QUERY_TIMEOUTS); bulk queries that build the in-memory indexes run unbounded
+REQUEST_QUERIES = ("retailer_profile", "collaborative", "category_expansion", "brand_loyalty",
+                   "purchased_products", "list_retailers", "top_retailers")
+DEFAULT_QUERY_TIMEOUT_SECONDS = 2.0
+
+# Share of the blended score each recommender contributes; QWIPO_BLEND_WEIGHTS overrides
+# them as "collaborative=0.5,category_expansion=0.2,brand_loyalty=0.3" (0 disables one)
+DEFAULT_BLEND_WEIGHTS = {
+    "collaborative": 0.5,
+    "category_expansion": 0.2,
+    "brand_loyalty": 0.3,
+}
+
+# Blend of the two lists cold-start retailers get
+SPARSE_BLEND_WEIGHTS = {"cold_start": 0.5, "content_based": 0.5}
+
+
+def parse_blend_weights(spec: Optional[str]) -> Dict[str, float]:
+    """Blend weights from a "type=weight,..." string, defaults for types it leaves out"""
+    weights = dict(DEFAULT_BLEND_WEIGHTS)
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if name not in weights:
+            raise ValueError(f"Unknown recommender in blend weights: {name}")
+        weights[name] = float(value)
+        if weights[name] < 0:
+            raise ValueError(f"Blend weight for {name} must not be negative")
+    return weights
+
+def parse_query_timeouts(spec: Optional[str], default: float = DEFAULT_QUERY_TIMEOUT_SECONDS) -> Dict[str, float]:
+    """Timeout per request query from a "query=seconds,..." string, default for queries it leaves out"""
+    timeouts = dict.fromkeys(REQUEST_QUERIES, default)
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if name not in timeouts:
+            raise ValueError(f"Unknown query in query timeouts: {name}")
+        timeouts[name] = float(value)
+        if timeouts[name] <= 0:
+            raise ValueError(f"Query timeout for {name} must be positive")
+    return timeouts
+
+
+@dataclass(frozen=True)
+class Recency:
+    """Which purchases the graph recommenders count: only the last window_days days, and/or each
+    weighted by 0.5 ** (age / half_life_days). Days are counted back from the newest purchase."""
+    window_days: Optional[int] = None
+    half_life_days: Optional[float] = None
+    
+    def __post_init__(self):
+        if self.window_days is not None and self.window_days < 1:
+            raise ValueError("Recency window must be at least one day")
+        if self.half_life_days is not None and self.half_life_days <= 0:
+            raise ValueError("Recency half-life must be positive")
+    
+    def __bool__(self) -> bool:
+        return self.window_days is not None or self.half_life_days is not None
+    
+    def query_params(self, as_of_day: int) -> Dict[str, Any]:
+        """Parameters of the windowed/decayed recommender queries"""
+        params: Dict[str, Any] = {}
+        if self.window_days is not None:
+            params["since_day"] = as_of_day - self.window_days + 1
+        if self.half_life_days is not None:
+            params.update(as_of_day=as_of_day, half_life_days=float(self.half_life_days))
+        return params
+
+
+_recommender_executor: Optional[ThreadPoolExecutor] = None
+_recommender_slots: Optional[threading.BoundedSemaphore] = None
+_recommender_executor_lock = threading.Lock()
+
+
+def recommender_executor() -> ThreadPoolExecutor:
+    """Process-wide threads running recommenders concurrently (QWIPO_RECOMMENDER_THREADS)"""
+    global _recommender_executor, _recommender_slots
+    with _recommender_executor_lock:
+        if _recommender_executor is None:
+            threads = int(os.getenv("QWIPO_RECOMMENDER_THREADS", "32"))
+            _recommender_executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="recommender")
+            _recommender_slots = threading.BoundedSemaphore(threads)
+        return _recommender_executor
+
+
+def submit_recommender(task: Callable[[], Any], timeout: Optional[float] = None) -> Optional[Future]:
+    """Run task on a recommender thread in the caller's context, or None if no thread frees up within timeout
+    
+    A running recommender cannot be stopped (the in-process graph has no query timeout), so one that
+    misses its deadline keeps its thread until it finishes. Work is only admitted onto a free thread:
+    when slow recommenders hold them all, new ones give up at their deadline instead of queueing
+    behind them.
+    """
+    executor = recommender_executor()
+    if not _recommender_slots.acquire(timeout=None if timeout is None else max(timeout, 0.0)):
+        return None
+    
+    def run():
+        try:
+            return task()
+        finally:
+            _recommender_slots.release()
+    
+    try:
+        future = executor.submit(contextvars.copy_context().run, run)
+    except BaseException:
+        _recommender_slots.release()
+        raise
+    # A future cancelled before it started never runs, so its slot is released here instead
+    future.add_done_callback(lambda done: done.cancelled() and _recommender_slots.release())
+    return future
+
+# Slotted results (Python 3.10+) are smaller and faster to build; older interpreters get a plain dataclass
+_DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_DATACLASS_SLOTS)
 class Recommendation:
     """Realistic recommendation result structure based on graph evidence"""
     product_name: str
@@ -26,123 +573,348 @@ class Recommendation:
     supplier: Optional[str] = None
     
     def to_dict(self):
-        """Convert to dictionary for JSON serialization"""
-        return asdict(self)
+        """Convert to dictionary for JSON serialization (shallow: evidence and reasoning are shared, not copied)"""
+        return {
+            "product_name": self.product_name,
+            "brand": self.brand,
+            "category": self.category,
+            "confidence_score": self.confidence_score,
+            "reasoning": self.reasoning,
+            "recommendation_type": self.recommendation_type,
+            "graph_evidence": self.graph_evidence,
+            "price": self.price,
+            "profit_margin": self.profit_margin,
+            "supplier": self.supplier,
+        }
+
+def _add_recency_evidence(rec: "Recommendation", row: Dict[str, Any]):
+    """Record the recency weight a decayed recommender query ranked the product by"""
+    if row.get('recency_weight') is not None:
+        rec.graph_evidence["recency_weight"] = row['recency_weight']
+
+def blend_recommendations(ranked: Dict[str, List["Recommendation"]], weights: Dict[str, float],
+                          limit: int) -> List["Recommendation"]:
+    """Merge per-recommender lists into one top-k list, one entry per product"""
+    # Confidence scales differ per recommender, so each list is scaled to its own best score;
+    # a product's blended score is the weighted sum over the recommenders that returned it,
+    # divided by the total weight of the recommenders consulted so it stays within [0, 1]
+    enabled = [rec_type for rec_type in ranked if weights.get(rec_type, 0) > 0]
+    types = [rec_type for rec_type in enabled if ranked[rec_type]]
+    total_weight = sum(weights[rec_type] for rec_type in enabled)
+    slots: Dict[str, int] = {}
+    sources: List[Dict[str, Recommendation]] = []
+    rows, cols, values = [], [], []
+    for col, rec_type in enumerate(types):
+        scores = np.array([rec.confidence_score or 0.0 for rec in ranked[rec_type]], dtype=np.float64)
+        best = scores.max()
+        scaled = scores / best if best > 0 else np.ones_like(scores)
+        for rec, score in zip(ranked[rec_type], scaled.tolist()):
+            slot = slots.setdefault(rec.product_name, len(slots))
+            if slot == len(sources):
+                sources.append({})
+            sources[slot].setdefault(rec_type, rec)
+            rows.append(slot)
+            cols.append(col)
+            values.append(score)
+    if not slots:
+        return []
+
+    matrix = np.zeros((len(slots), len(types)), dtype=np.float64)
+    np.maximum.at(matrix, (np.array(rows), np.array(cols)), np.array(values))
+    type_weights = np.array([weights[rec_type] for rec_type in types], dtype=np.float64)
+    contributions = matrix * type_weights
+    blended = contributions.sum(axis=1) / total_weight
+
+    # Ties keep first-seen order, i.e. the earlier recommender's ranking
+    top = heapq.nlargest(limit, range(len(slots)), key=blended.__getitem__)
+
+    results = []
+    for slot in top:
+        found = sources[slot]
+        # Product details and reasoning come from the recommender contributing most to the score
+        lead = found[types[int(contributions[slot].argmax())]]
+        strategies = ", ".join(rec.recommendation_type for rec in found.values())
+        results.append(Recommendation(
+            product_name=lead.product_name,
+            brand=lead.brand,
+            category=lead.category,
+            supplier=lead.supplier,
+            confidence_score=round(float(blended[slot]), 4),
+            reasoning=[f"Recommended by {len(found)} of {len(enabled)} strategies: {strategies}"] + lead.reasoning,
+            recommendation_type="Blended",
+            price=lead.price,
+            profit_margin=lead.profit_margin,
+            graph_evidence={
+                "source_scores": {rec_type: rec.confidence_score for rec_type, rec in found.items()},
+                "blend_weights": {rec_type: weights[rec_type] for rec_type in found},
+                "confidence_calculation": "Weighted sum of each strategy's score scaled to its best result"
+            }
+        ))
+    return results
 
 class QwipoRecommendationEngine:
     """Graph-based recommendation engine for B2B marketplace"""
     
-    def __init__(self, neo4j_uri: str = None, neo4j_username: str = None, neo4j_password: str = None):
-        """Initialize the recommendation engine with Neo4j connection"""
+    def __init__(self, neo4j_uri: str = None, neo4j_username: str = None, neo4j_password: str = None,
+                 local_graph=None, blend_weights: Optional[Dict[str, float]] = None,
+                 result_cache: Optional[ResultCache] = None, query_timeouts: Optional[Dict[str, float]] = None):
+        """Initialize the recommendation engine with Neo4j connection or an in-process graph"""
+        
+        start = time.perf_counter()
+        self.query_timeouts = dict(query_timeouts) if query_timeouts else parse_query_timeouts(
+            os.getenv("QWIPO_QUERY_TIMEOUTS"),
+            float(os.getenv("QWIPO_QUERY_TIMEOUT_SECONDS", str(DEFAULT_QUERY_TIMEOUT_SECONDS)))
+        )
+        # Profiles and recommendation lists by retailer; None computes every request
+        self.result_cache = result_cache
+        # Identical concurrent computations (same kind, retailer and limit) run once and share the result
+        self.single_flight = SingleFlight()
+        # Bumped by every graph update and cache clear: results computed across one are never cached,
+        # and callers arriving after it start a fresh computation instead of joining an older one
+        self.generation = 0
+        self.blend_weights = dict(blend_weights) if blend_weights else parse_blend_weights(os.getenv("QWIPO_BLEND_WEIGHTS"))
+        # Popularity fallbacks for retailers without purchase history; built by build_cold_start_tables()
+        self.cold_start: Optional[ColdStartTables] = None
+        # Content vectors for similar products; built by build_product_vectors()
+        self.product_vectors: Optional[ProductVectorIndex] = None
+        # Reference day of recency windows, looked up on first use and after every cache clear
+        self._latest_purchase_day: Optional[int] = None
+        
+        # In-process backend: answer every query from the local graph, no Neo4j connection
+        self.local_graph = local_graph
+        if local_graph is not None:
+            self.backend = "local"
+            self.neo4j_graph = None
+            self.pool = None
+            self.startup_seconds = time.perf_counter() - start
+            logger.info("Qwipo Recommendation Engine initialized",
+                        extra={"backend": self.backend, "startup_s": round(self.startup_seconds, 3)})
+            return
         
         # Load environment variables if credentials not provided
         if not neo4j_uri:
             load_dotenv(override=True)
-            neo4j_uri = os.getenv("NEO4J_URI")
-            neo4j_username = os.getenv("NEO4J_USERNAME", "neo4j")
-            neo4j_password = os.getenv("NEO4J_PASSWORD")
-        
-        self.neo4j_graph = Neo4jGraph(
-            url=neo4j_uri,
-            username=neo4j_username,
-            password=neo4j_password
+        
+        # Shared process-wide pool: engine queries run as read transactions on the read
+        # pool; neo4j_graph keeps the Neo4jGraph-style query() for admin and bulk writes
+        self.pool = get_neo4j_pool(
+            NEO4J_URI=neo4j_uri,
+            NEO4J_USERNAME=neo4j_username,
+            NEO4J_PASSWORD=neo4j_password
         )
-        print("🎯 Qwipo Recommendation Engine initialized")
+        self.pool.verify_connectivity()
+        self.neo4j_graph = self.pool
+        self.backend = "neo4j"
+        self.startup_seconds = time.perf_counter() - start
+        logger.info("Qwipo Recommendation Engine initialized",
+                    extra={"backend": self.backend, "startup_s": round(self.startup_seconds, 3)})
+    
+    def _run_query(self, query_name: str, cypher: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Run a named engine query against Neo4j or the in-process graph, recording its latency"""
+        backend = self.backend
+        start = time.perf_counter()
+        with span("graph.query", query=query_name, backend=backend) as query_span:
+            try:
+                if self.local_graph is not None:
+                    results = self.local_graph.run(query_name, params)
+                else:
+                    results = self.pool.read(cypher, params, timeout=self.query_timeouts.get(query_name))
+            except Exception:
+                RECOMMENDER_QUERY_ERRORS.inc(1.0, query_name, backend)
+                logger.exception("Graph query failed", extra={"query": query_name, "backend": backend})
+                raise
+            finally:
+                RECOMMENDER_QUERY_SECONDS.observe(time.perf_counter() - start, query_name, backend)
+            query_span.set(rows=len(results))
+        RECOMMENDER_RESULTS.observe(len(results), query_name)
+        return results
+    
+    def _cached(self, key: Tuple, compute: Callable[[], Any]) -> Any:
+        """Result for key from the cache, else computed once for every concurrent caller and cached"""
+        cache = self.result_cache
+        if cache is not None:
+            value = cache.get(key)
+            if value is not MISSING:
+                return value
+        generation = self.generation
+        
+        def compute_and_store():
+            value = compute()
+            # Stored before the flight lands, so callers arriving after it find the result cached
+            self._store(key, value, generation)
+            return value
+        
+        return self.single_flight.do(key + (generation,), compute_and_store)
+    
+    def _store(self, key: Tuple, value: Any, generation: int):
+        """Cache value unless the graph changed since its computation started (it may have read the old graph)"""
+        if self.result_cache is not None and self.generation == generation:
+            self.result_cache.put(key, value)
+    
+    def clear_cache(self):
+        """Forget cached results, e.g. after the graph or the derived tables changed"""
+        self.generation += 1
+        if self.result_cache is not None:
+            self.result_cache.clear()
+        self._latest_purchase_day = None
+    
+    def check_connection(self) -> bool:
+        """Verify the graph backend is reachable and answering queries"""
+        if self.local_graph is not None:
+            return True
+        result = self.pool.read("MATCH (n) RETURN count(n) as total LIMIT 1")
+        return len(result) > 0
+    
+    def list_retailers(self, limit: int = 20, after: Optional[Tuple[str, str]] = None,
+                       filters: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        """List retailers ordered by (name, id), starting after the (name, id) keyset cursor"""
+        filters = {name: value for name, value in (filters or {}).items() if value is not None}
+        params = {"limit": limit, **filters}
+        if after is not None:
+            params.update(after_name=after[0], after_id=after[1])
+        cypher = list_retailers_cypher(tuple(sorted(filters)), keyset=after is not None)
+        return self._run_query("list_retailers", cypher, params)
+    
+    def iter_retailers(self, page_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Every retailer in listing order, fetched page by page with the keyset cursor"""
+        after = None
+        while True:
+            page = self.list_retailers(page_size, after=after)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = (page[-1]["retailer_name"], page[-1]["retailer_id"])
+    
+    def list_products(self) -> List[Dict[str, Any]]:
+        """Every product with its brand, category, supplier, price and number of buying retailers"""
+        return self._run_query("list_products", LIST_PRODUCTS_CYPHER, {})
+    
+    def peer_group_popularity(self) -> List[Dict[str, Any]]:
+        """Distinct buyers of every product per peer group, with the group's size"""
+        return self._run_query("peer_group_popularity", PEER_GROUP_POPULARITY_CYPHER, {})
+    
+    def build_cold_start_tables(self, products: Optional[List[Dict[str, Any]]] = None) -> ColdStartTables:
+        """Recompute the cold-start popularity tables from the current graph and swap them in"""
+        tables = ColdStartTables(self.peer_group_popularity(), products if products is not None else self.list_products())
+        self.cold_start = tables
+        return tables
+    
+    def is_cold_start(self, profile: Dict[str, Any]) -> bool:
+        """Whether the retailer should be answered from the cold-start tables"""
+        return self.cold_start is not None and is_cold_start(profile)
+    
+    def top_retailers(self, limit: int) -> List[Dict[str, Any]]:
+        """Retailers with the most purchased products, most first"""
+        return self._run_query("top_retailers", TOP_RETAILERS_CYPHER, {"limit": limit})
+    
+    def latest_purchase_day(self) -> int:
+        """Day (since 1970-01-01) of the newest purchase in the graph; today if no purchase is dated"""
+        day = self._latest_purchase_day
+        if day is None:
+            rows = self._run_query("latest_purchase_day", LATEST_PURCHASE_DAY_CYPHER, {})
+            day = rows[0]["day"] if rows and rows[0]["day"] is not None else (date.today() - date(1970, 1, 1)).days
+            self._latest_purchase_day = day
+        return day
+    
+    def record_purchases(self, transactions: Sequence[Mapping[str, Any]]) -> Dict[str, Any]:
+        """Apply purchase events (transaction records): upsert one PURCHASES edge per retailer and product,
+        update the cold-start tables and the recency reference day, and drop the affected retailers' cached results"""
+        start = time.perf_counter()
+        rows = aggregate_purchases(transactions)
+        if not rows:
+            return {"events": 0, "purchases": 0, "new_purchases": 0, "retailers": 0, "invalidated": 0,
+                    "new_buyers": {}, "new_products": [], "took_ms": 0.0}
+        
+        if self.local_graph is not None:
+            # Copy-on-write: requests keep reading the current graph until the updated one is swapped in
+            graph, created = self.local_graph.with_purchases(rows)
+            self.local_graph = graph
+            new_pairs = [(row["retailer_id"], row["product_name"]) for row, flag in zip(rows, created) if flag]
+        else:
+            written = self.pool.write(PURCHASE_EVENTS_CYPHER, {"rows": rows})
+            new_pairs = [(row["retailer_id"], row["product_name"]) for row in written if row["created"]]
+        
+        retailer_ids = sorted({row["retailer_id"] for row in rows})
+        groups = {row["retailer_id"]: row for row in
+                  self._run_query("retailer_peer_groups", RETAILER_PEER_GROUPS_CYPHER, {"retailer_ids": retailer_ids})}
+        new_buyers = Counter(product_name for _, product_name in new_pairs)
+        new_products = []
+        if self.cold_start is not None:
+            seen = set()
+            for row in rows:
+                name = row["product_name"]
+                if name not in seen and self.cold_start.product(name) is None:
+                    seen.add(name)
+                    new_products.append({
+                        "product_name": name, "brand": row.get("brand"), "category": row.get("category"),
+                        "supplier": row.get("supplier"), "price": row.get("unit_price"),
+                        "margin": row.get("margin_percent"), "retailer_count": new_buyers[name],
+                    })
+            # A retailer whose every purchase is new just joined its peer group
+            first_purchases = Counter(retailer_id for retailer_id, _ in new_pairs)
+            self.cold_start.add_purchases(
+                buyers=[(groups[retailer_id], name) for retailer_id, name in new_pairs if retailer_id in groups],
+                new_members=[groups[retailer_id] for retailer_id, count in first_purchases.items()
+                             if retailer_id in groups and groups[retailer_id]["products_bought"] == count],
+                products=new_products
+            )
+        
+        # In-flight computations may have read the old graph: they finish, but are no longer cached
+        self.generation += 1
+        
+        # Unset, the reference day is looked up on next use and no recency result is cached yet
+        newest_day = max(row["day"] for row in rows)
+        day_moved = self._latest_purchase_day is not None and newest_day > self._latest_purchase_day
+        if day_moved:
+            self._latest_purchase_day = newest_day
+        
+        # Only the buyers' own results are dropped; other retailers' results pick up the new
+        # purchases (as peers, or in popularity) when their cache entries expire. Recency results
+        # are relative to the reference day, so once it moves every retailer's are stale.
+        affected = set(retailer_ids)
+        
+        def stale(key: Tuple) -> bool:
+            return key[1] in affected or (day_moved and len(key) > 3 and bool(key[3]))
+        
+        invalidated = self.result_cache.invalidate(stale) if self.result_cache else 0
+        
+        stats = {
+            "events": len(transactions),
+            "purchases": len(rows),
+            "new_purchases": len(new_pairs),
+            "retailers": len(retailer_ids),
+            "invalidated": invalidated,
+            "new_buyers": dict(new_buyers),
+            "new_products": new_products,
+            "took_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        logger.info("Purchase events applied",
+                    extra={key: value for key, value in stats.items() if not isinstance(value, (dict, list))})
+        return stats
+    
+    def _recommender_rows(self, query_name: str, build_cypher: Callable[[bool, bool], str], retailer_id: str,
+                          limit: int, recency: Optional[Recency]) -> List[Dict[str, Any]]:
+        """Rows of a graph recommender query, counting only the purchases recency selects"""
+        params = {"retailer_id": retailer_id, "limit": limit}
+        if not recency:
+            return self._run_query(query_name, build_cypher(False, False), params)
+        params.update(recency.query_params(self.latest_purchase_day()))
+        cypher = build_cypher(recency.window_days is not None, recency.half_life_days is not None)
+        return self._run_query(query_name, cypher, params)
     
     def get_retailer_profile(self, retailer_id: str) -> Dict[str, Any]:
         """Get retailer profile and purchase history"""
-        cypher = """
-        MATCH (r:Retailer {id: $retailer_id})
-        OPTIONAL MATCH (r)-[p:PURCHASES]->(prod:Product)
-        OPTIONAL MATCH (prod)-[:BELONGS_TO]->(brand:Brand)
-        OPTIONAL MATCH (prod)-[:BELONGS_TO]->(cat:Category)
-        
-        WITH r, 
-             COUNT(DISTINCT prod) as products_bought,
-             COUNT(DISTINCT brand) as brands_used,
-             COUNT(DISTINCT cat) as categories_explored,
-             COLLECT(DISTINCT cat.name) as preferred_categories,
-             COLLECT(DISTINCT brand.name) as preferred_brands
-        
-        RETURN r.name as retailer_name,
-               r.location as location,
-               r.business_type as business_type,
-               r.size as size,
-               r.customer_segment as segment,
-               products_bought,
-               brands_used,
-               categories_explored,
-               preferred_categories,
-               preferred_brands
-        """
-        
-        result = self.neo4j_graph.query(cypher, {"retailer_id": retailer_id})
+        return self._cached(("profile", retailer_id), lambda: self._retailer_profile(retailer_id))
+    
+    def _retailer_profile(self, retailer_id: str) -> Dict[str, Any]:
+        result = self._run_query("retailer_profile", RETAILER_PROFILE_CYPHER, {"retailer_id": retailer_id})
         return result[0] if result else {}
     
-    def get_collaborative_recommendations(self, retailer_id: str, limit: int = 10) -> List[Recommendation]:
+    def get_collaborative_recommendations(self, retailer_id: str, limit: int = 10,
+                                          recency: Optional[Recency] = None) -> List[Recommendation]:
         """Find products purchased by similar retailers based on graph traversal"""
         
-        cypher = """
-        // Find the target retailer and their purchases
-        MATCH (target:Retailer {id: $retailer_id})
-        MATCH (target)-[:PURCHASES]->(purchased:Product)
-        
-        // Find similar retailers who bought the same products
-        MATCH (similar:Retailer)-[:PURCHASES]->(purchased)
-        WHERE similar <> target
-        
-        // Calculate retailer similarity based on common purchases
-        WITH target, similar, COUNT(DISTINCT purchased) as common_purchases
-        WHERE common_purchases >= 2  // At least 2 products in common
-        
-        // Find products that similar retailers bought but target hasn't
-        MATCH (similar)-[:PURCHASES]->(recommended:Product)
-        WHERE NOT (target)-[:PURCHASES]->(recommended)
-        
-        // Get product details
-        OPTIONAL MATCH (recommended)-[:BELONGS_TO]->(brand:Brand)
-        OPTIONAL MATCH (recommended)-[:BELONGS_TO]->(category:Category)
-        OPTIONAL MATCH (supplier:Supplier)-[:SUPPLIES]->(recommended)
-        
-        // Calculate recommendation metrics
-        WITH recommended, brand, category, supplier,
-             COUNT(DISTINCT similar) as similar_retailer_count,
-             AVG(common_purchases) as avg_similarity,
-             COUNT(DISTINCT similar) as anchor_products,
-             AVG(CASE WHEN recommended.price IS NOT NULL THEN toFloat(recommended.price) END) as avg_price,
-             AVG(CASE WHEN recommended.margin IS NOT NULL THEN toFloat(recommended.margin) END) as avg_margin
-        
-        // Calculate confidence score based on multiple factors
-        WITH recommended, brand, category, supplier, avg_price, avg_margin,
-             similar_retailer_count,
-             avg_similarity,
-             anchor_products,
-             // Confidence: more similar retailers + higher average similarity = higher confidence
-             CASE 
-                 WHEN similar_retailer_count >= 5 THEN 0.8 + (avg_similarity / 10.0)
-                 WHEN similar_retailer_count >= 3 THEN 0.6 + (avg_similarity / 15.0)
-                 WHEN similar_retailer_count >= 2 THEN 0.4 + (avg_similarity / 20.0)
-                 ELSE 0.2 + (avg_similarity / 25.0)
-             END as confidence_score
-        
-        WHERE confidence_score > 0.3  // Filter low-confidence recommendations
-        
-        ORDER BY confidence_score DESC, similar_retailer_count DESC
-        LIMIT $limit
-        
-        RETURN recommended.name as product_name,
-               COALESCE(brand.name, recommended.brand, 'Unknown') as brand,
-               COALESCE(category.name, recommended.category, 'Unknown') as category,
-               COALESCE(supplier.name, recommended.supplier, 'Unknown') as supplier,
-               confidence_score,
-               similar_retailer_count,
-               avg_similarity,
-               anchor_products,
-               avg_price,
-               avg_margin
-        """
-        
-        results = self.neo4j_graph.query(cypher, {"retailer_id": retailer_id, "limit": limit})
+        results = self._recommender_rows("collaborative", collaborative_cypher, retailer_id, limit, recency)
         
         recommendations = []
         for result in results:
@@ -174,70 +946,16 @@ class QwipoRecommendationEngine:
                         "confidence_calculation": "Based on retailer similarity and purchase overlap"
                     }
                 )
+                _add_recency_evidence(rec, result)
                 recommendations.append(rec)
         
         return recommendations
     
-    def get_category_expansion_recommendations(self, retailer_id: str, limit: int = 10) -> List[Recommendation]:
+    def get_category_expansion_recommendations(self, retailer_id: str, limit: int = 10,
+                                               recency: Optional[Recency] = None) -> List[Recommendation]:
         """Recommend products from categories the retailer hasn't explored"""
         
-        cypher = """
-        // Get retailer's current categories
-        MATCH (target:Retailer {id: $retailer_id})-[:PURCHASES]->(purchased:Product)
-        OPTIONAL MATCH (purchased)-[:BELONGS_TO]->(purchased_cat:Category)
-        
-        WITH target, COLLECT(DISTINCT COALESCE(purchased_cat.name, purchased.category)) as current_categories
-        
-        // Find popular products in unexplored categories
-        MATCH (other:Retailer)-[:PURCHASES]->(popular:Product)
-        WHERE other <> target
-        OPTIONAL MATCH (popular)-[:BELONGS_TO]->(new_cat:Category)
-        
-        WITH target, current_categories, popular, new_cat,
-             COALESCE(new_cat.name, popular.category) as category_name,
-             COUNT(DISTINCT other) as popularity_score
-        
-        WHERE NOT category_name IN current_categories
-        AND popularity_score >= 3  // Must be purchased by at least 3 retailers
-        
-        // Get additional product details
-        OPTIONAL MATCH (popular)-[:BELONGS_TO]->(brand:Brand)
-        OPTIONAL MATCH (supplier:Supplier)-[:SUPPLIES]->(popular)
-        
-        // Calculate confidence based on category popularity and retailer business context
-        MATCH (target)
-        WITH popular, brand, new_cat, supplier, category_name, popularity_score,
-             target.business_type as business_type,
-             target.size as retailer_size,
-             AVG(CASE WHEN popular.price IS NOT NULL THEN toFloat(popular.price) END) as avg_price,
-             AVG(CASE WHEN popular.margin IS NOT NULL THEN toFloat(popular.margin) END) as avg_margin
-        
-        // Calculate confidence: higher for more popular categories
-        WITH popular, brand, new_cat, supplier, category_name, popularity_score, 
-             business_type, retailer_size, avg_price, avg_margin,
-             CASE 
-                 WHEN popularity_score >= 10 THEN 0.7
-                 WHEN popularity_score >= 7 THEN 0.6
-                 WHEN popularity_score >= 5 THEN 0.5
-                 ELSE 0.4
-             END as confidence_score
-        
-        ORDER BY confidence_score DESC, popularity_score DESC
-        LIMIT $limit
-        
-        RETURN popular.name as product_name,
-               COALESCE(brand.name, popular.brand, 'Unknown') as brand,
-               category_name as category,
-               COALESCE(supplier.name, popular.supplier, 'Unknown') as supplier,
-               confidence_score,
-               popularity_score,
-               business_type,
-               retailer_size,
-               avg_price,
-               avg_margin
-        """
-        
-        results = self.neo4j_graph.query(cypher, {"retailer_id": retailer_id, "limit": limit})
+        results = self._recommender_rows("category_expansion", category_expansion_cypher, retailer_id, limit, recency)
         
         recommendations = []
         for result in results:
@@ -268,68 +986,16 @@ class QwipoRecommendationEngine:
                         "confidence_calculation": "Based on category adoption by similar businesses"
                     }
                 )
+                _add_recency_evidence(rec, result)
                 recommendations.append(rec)
         
         return recommendations
     
-    def get_brand_loyalty_recommendations(self, retailer_id: str, limit: int = 10) -> List[Recommendation]:
+    def get_brand_loyalty_recommendations(self, retailer_id: str, limit: int = 10,
+                                          recency: Optional[Recency] = None) -> List[Recommendation]:
         """Recommend products from brands the retailer already uses"""
         
-        cypher = """
-        // Find retailer's preferred brands
-        MATCH (target:Retailer {id: $retailer_id})-[:PURCHASES]->(purchased:Product)
-        OPTIONAL MATCH (purchased)-[:BELONGS_TO]->(preferred_brand:Brand)
-        
-        WITH target, 
-             COLLECT(DISTINCT COALESCE(preferred_brand.name, purchased.brand)) as preferred_brands,
-             COUNT(DISTINCT purchased) as total_products_bought
-        
-        // Find other products from preferred brands that retailer hasn't bought
-        UNWIND preferred_brands as brand_name
-        
-        MATCH (brand_product:Product)
-        WHERE (brand_product.brand = brand_name OR EXISTS((brand_product)-[:BELONGS_TO]->(:Brand {name: brand_name})))
-        AND NOT (target)-[:PURCHASES]->(brand_product)
-        
-        // Get popularity of these products
-        MATCH (other:Retailer)-[:PURCHASES]->(brand_product)
-        WHERE other <> target
-        
-        // Get product details
-        OPTIONAL MATCH (brand_product)-[:BELONGS_TO]->(brand:Brand)
-        OPTIONAL MATCH (brand_product)-[:BELONGS_TO]->(category:Category)
-        OPTIONAL MATCH (supplier:Supplier)-[:SUPPLIES]->(brand_product)
-        
-        WITH target, brand_name, brand_product, brand, category, supplier,
-             COUNT(DISTINCT other) as product_popularity,
-             AVG(CASE WHEN brand_product.price IS NOT NULL THEN toFloat(brand_product.price) END) as avg_price,
-             AVG(CASE WHEN brand_product.margin IS NOT NULL THEN toFloat(brand_product.margin) END) as avg_margin
-        
-        WHERE product_popularity >= 2  // At least 2 other retailers bought it
-        
-        // Calculate confidence: higher for more popular products from preferred brands
-        WITH brand_product, brand, category, supplier, brand_name, product_popularity, avg_price, avg_margin,
-             CASE 
-                 WHEN product_popularity >= 8 THEN 0.8
-                 WHEN product_popularity >= 5 THEN 0.7
-                 WHEN product_popularity >= 3 THEN 0.6
-                 ELSE 0.5
-             END as confidence_score
-        
-        ORDER BY confidence_score DESC, product_popularity DESC
-        LIMIT $limit
-        
-        RETURN brand_product.name as product_name,
-               brand_name as brand,
-               COALESCE(category.name, brand_product.category, 'Unknown') as category,
-               COALESCE(supplier.name, brand_product.supplier, 'Unknown') as supplier,
-               confidence_score,
-               product_popularity,
-               avg_price,
-               avg_margin
-        """
-        
-        results = self.neo4j_graph.query(cypher, {"retailer_id": retailer_id, "limit": limit})
+        results = self._recommender_rows("brand_loyalty", brand_loyalty_cypher, retailer_id, limit, recency)
         
         recommendations = []
         for result in results:
@@ -360,42 +1026,284 @@ class QwipoRecommendationEngine:
                         "confidence_calculation": "Based on brand preference and product popularity"
                     }
                 )
+                _add_recency_evidence(rec, result)
                 recommendations.append(rec)
         
         return recommendations
     
-    def get_comprehensive_recommendations(self, retailer_id: str, limit_per_type: int = 5) -> Dict[str, List[Recommendation]]:
-        """Get recommendations from all algorithms"""
+    def get_cold_start_recommendations(self, retailer_id: str, profile: Dict[str, Any],
+                                       limit: int = 10) -> Dict[str, List[Recommendation]]:
+        """Recommendations for retailers with little history: peer-group popularity, and products
+        similar to the few they already buy"""
+        purchased = []
+        if profile.get('products_bought'):
+            purchased = [row['product_name'] for row in
+                         self._run_query("purchased_products", PURCHASED_PRODUCTS_CYPHER, {"retailer_id": retailer_id})]
+        
+        recommendations = {"cold_start": self._popular_with_peers(profile, purchased, limit)}
+        if purchased and self.product_vectors is not None:
+            recommendations["content_based"] = self.get_content_based_recommendations(purchased, limit)
+        return recommendations
+    
+    def _popular_with_peers(self, profile: Dict[str, Any], purchased: List[str], limit: int) -> List[Recommendation]:
+        """Most-bought products among the retailer's peers, from the precomputed tables"""
+        recommendations = []
+        for product_name, buyers, share, level in self.cold_start.lookup(profile, limit, exclude=purchased):
+            product = self.cold_start.product(product_name) or {}
+            peers = LEVEL_LABELS[level]
+            recommendations.append(Recommendation(
+                product_name=product_name,
+                brand=product.get('brand') or 'Unknown',
+                category=product.get('category') or 'Unknown',
+                supplier=product.get('supplier'),
+                confidence_score=round(min(share, 1.0), 4),
+                reasoning=[
+                    f"Bought by {share:.0%} of retailers with the {peers}",
+                    f"{buyers} peer retailers purchase this product"
+                ],
+                recommendation_type="Popular With Peers",
+                price=product.get('price'),
+                profit_margin=product.get('margin'),
+                graph_evidence={
+                    "peer_buyers": buyers,
+                    "peer_share": round(share, 4),
+                    "peer_group": list(level),
+                    "confidence_calculation": "Share of peer retailers buying the product"
+                }
+            ))
+        return recommendations
+    
+    def get_content_based_recommendations(self, purchased: List[str], limit: int = 10) -> List[Recommendation]:
+        """Products whose name, brand, category and pack text is closest to what the retailer buys"""
+        vectors = self.product_vectors
+        centroid = vectors.profile_vector(purchased)
+        if centroid is None:
+            return []
+        
+        anchors = [vectors.index[name] for name in purchased if name in vectors]
+        recommendations = []
+        for row, similarity in vectors.nearest(centroid, limit, exclude=purchased):
+            product = vectors.products[row]
+            # The purchased product this one is most similar to explains the match
+            anchor = vectors.products[anchors[int(np.argmax(vectors.matrix[anchors] @ vectors.matrix[row]))]]
+            recommendations.append(Recommendation(
+                product_name=product['product_name'],
+                brand=product.get('brand') or 'Unknown',
+                category=product.get('category') or 'Unknown',
+                supplier=product.get('supplier'),
+                confidence_score=round(min(similarity, 1.0), 4),
+                reasoning=[
+                    f"Similar to {anchor['product_name']}, which you already buy",
+                    f"Content similarity: {similarity:.2f}"
+                ],
+                recommendation_type="Content Based",
+                price=product.get('price'),
+                profit_margin=product.get('margin'),
+                graph_evidence={
+                    "similarity": round(similarity, 4),
+                    "anchor_product": anchor['product_name'],
+                    "retailer_count": product.get('retailer_count'),
+                    "confidence_calculation": "Cosine similarity of product name, brand, category and unit vectors"
+                }
+            ))
+        return recommendations
+    
+    def build_product_vectors(self, products: List[Dict[str, Any]], shared_dir: Optional[str] = None) -> ProductVectorIndex:
+        """Rebuild the product content vectors (catalog rows incl. products never purchased) and swap them in"""
+        vectors = load_or_build_vectors(products, shared_dir)
+        self.product_vectors = vectors
+        return vectors
+    
+    def recommenders(self, recency: Optional[Recency] = None) -> Dict[str, Callable[[str, int], List[Recommendation]]]:
+        """Recommendation type -> recommender(retailer_id, limit) over the purchases recency selects, in response order"""
+        return {
+            'collaborative': self._coalesced('collaborative', self.get_collaborative_recommendations, recency),
+            'category_expansion': self._coalesced('category_expansion', self.get_category_expansion_recommendations, recency),
+            'brand_loyalty': self._coalesced('brand_loyalty', self.get_brand_loyalty_recommendations, recency),
+        }
+    
+    def _coalesced(self, rec_type: str, recommender: Callable[..., List[Recommendation]],
+                   recency: Optional[Recency]) -> Callable[[str, int], List[Recommendation]]:
+        """recommender sharing in-flight calls for the same (type, retailer, limit, recency)"""
+        def call(retailer_id: str, limit: int) -> List[Recommendation]:
+            return self.single_flight.do((rec_type, retailer_id, limit, recency, self.generation),
+                                         lambda: recommender(retailer_id, limit, recency))
+        return call
+    
+    def run_recommenders(self, retailer_id: str, limit: int, profile: Dict[str, Any],
+                         types: Optional[Sequence[str]] = None, deadline_seconds: Optional[float] = None,
+                         recency: Optional[Recency] = None) -> Tuple[Dict[str, List[Recommendation]], Dict[str, str]]:
+        """Run the recommenders (or just `types`) concurrently and keep those that finish by the deadline
+        
+        Returns the recommendations by type and a status per type: ok, timeout, error, or skipped
+        for a requested type that does not apply to this retailer (graph recommenders for a
+        cold-start retailer and vice versa). recency applies to the graph recommenders only.
+        """
+        if self.is_cold_start(profile):
+            # Too little history for the graph recommenders: answer from the popularity tables instead
+            tasks = {}
+            if types is None or set(types) & {"cold_start", "content_based"}:
+                tasks["cold_start"] = lambda: self.get_cold_start_recommendations(retailer_id, profile, limit)
+        else:
+            tasks = {
+                rec_type: partial(recommender, retailer_id, limit)
+                for rec_type, recommender in self.recommenders(recency).items() if types is None or rec_type in types
+            }
+        
+        def traced(rec_type: str, task: Callable[[], Any]) -> Callable[[], Any]:
+            # Runs in a copy of the caller's context (submit_recommender), so its span joins the request trace
+            def run():
+                with span("recommender", type=rec_type) as recommender_span:
+                    result = task()
+                    recommender_span.set(results=sum(map(len, result.values())) if isinstance(result, dict) else len(result))
+                return result
+            return run
+        
+        deadline = time.monotonic() + deadline_seconds if deadline_seconds is not None else None
+        
+        def remaining() -> Optional[float]:
+            return max(deadline - time.monotonic(), 0.0) if deadline is not None else None
+        
+        recommendations: Dict[str, List[Recommendation]] = {}
+        status: Dict[str, str] = {}
+        
+        def failed(rec_type: str, state: str):
+            status[rec_type] = state
+            # A requested content_based list comes from the cold-start task
+            if rec_type == "cold_start" and types and "content_based" in types:
+                status["content_based"] = state
+        
+        futures = {}
+        for rec_type, task in tasks.items():
+            future = submit_recommender(traced(rec_type, task), remaining())
+            if future is None:
+                failed(rec_type, "timeout")
+                RECOMMENDER_DEADLINE_MISSES.inc(1.0, rec_type)
+                logger.warning("No recommender thread free before the deadline",
+                               extra={"retailer_id": retailer_id, "type": rec_type})
+                continue
+            futures[future] = rec_type
+        done, _ = wait(futures, timeout=remaining())
+        
+        for future, rec_type in futures.items():
+            if future not in done:
+                # Still running (it cannot be stopped) and holding its thread until it finishes
+                failed(rec_type, "timeout")
+                RECOMMENDER_DEADLINE_MISSES.inc(1.0, rec_type)
+                logger.warning("Recommender missed the deadline", extra={"retailer_id": retailer_id, "type": rec_type})
+                continue
+            try:
+                result = future.result()
+            except Exception:
+                failed(rec_type, "error")
+                logger.exception("Recommender failed", extra={"retailer_id": retailer_id, "type": rec_type})
+                continue
+            # The cold-start task answers several lists at once
+            for list_type, recs in (result.items() if isinstance(result, dict) else [(rec_type, result)]):
+                recommendations[list_type] = recs
+                status[list_type] = "ok"
+        for rec_type in types or ():
+            status.setdefault(rec_type, "skipped")
+        return recommendations, status
+    
+    def _cache_complete(self, key: Tuple, value: Any, status: Dict[str, str], generation: int):
+        """Cache a result only if every part of it was computed; partial results are per request"""
+        if all(state in ("ok", "skipped") for state in status.values()):
+            self._store(key, value, generation)
+    
+    def _cached_result(self, key: Tuple) -> Any:
+        return self.result_cache.get(key) if self.result_cache is not None else MISSING
+    
+    def get_blended_recommendations(self, retailer_id: str, limit: int = 10,
+                                    recency: Optional[Recency] = None) -> List[Recommendation]:
+        """One ranked list across all recommenders, deduplicated by product"""
+        return self.get_blended_within(retailer_id, limit, recency=recency)[0]
+    
+    def get_blended_within(self, retailer_id: str, limit: int = 10, deadline_seconds: Optional[float] = None,
+                           recency: Optional[Recency] = None) -> Tuple[List[Recommendation], Dict[str, str]]:
+        """Blended list over the recommenders that finish by the deadline, with their status"""
+        key = ("blended", retailer_id, limit, recency)
+        cached = self._cached_result(key)
+        if cached is not MISSING:
+            return cached
+        generation = self.generation
         
-        print(f"🔍 Generating comprehensive recommendations for retailer: {retailer_id}")
+        profile = self.get_retailer_profile(retailer_id)
+        if self.is_cold_start(profile):
+            ranked, status = self.run_recommenders(retailer_id, limit, profile, deadline_seconds=deadline_seconds)
+            weights = SPARSE_BLEND_WEIGHTS
+        else:
+            # Each recommender contributes at most `limit` products to the top `limit`, so that is all we fetch;
+            # recommenders weighted 0 are not queried at all
+            weighted = [rec_type for rec_type in self.recommenders() if self.blend_weights.get(rec_type, 0) > 0]
+            ranked, status = self.run_recommenders(retailer_id, limit, profile, types=weighted,
+                                                   deadline_seconds=deadline_seconds, recency=recency)
+            weights = self.blend_weights
         
-        # Get retailer profile
+        with span("blend"):
+            blended = blend_recommendations(ranked, weights, limit)
+        self._cache_complete(key, (blended, status), status, generation)
+        return blended, status
+    
+    def get_type_within(self, retailer_id: str, rec_type: str, limit: int = 10,
+                        deadline_seconds: Optional[float] = None, recency: Optional[Recency] = None
+                        ) -> Tuple[List[Recommendation], Dict[str, str]]:
+        """One recommendation type, computed alone unless the comprehensive result is already cached"""
+        cached = self._cached_result(("comprehensive", retailer_id, limit, recency))
+        if cached is not MISSING:
+            return cached.get(rec_type, []), {rec_type: "ok" if rec_type in cached else "skipped"}
         profile = self.get_retailer_profile(retailer_id)
-        print(f"🏢 Retailer Profile: {profile.get('retailer_name', 'Unknown')} ({profile.get('business_type', 'Unknown')})")
-        print(f"   Location: {profile.get('location', 'Unknown')}, Size: {profile.get('size', 'Unknown')}")
-        print(f"   Current Portfolio: {profile.get('products_bought', 0)} products, {profile.get('brands_used', 0)} brands")
-        
-        recommendations = {}
-        
-        # Collaborative Filtering
-        print("\n🤝 Generating collaborative recommendations...")
-        collab_recs = self.get_collaborative_recommendations(retailer_id, limit_per_type)
-        recommendations['collaborative'] = collab_recs
-        print(f"   Found {len(collab_recs)} collaborative recommendations")
-        
-        # Category Expansion
-        print("\n📈 Generating category expansion recommendations...")
-        category_recs = self.get_category_expansion_recommendations(retailer_id, limit_per_type)
-        recommendations['category_expansion'] = category_recs
-        print(f"   Found {len(category_recs)} category expansion opportunities")
-        
-        # Brand Loyalty
-        print("\n🏷️ Generating brand loyalty recommendations...")
-        brand_recs = self.get_brand_loyalty_recommendations(retailer_id, limit_per_type)
-        recommendations['brand_loyalty'] = brand_recs
-        print(f"   Found {len(brand_recs)} brand extension opportunities")
+        recommendations, status = self.run_recommenders(retailer_id, limit, profile, types=[rec_type],
+                                                        deadline_seconds=deadline_seconds, recency=recency)
+        return recommendations.get(rec_type, []), {rec_type: status[rec_type]}
+    
+    def get_comprehensive_recommendations(self, retailer_id: str, limit_per_type: int = 5,
+                                          recency: Optional[Recency] = None) -> Dict[str, List[Recommendation]]:
+        """Get recommendations from all algorithms"""
+        return self.get_comprehensive_within(retailer_id, limit_per_type, recency=recency)[0]
+    
+    def get_comprehensive_within(self, retailer_id: str, limit_per_type: int = 5,
+                                 deadline_seconds: Optional[float] = None, profile: Optional[Dict[str, Any]] = None,
+                                 recency: Optional[Recency] = None
+                                 ) -> Tuple[Dict[str, List[Recommendation]], Dict[str, str]]:
+        """Recommendations from every recommender that finishes by the deadline, with a status per type"""
+        key = ("comprehensive", retailer_id, limit_per_type, recency)
+        cached = self._cached_result(key)
+        if cached is not MISSING:
+            return cached, {rec_type: "ok" for rec_type in cached}
+        generation = self.generation
         
-        return recommendations
+        # Get retailer profile (callers that already have it pass it in)
+        if profile is None:
+            with span("profile", retailer_id=retailer_id):
+                profile = self.get_retailer_profile(retailer_id)
+        logger.debug(
+            "Retailer profile loaded",
+            extra={
+                "retailer_id": retailer_id,
+                "retailer_name": profile.get('retailer_name'),
+                "business_type": profile.get('business_type'),
+                "location": profile.get('location'),
+                "size": profile.get('size'),
+                "products_bought": profile.get('products_bought', 0),
+                "brands_used": profile.get('brands_used', 0),
+            }
+        )
+        
+        recommendations, status = self.run_recommenders(retailer_id, limit_per_type, profile,
+                                                        deadline_seconds=deadline_seconds, recency=recency)
+        self._cache_complete(key, recommendations, status, generation)
+        
+        logger.info(
+            "Generated comprehensive recommendations",
+            extra={
+                "retailer_id": retailer_id,
+                "counts": {rec_type: len(recs) for rec_type, recs in recommendations.items()},
+                "status": status,
+                "sampled": True,
+            }
+        )
+        return recommendations, status
     
     def export_recommendations(self, recommendations: Dict[str, List[Recommendation]], retailer_id: str, output_file: str = None):
         """Export recommendations to JSON file"""
@@ -426,3 +1334,36 @@ class QwipoRecommendationEngine:
         
         print(f"💾 Recommendations exported to: {output_file}")
         return output_file
+
+
+def create_recommendation_engine() -> QwipoRecommendationEngine:
+    """Create the engine for the backend selected by QWIPO_ENGINE_BACKEND (neo4j, local or snapshot)"""
+    load_dotenv(override=True)
+    backend = os.getenv("QWIPO_ENGINE_BACKEND", "neo4j").lower()
+    result_cache = ResultCache.from_env()
+    
+    if backend == "snapshot":
+        from graph_snapshot import DEFAULT_SNAPSHOT_FILE, load_snapshot, snapshot_graph_files, snapshot_is_current
+        
+        # Memory-mapped graph written by ingestion; built from the data files on first use
+        # (and rebuilt when it was written in an older format)
+        path = os.getenv("QWIPO_SNAPSHOT_FILE", DEFAULT_SNAPSHOT_FILE)
+        if not snapshot_is_current(path):
+            logger.warning("Graph snapshot missing or outdated, building it from the data files", extra={"path": path})
+            snapshot_graph_files(
+                os.getenv("RETAILERS_FILE", "mock_data/retailers.json"),
+                os.getenv("TRANSACTIONS_FILE", "mock_data/transactions.json"),
+                path
+            )
+        return QwipoRecommendationEngine(local_graph=load_snapshot(path), result_cache=result_cache)
+    
+    if backend == "local":
+        from in_memory_graph import InMemoryRecommendationGraph
+        
+        graph = InMemoryRecommendationGraph.from_files(
+            os.getenv("RETAILERS_FILE", "mock_data/retailers.json"),
+            os.getenv("TRANSACTIONS_FILE", "mock_data/transactions.json")
+        )
+        return QwipoRecommendationEngine(local_graph=graph, result_cache=result_cache)
+    
+    return QwipoRecommendationEngine(result_cache=result_cache)
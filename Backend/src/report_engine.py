@@ -0,0 +1,240 @@
+"""
+Single-pass summary report engine for Qwipo transaction data.
+
+Every distribution in the summary report is accumulated in one pass over the
+transactions, so the same code works on an in-memory list, a columnar table
+(dict of lists or a pandas DataFrame) or a record stream read lazily from disk.
+"""
+
+import heapq
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional
+
+
+def iter_json_records(path: str, chunk_size: int = 1 << 20) -> Iterator[Dict[str, Any]]:
+    """Stream records from a JSON array file or an NDJSON file without loading it whole"""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = f.read(chunk_size).lstrip()
+        in_array = buffer.startswith("[")
+        if in_array:
+            buffer = buffer[1:]
+        eof = False
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if in_array and buffer.startswith("]"):
+                return
+            try:
+                record, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    if buffer.strip():
+                        raise
+                    return
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield record
+            buffer = buffer[end:]
+
+
+class _GroupStats:
+    """Spend and basket accumulator for one segment or city"""
+    __slots__ = ("transactions", "sales", "quantity", "basket_items", "retailers")
+
+    def __init__(self):
+        self.transactions = 0
+        self.sales = 0
+        self.quantity = 0
+        self.basket_items = 0
+        self.retailers = set()
+
+    def to_dict(self) -> Dict[str, Any]:
+        active = len(self.retailers)
+        return {
+            "transactions": self.transactions,
+            "total_sales": self.sales,
+            "total_quantity": self.quantity,
+            "active_retailers": active,
+            "avg_order_value": round(self.sales / self.transactions, 2) if self.transactions else 0.0,
+            "spend_per_retailer": round(self.sales / active, 2) if active else 0.0,
+            "basket_rate": round(self.basket_items / self.transactions, 4) if self.transactions else 0.0,
+        }
+
+
+class TransactionReportBuilder:
+    """Accumulate every summary distribution in a single pass over transactions"""
+
+    def __init__(self, top_products: int = 10, top_brands: int = 5, top_retailers: int = 10):
+        self.top_products = top_products
+        self.top_brands = top_brands
+        self.top_retailers = top_retailers
+
+        self.total_transactions = 0
+        self.total_sales = 0
+        self.total_quantity = 0
+        self.basket_items = 0
+
+        # product -> [sales, quantity, transactions]
+        self.product_stats: Dict[str, List[float]] = defaultdict(lambda: [0, 0, 0])
+        self.brand_stats: Dict[str, List[float]] = defaultdict(lambda: [0, 0, 0])
+        self.category_stats: Dict[str, List[float]] = defaultdict(lambda: [0, 0, 0])
+        # month -> [sales, transactions]
+        self.monthly_stats: Dict[str, List[float]] = defaultdict(lambda: [0, 0])
+        self.retailer_sales: Dict[str, float] = defaultdict(int)
+        self.segment_stats: Dict[str, _GroupStats] = defaultdict(_GroupStats)
+        self.city_stats: Dict[str, _GroupStats] = defaultdict(_GroupStats)
+
+    def add(self, retailer_id, segment, location, product, brand, category,
+            purchase_date, quantity, amount, is_basket_item=False):
+        """Fold a single transaction into the running aggregates"""
+        basket = 1 if is_basket_item else 0
+
+        self.total_transactions += 1
+        self.total_sales += amount
+        self.total_quantity += quantity
+        self.basket_items += basket
+
+        stats = self.product_stats[product]
+        stats[0] += amount
+        stats[1] += quantity
+        stats[2] += 1
+        stats = self.brand_stats[brand]
+        stats[0] += amount
+        stats[1] += quantity
+        stats[2] += 1
+        stats = self.category_stats[category]
+        stats[0] += amount
+        stats[1] += quantity
+        stats[2] += 1
+
+        month = self.monthly_stats[purchase_date[:7]]  # YYYY-MM
+        month[0] += amount
+        month[1] += 1
+
+        self.retailer_sales[retailer_id] += amount
+
+        for group in (self.segment_stats[segment], self.city_stats[location]):
+            group.transactions += 1
+            group.sales += amount
+            group.quantity += quantity
+            group.basket_items += basket
+            group.retailers.add(retailer_id)
+
+    def add_records(self, transactions: Iterable[Mapping[str, Any]]) -> "TransactionReportBuilder":
+        """Consume transaction dicts from a list or a lazy stream"""
+        add = self.add
+        for t in transactions:
+            add(t["retailer_id"], t.get("retailer_segment", "Unknown"), t.get("retailer_location", "Unknown"),
+                t["product_name"], t["brand"], t.get("category", "Unknown"), t["purchase_date"],
+                t["quantity"], t["total_amount"], t.get("is_basket_item", False))
+        return self
+
+    def add_columns(self, columns: Mapping[str, Iterable[Any]]) -> "TransactionReportBuilder":
+        """Consume a columnar table (dict of lists, arrays or a pandas DataFrame)"""
+        row_count = len(columns["retailer_id"])
+
+        def column(name, default):
+            if name not in columns:
+                return [default] * row_count
+            values = columns[name]
+            # numpy/pandas columns become native Python values for JSON output
+            return values.tolist() if hasattr(values, "tolist") else values
+
+        rows = zip(
+            column("retailer_id", None), column("retailer_segment", "Unknown"),
+            column("retailer_location", "Unknown"), column("product_name", None), column("brand", None),
+            column("category", "Unknown"), column("purchase_date", None), column("quantity", 0),
+            column("total_amount", 0.0), column("is_basket_item", False),
+        )
+        add = self.add
+        for row in rows:
+            # Missing basket flags come through as NaN from pandas
+            basket = row[9]
+            add(*row[:9], is_basket_item=bool(basket) and basket == basket)
+        return self
+
+    def build(self, retailers: Optional[Iterable[Mapping[str, Any]]] = None,
+              total_brands: Optional[int] = None) -> Dict[str, Any]:
+        """Assemble the summary report from the accumulated state"""
+        retailer_distribution = {"by_size": {}, "by_segment": {}, "by_location": {}, "by_business_type": {}}
+        total_retailers = 0
+        for retailer in retailers or []:
+            total_retailers += 1
+            for key, field in (("by_size", "size"), ("by_segment", "customer_segment"),
+                               ("by_location", "location"), ("by_business_type", "business_type")):
+                value = retailer.get(field, "Unknown")
+                bucket = retailer_distribution[key]
+                bucket[value] = bucket.get(value, 0) + 1
+
+        top_products = heapq.nlargest(self.top_products, self.product_stats.items(), key=lambda x: x[1][0])
+        top_brands = heapq.nlargest(self.top_brands, self.brand_stats.items(), key=lambda x: x[1][0])
+        top_retailers = heapq.nlargest(self.top_retailers, self.retailer_sales.items(), key=lambda x: x[1])
+
+        monthly = dict(sorted(self.monthly_stats.items()))
+        peak_month = max(monthly.items(), key=lambda x: x[1][0])[0] if monthly else None
+        low_month = min(monthly.items(), key=lambda x: x[1][0])[0] if monthly else None
+
+        txns = self.total_transactions
+        return {
+            "generation_date": datetime.now().isoformat(),
+            "total_retailers": total_retailers or len(self.retailer_sales),
+            "total_transactions": txns,
+            "total_brands": total_brands if total_brands is not None else len(self.brand_stats),
+            "retailer_distribution": retailer_distribution,
+            "transaction_patterns": {
+                "total_sales": self.total_sales,
+                "total_quantity": self.total_quantity,
+                "avg_order_value": round(self.total_sales / txns, 2) if txns else 0.0,
+                "basket_rate": round(self.basket_items / txns, 4) if txns else 0.0,
+                "active_retailers": len(self.retailer_sales),
+                "by_category": {
+                    c: {"total_sales": s[0], "total_quantity": s[1], "transactions": s[2]}
+                    for c, s in sorted(self.category_stats.items(), key=lambda x: x[1][0], reverse=True)
+                },
+            },
+            "top_products": [
+                {"product": p, "total_sales": s[0], "total_quantity": s[1], "transactions": s[2]}
+                for p, s in top_products
+            ],
+            "regional_distribution": {
+                city: stats.to_dict() for city, stats in sorted(self.city_stats.items())
+            },
+            "seasonal_insights": {
+                "peak_month": peak_month,
+                "lowest_month": low_month,
+                "monthly_transactions": {m: s[1] for m, s in monthly.items()},
+            },
+            "top_brands": [
+                {"brand": b, "total_sales": s[0], "total_quantity": s[1], "transactions": s[2]}
+                for b, s in top_brands
+            ],
+            "top_retailers": [{"retailer_id": r, "total_sales": s} for r, s in top_retailers],
+            "segment_performance": {
+                segment: stats.to_dict() for segment, stats in sorted(self.segment_stats.items())
+            },
+            "monthly_sales_trend": {m: s[0] for m, s in monthly.items()},
+        }
+
+
+def build_summary_report(transactions, retailers=None, total_brands=None, **top_n) -> Dict[str, Any]:
+    """Build a summary report from records, a record stream or a columnar table"""
+    builder = TransactionReportBuilder(**top_n)
+    if isinstance(transactions, Mapping) or hasattr(transactions, "columns"):
+        builder.add_columns(transactions)
+    else:
+        builder.add_records(transactions)
+    return builder.build(retailers, total_brands=total_brands)
+
+
+if __name__ == "__main__":
+    import sys
+
+    transactions_file = sys.argv[1] if len(sys.argv) > 1 else "mock_data/transactions.json"
+    retailers_file = sys.argv[2] if len(sys.argv) > 2 else "mock_data/retailers.json"
+
+    report = build_summary_report(iter_json_records(transactions_file), iter_json_records(retailers_file))
+    print(json.dumps(report, indent=2, default=str))
@@ -0,0 +1,78 @@
+"""
+Bounded in-process cache of recommendation results.
+
+Entries are kept in least-recently-used order and expire after a fixed time to
+live, so a retailer's results are recomputed at most once per TTL while they
+stay hot, and memory is capped by the entry count. Keys are tuples whose first
+element names the kind of result ("profile", "comprehensive", ...), which is
+also the cache label on qwipo_cache_requests_total.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from metrics import record_cache_lookup
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 300.0
+
+# Returned by get() for absent or expired entries (None is a valid cached value)
+MISSING = object()
+
+
+class ResultCache:
+    """Thread-safe LRU cache with a per-entry time to live"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["ResultCache"]:
+        """Cache sized by QWIPO_RESULT_CACHE_SIZE (0 disables it) and QWIPO_RESULT_CACHE_TTL_SECONDS"""
+        max_entries = int(os.getenv("QWIPO_RESULT_CACHE_SIZE", str(DEFAULT_MAX_ENTRIES)))
+        if max_entries <= 0:
+            return None
+        return cls(max_entries, float(os.getenv("QWIPO_RESULT_CACHE_TTL_SECONDS", str(DEFAULT_TTL_SECONDS))))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple) -> Any:
+        """Cached value, or MISSING when absent or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                value = entry[1]
+            else:
+                if entry is not None:
+                    del self._entries[key]
+                value = MISSING
+        record_cache_lookup(key[0], value is not MISSING)
+        return value
+
+    def put(self, key: Tuple, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate(self, predicate: Callable[[Tuple], bool]) -> int:
+        """Drop the entries whose key matches predicate (e.g. one retailer's results); returns how many"""
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
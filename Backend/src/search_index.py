@@ -0,0 +1,180 @@
+"""
+In-memory retailer search: prefix and typo-tolerant lookup over name, location and id.
+
+Every field is split into lowercase alphanumeric tokens. The distinct tokens are
+kept sorted for prefix range lookups (bisect), and each one is also indexed by
+its character trigrams, so a misspelled query token is matched to vocabulary
+tokens sharing enough trigrams and then confirmed with a bounded edit distance.
+One edit (a transposition included) changes at most 4 of a token's trigrams, so
+"enough" is a count derived from the allowed typos, not a fixed similarity that
+would turn away one-typo matches of short words ("ctiy" shares 1 trigram with
+"city").
+Postings map each token to the retailers containing it, so a lookup touches the
+vocabulary and the postings of matched tokens, never every retailer.
+"""
+
+import bisect
+import re
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
+
+import numpy as np
+
+# Field -> weight of a match in that field
+SEARCH_FIELDS = {"retailer_name": 1.0, "retailer_id": 1.0, "location": 0.6}
+
+# Match quality per query token
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.8
+FUZZY_MATCH = 0.6
+
+# Padded trigrams one edit can change (a transposition touches 4)
+TRIGRAMS_PER_EDIT = 4
+# Tokens present in more than this share of retailers only count when they are the whole query
+COMMON_TOKEN_SHARE = 0.5
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Any) -> List[str]:
+    return _TOKEN_RE.findall(str(text).lower()) if text else []
+
+
+def trigrams(token: str) -> set:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_typos(token: str) -> int:
+    # Numbers (retailer ids) are matched exactly or by prefix only
+    if token.isdigit() or len(token) < 4:
+        return 0
+    return 1 if len(token) < 8 else 2
+
+
+def bounded_edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or limit + 1 once it is certain to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class RetailerSearchIndex:
+    """Token postings with a sorted vocabulary (prefix) and a trigram index (typos)"""
+
+    def __init__(self, retailers: Iterable[Mapping[str, Any]]):
+        self.retailers: List[Dict[str, Any]] = []
+        postings: Dict[str, Dict[int, float]] = {}
+        for doc, row in enumerate(retailers):
+            self.retailers.append({
+                "retailer_id": row["retailer_id"],
+                "retailer_name": row.get("retailer_name"),
+                "location": row.get("location"),
+                "business_type": row.get("business_type"),
+                "size": row.get("size"),
+                "segment": row.get("segment"),
+            })
+            for field, weight in SEARCH_FIELDS.items():
+                for token in tokenize(row.get(field)):
+                    token_postings = postings.setdefault(token, {})
+                    if weight > token_postings.get(doc, 0.0):
+                        token_postings[doc] = weight
+
+        # Postings laid out as CSR in vocabulary order: a prefix is a contiguous vocabulary range,
+        # so all of its postings are one slice and scoring runs vectorized
+        self._vocabulary = sorted(postings)
+        self._vocabulary_index = {token: i for i, token in enumerate(self._vocabulary)}
+        sizes = np.fromiter((len(postings[token]) for token in self._vocabulary), dtype=np.int64,
+                            count=len(self._vocabulary))
+        self._indptr = np.zeros(len(self._vocabulary) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=self._indptr[1:])
+        self._docs = np.fromiter((doc for token in self._vocabulary for doc in postings[token]),
+                                 dtype=np.int32, count=int(self._indptr[-1]))
+        self._weights = np.fromiter((weight for token in self._vocabulary for weight in postings[token].values()),
+                                    dtype=np.float32, count=int(self._indptr[-1]))
+        self._trigram_index: Dict[str, List[str]] = {}
+        for token in self._vocabulary:
+            if not token.isdigit():
+                for gram in trigrams(token):
+                    self._trigram_index.setdefault(gram, []).append(token)
+
+    def __len__(self) -> int:
+        return len(self.retailers)
+
+    def _expand(self, query_token: str) -> List[Tuple[int, int, float]]:
+        """Vocabulary ranges [start, end) matching a query token, with their match quality"""
+        start = bisect.bisect_left(self._vocabulary, query_token)
+        end = bisect.bisect_left(self._vocabulary, query_token + "\uffff", start)
+        ranges = []
+        if start < end and self._vocabulary[start] == query_token:
+            ranges.append((start, start + 1, EXACT_MATCH))
+            start += 1
+        if start < end:
+            ranges.append((start, end, PREFIX_MATCH))
+
+        typos = max_typos(query_token)
+        if typos and not ranges:
+            query_grams = trigrams(query_token)
+            shared: Dict[str, int] = {}
+            for gram in query_grams:
+                for token in self._trigram_index.get(gram, ()):
+                    shared[token] = shared.get(token, 0) + 1
+            # Tokens within `typos` edits keep at least this many trigrams (one fewer against a
+            # prefix, which lacks the query's end-of-word trigram)
+            min_shared = len(query_grams) - TRIGRAMS_PER_EDIT * typos - 1
+            for token, count in shared.items():
+                if count < min_shared:
+                    continue
+                # Compare against the same-length prefix too, so a typo in a partial word still matches
+                distance = min(bounded_edit_distance(query_token, token, typos),
+                               bounded_edit_distance(query_token, token[:len(query_token)], typos))
+                if distance <= typos:
+                    position = self._vocabulary_index[token]
+                    ranges.append((position, position + 1, FUZZY_MATCH * (1.0 - distance / (len(query_token) + 1))))
+        return ranges
+
+    def _postings_size(self, ranges: List[Tuple[int, int, float]]) -> int:
+        return int(sum(self._indptr[end] - self._indptr[start] for start, end, _ in ranges))
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Retailers ranked by matched query tokens, then match quality and field weight"""
+        expansions = [ranges for ranges in (self._expand(token) for token in dict.fromkeys(tokenize(query)))
+                      if ranges]
+        if len(expansions) > 1:
+            # Skip near-universal tokens ("retailer" in every id) when more selective ones exist
+            common = len(self.retailers) * COMMON_TOKEN_SHARE
+            expansions = [ranges for ranges in expansions if self._postings_size(ranges) <= common] or expansions
+
+        scores = np.zeros(len(self.retailers), dtype=np.float32)
+        matched = np.zeros(len(self.retailers), dtype=np.int32)
+        for ranges in expansions:
+            # Best match per retailer for this query token, across every vocabulary range it matched
+            best = np.zeros(len(self.retailers), dtype=np.float32)
+            for start, end, quality in ranges:
+                lo, hi = self._indptr[start], self._indptr[end]
+                np.maximum.at(best, self._docs[lo:hi], self._weights[lo:hi] * quality)
+            scores += best
+            matched += best > 0
+
+        # Matched query tokens dominate; per-token scores are at most 1, so this key orders
+        # by (matched, score) with earlier retailers winning ties
+        key = matched * (len(expansions) + 1) + scores
+        candidates = np.flatnonzero(matched)
+        if candidates.size > limit:
+            candidates = candidates[np.argpartition(-key[candidates], limit - 1)[:limit]]
+        ranked = sorted(candidates.tolist(), key=lambda doc: (-key[doc], doc))
+        return [
+            {**self.retailers[doc], "score": round(float(scores[doc]), 4), "matched_terms": int(matched[doc])}
+            for doc in ranked
+        ]
@@ -0,0 +1,64 @@
+"""
+Fast JSON encoding for API responses.
+
+Payloads are encoded straight to bytes with orjson when it is installed, which
+serializes dataclasses (including slotted Recommendation results) natively
+without an intermediate dict copy. Without orjson the standard library encoder
+is used, converting results through their to_dict(). Endpoints return
+FastJSONResponse directly, so FastAPI does not re-validate the payload against
+the response model.
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    if hasattr(obj, "item"):  # numpy scalars
+        return obj.item()
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    return str(obj)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(payload: Any) -> bytes:
+        """Encode a payload (dicts, lists, dataclasses) to UTF-8 JSON bytes"""
+        return orjson.dumps(payload, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(payload: Any) -> bytes:
+        """Encode a payload (dicts, lists, dataclasses) to UTF-8 JSON bytes"""
+        return json.dumps(payload, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered with dumps(), bypassing jsonable_encoder and model validation"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def comprehensive_payload(retailer_id: str, profile: Dict[str, Any], recommendations: Dict[str, List[Any]],
+                          status: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Body of the comprehensive recommendations response; results stay as objects until encoding"""
+    return {
+        "retailer_id": retailer_id,
+        "retailer_profile": profile,
+        "recommendations": recommendations,
+        "recommendation_status": status if status is not None else {rec_type: "ok" for rec_type in recommendations},
+        "generated_at": datetime.now().isoformat(),
+        "total_recommendations": sum(len(recs) for recs in recommendations.values()),
+    }
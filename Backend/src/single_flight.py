@@ -0,0 +1,59 @@
+"""
+Single-flight request coalescing for engine computations.
+
+When many requests ask for the same result at once (a campaign sends every
+client to one retailer), only the first one computes it; the others wait for
+that computation and share its result or its exception. Keys are tuples whose
+first element names the kind of computation, used as the label on
+qwipo_singleflight_requests_total (executed vs coalesced).
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from metrics import SINGLE_FLIGHT_REQUESTS
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """At most one in-flight computation per key; concurrent callers share it"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Tuple, compute: Callable[[], Any]) -> Any:
+        """Result of compute() for key, computed once however many threads ask concurrently"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            SINGLE_FLIGHT_REQUESTS.inc(1.0, key[0], "coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        SINGLE_FLIGHT_REQUESTS.inc(1.0, key[0], "executed")
+        try:
+            call.result = compute()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Later callers start a new computation (or find the result cached by compute)
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,110 @@
+"""
+Structured, level-controlled logging for the Qwipo services.
+
+Records are handed to a background thread through a QueueHandler, so request
+threads never block on console or file I/O. Hot-path records can be marked
+sampled and are then kept only at QWIPO_LOG_SAMPLE_RATE.
+
+Environment:
+    QWIPO_LOG_LEVEL        DEBUG/INFO/WARNING/ERROR (default INFO)
+    QWIPO_LOG_FORMAT       json or text (default json)
+    QWIPO_LOG_SAMPLE_RATE  fraction of sampled records to keep (default 0.1; 1.0 keeps all)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+from tracing import current_trace_id
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sampled"}
+
+# Share of per-request hot-path records kept unless QWIPO_LOG_SAMPLE_RATE says otherwise
+DEFAULT_SAMPLE_RATE = 0.1
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including extra fields and the trace id"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep records flagged `sampled` with probability rate; pass everything else"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sampled", False) and self.rate < 1.0:
+            return random.random() < self.rate
+        return True
+
+
+class TraceContextFilter(logging.Filter):
+    """Stamp the active trace id on the record while still on the calling thread"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace_id = current_trace_id()
+        if trace_id:
+            record.trace_id = trace_id
+        return True
+
+
+def configure_logging(level: str = None, fmt: str = None, sample_rate: float = None):
+    """Install the queue-backed handler on the `qwipo` logger (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    level = (level or os.getenv("QWIPO_LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("QWIPO_LOG_FORMAT", "json")).lower()
+    sample_rate = float(sample_rate if sample_rate is not None else os.getenv("QWIPO_LOG_SAMPLE_RATE", str(DEFAULT_SAMPLE_RATE)))
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(
+        JsonFormatter() if fmt == "json" else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Sample before enqueueing so dropped records cost nothing downstream
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+    queue_handler.addFilter(TraceContextFilter())
+
+    root = logging.getLogger("qwipo")
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the `qwipo` namespace, configuring logging on first use"""
+    configure_logging()
+    return logging.getLogger(f"qwipo.{name}")
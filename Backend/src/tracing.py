@@ -0,0 +1,161 @@
+"""
+Lightweight tracing spans for per-stage request latency.
+
+A trace is a tree of spans (request -> profile -> each recommender -> graph
+query -> serialization) tracked through a context variable, so it follows
+asyncio tasks and threadpool hops. Finished traces slower than
+QWIPO_TRACE_SLOW_MS are appended as JSON lines to QWIPO_TRACE_FILE by a
+background thread. With QWIPO_TRACE_FILE unset, span() is a no-op.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("qwipo_current_span", default=None)
+
+
+class Span:
+    """Timed unit of work inside a trace"""
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "start_wall", "duration",
+                 "attributes", "children")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.perf_counter()
+        self.start_wall = time.time()
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+        self.children: List["Span"] = []
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start_wall,
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "attributes": self.attributes,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class _NoopSpan:
+    """Stand-in yielded when tracing is disabled"""
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class TraceExporter:
+    """Write finished traces as JSON lines from a background thread"""
+
+    def __init__(self, path: str, slow_ms: float = 0.0):
+        self.slow_ms = slow_ms
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        file_handler = logging.FileHandler(path, encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        self._queue = queue.SimpleQueue()
+        self._logger = logging.getLogger("qwipo_traces")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(logging.handlers.QueueHandler(self._queue))
+        self._listener = logging.handlers.QueueListener(self._queue, file_handler)
+        self._listener.start()
+        atexit.register(self._listener.stop)
+
+    def export(self, root: Span):
+        if (root.duration or 0.0) * 1000 < self.slow_ms:
+            return
+        self._logger.info(json.dumps({"trace_id": root.trace_id, **root.to_dict()}, default=str))
+
+
+_exporter: Optional[TraceExporter] = None
+_configured = False
+
+
+def configure_tracing(path: str = None, slow_ms: float = None):
+    """Enable span export to a JSONL file (QWIPO_TRACE_FILE / QWIPO_TRACE_SLOW_MS)"""
+    global _exporter, _configured
+    _configured = True
+    path = path or os.getenv("QWIPO_TRACE_FILE")
+    if not path:
+        _exporter = None
+        return
+    slow_ms = float(slow_ms if slow_ms is not None else os.getenv("QWIPO_TRACE_SLOW_MS", "0"))
+    _exporter = TraceExporter(path, slow_ms)
+
+
+def tracing_enabled() -> bool:
+    if not _configured:
+        configure_tracing()
+    return _exporter is not None
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current_span.get()
+    return current.trace_id if current else None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a block as a child of the current span, or as a new trace root"""
+    if not tracing_enabled():
+        yield _NOOP
+        return
+
+    parent = _current_span.get()
+    current = Span(name, parent, attributes)
+    if parent is not None:
+        parent.children.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.set(error=type(e).__name__)
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.start
+        _current_span.reset(token)
+        if parent is None:
+            _exporter.export(current)
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening a root span per HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracing_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                request_span.set(status=message["status"])
+            await send(message)
+
+        with span("http.request", method=scope.get("method"), path=scope.get("path")) as request_span:
+            await self.app(scope, receive, send_wrapper)
+            route = scope.get("route")
+            request_span.set(route=getattr(route, "path", "unmatched"))
@@ -0,0 +1,55 @@
+"""
+Keeps API worker processes in step when the data behind their in-memory state changes.
+
+With several uvicorn workers, POST /admin/reload reaches only one of them. That
+worker bumps a generation file in the shared index directory, and every worker
+polls the files it depends on (the generation file and, on the snapshot
+backend, the graph snapshot itself, which ingestion replaces atomically). A
+changed inode or modification time means reload. A poll is one stat() per
+file, so workers can check every few seconds at no measurable cost.
+"""
+
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+GENERATION_FILE = "reload.generation"
+
+Signature = Optional[Tuple[int, int, int]]
+
+
+def file_signature(path: str) -> Signature:
+    """(inode, mtime_ns, size) of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def bump_generation(shared_dir: str) -> str:
+    """Atomically rewrite the generation file so other workers reload; returns its path"""
+    path = os.path.join(shared_dir, GENERATION_FILE)
+    os.makedirs(shared_dir, exist_ok=True)
+    temporary = f"{path}.tmp{os.getpid()}"
+    with open(temporary, "w") as f:
+        f.write(f"{os.getpid()} {os.times().elapsed}\n")
+    os.replace(temporary, path)
+    return path
+
+
+class ReloadWatcher:
+    """Signatures of the watched files as of this worker's last (re)load"""
+
+    def __init__(self, paths: Iterable[str]):
+        self.paths = [path for path in paths if path]
+        self._signatures = self.current()
+
+    def current(self) -> Dict[str, Signature]:
+        return {path: file_signature(path) for path in self.paths}
+
+    def accept(self, signatures: Dict[str, Signature]):
+        """Record the signatures taken before a reload, so changes made during it still trigger the next one"""
+        self._signatures = dict(signatures)
+
+    def changed(self) -> bool:
+        return any(file_signature(path) != signature for path, signature in self._signatures.items())
@@ -3,20 +3,56 @@
 Startup script for Qwipo Recommendation API
 """
 
+import argparse
 import os
 import sys
 from dotenv import load_dotenv
 
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+def prepare_shared_state(backend: str, workers: int):
+    """Build the memory-mapped state once, before the workers start, so none of them duplicates it"""
+    if workers > 1:
+        # Product vectors and the cross-worker reload signal live next to the graph snapshot
+        os.environ.setdefault("QWIPO_SHARED_INDEX_DIR", "snapshots")
+        print(f"   Shared index dir: {os.environ['QWIPO_SHARED_INDEX_DIR']}")
+    
+    if backend == "snapshot":
+        from graph_snapshot import DEFAULT_SNAPSHOT_FILE, snapshot_graph_files, snapshot_is_current
+        
+        path = os.getenv("QWIPO_SNAPSHOT_FILE", DEFAULT_SNAPSHOT_FILE)
+        if not snapshot_is_current(path):
+            print(f"📸 Building graph snapshot: {path}")
+            snapshot_graph_files(
+                os.getenv("RETAILERS_FILE", "mock_data/retailers.json"),
+                os.getenv("TRANSACTIONS_FILE", "mock_data/transactions.json"),
+                path
+            )
+        print(f"   Graph snapshot: {path} (memory-mapped, shared by all workers)")
+    elif backend == "local" and workers > 1:
+        print("⚠️  The local backend builds a private graph in every worker;")
+        print("   use QWIPO_ENGINE_BACKEND=snapshot to share one memory-mapped copy")
+
 def main():
+    # Load environment variables
+    load_dotenv(override=True)
+    
+    parser = argparse.ArgumentParser(description="Start the Qwipo Recommendation API")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("QWIPO_API_WORKERS", "0")),
+                        help="Production mode with this many worker processes (default: one auto-reloading dev server)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    production = args.workers > 0
+    
     print("🚀 QWIPO RECOMMENDATION API")
     print("Neo4j-powered B2B marketplace recommendations")
     print("=" * 60)
     
-    # Load environment variables
-    load_dotenv(override=True)
-    
-    # Check required environment variables
-    required_vars = ["NEO4J_URI", "NEO4J_PASSWORD", "OPENAI_API_KEY"]
+    # Check required environment variables (serving never calls OpenAI, so no API key here)
+    backend = os.getenv("QWIPO_ENGINE_BACKEND", "neo4j").lower()
+    required_vars = ["NEO4J_URI", "NEO4J_PASSWORD"] if backend == "neo4j" else []
     missing_vars = []
     
     for var in required_vars:
@@ -31,24 +67,44 @@ def main():
         sys.exit(1)
     
     print("✅ Environment variables loaded")
-    print(f"   Neo4j URI: {os.getenv('NEO4J_URI')}")
-    print(f"   OpenAI API Key: {os.getenv('OPENAI_API_KEY')[:20]}...")
+    print(f"   Engine backend: {backend}")
+    if backend == "neo4j":
+        print(f"   Neo4j URI: {os.getenv('NEO4J_URI')}")
+    
+    if production:
+        print(f"   Mode: production ({args.workers} worker{'s' if args.workers > 1 else ''})")
+        try:
+            prepare_shared_state(backend, args.workers)
+        except Exception as e:
+            print(f"❌ Failed to prepare shared state: {e}")
+            sys.exit(1)
+    else:
+        print("   Mode: development (auto-reload, single process)")
     
     print("\n🌐 Starting FastAPI server...")
-    print("   API will be available at: http://localhost:8000")
-    print("   Documentation: http://localhost:8000/docs")
-    print("   Alternative docs: http://localhost:8000/redoc")
+    print(f"   API will be available at: http://localhost:{args.port}")
+    print(f"   Documentation: http://localhost:{args.port}/docs")
+    print(f"   Alternative docs: http://localhost:{args.port}/redoc")
     
     # Import and run the FastAPI app
     try:
         import uvicorn
-        uvicorn.run(
-            "recommendation_api:app",
-            host="0.0.0.0",
-            port=8000,
-            reload=True,
-            log_level="info"
-        )
+        if production:
+            uvicorn.run(
+                "recommendation_api:app",
+                host=args.host,
+                port=args.port,
+                workers=args.workers,
+                log_level="info"
+            )
+        else:
+            uvicorn.run(
+                "recommendation_api:app",
+                host=args.host,
+                port=args.port,
+                reload=True,
+                log_level="info"
+            )
     except ImportError:
         print("❌ FastAPI dependencies not installed")
         print("   Run: pip install -r requirements.txt")
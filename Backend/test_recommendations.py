@@ -46,17 +46,7 @@ def display_recommendations(recommendations, rec_type):
 
 def get_available_retailers(engine):
     """Get list of available retailers from the graph"""
-    cypher = """
-    MATCH (r:Retailer)
-    RETURN r.id as retailer_id, r.name as retailer_name, 
-           r.location as location, r.business_type as business_type,
-           r.size as size
-    ORDER BY r.name
-    LIMIT 20
-    """
-    
-    results = engine.neo4j_graph.query(cypher)
-    return results
+    return engine.list_retailers(limit=20)
 
 def main():
     print("🛒 QWIPO RECOMMENDATION ENGINE DEMO")
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Tests import the service modules the way the top-level scripts do
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "src"))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("QWIPO_LOG_LEVEL", "WARNING")
@@ -0,0 +1,36 @@
+import pytest
+from fastapi import HTTPException
+
+from recommendation_api import require_admin_token
+
+
+@pytest.fixture(autouse=True)
+def no_token(monkeypatch):
+    monkeypatch.delenv("QWIPO_ADMIN_TOKEN", raising=False)
+    monkeypatch.delenv("QWIPO_ALLOW_UNAUTHENTICATED_WRITES", raising=False)
+
+
+def status_of(x_admin_token):
+    try:
+        require_admin_token(x_admin_token)
+    except HTTPException as e:
+        return e.status_code
+    return 200
+
+
+def test_writes_are_closed_without_a_configured_token():
+    assert status_of(None) == 503
+    assert status_of("anything") == 503
+
+
+def test_explicit_opt_out_allows_unauthenticated_writes(monkeypatch):
+    monkeypatch.setenv("QWIPO_ALLOW_UNAUTHENTICATED_WRITES", "true")
+    assert status_of(None) == 200
+
+
+def test_configured_token_must_match(monkeypatch):
+    monkeypatch.setenv("QWIPO_ADMIN_TOKEN", "secret")
+    monkeypatch.setenv("QWIPO_ALLOW_UNAUTHENTICATED_WRITES", "true")
+    assert status_of(None) == 403
+    assert status_of("wrong") == 403
+    assert status_of("secret") == 200
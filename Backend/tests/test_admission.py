@@ -0,0 +1,177 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionMiddleware, Overloaded
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def settle():
+    """Let queued tasks run up to their next await"""
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_slots_are_taken_without_queueing_up_to_max_in_flight():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=2, max_queue=0)
+        await controller.acquire()
+        await controller.acquire()
+        assert (controller.in_flight, controller.queued) == (2, 0)
+        with pytest.raises(Overloaded) as shed:
+            await controller.acquire()
+        assert shed.value.reason == "queue_full"
+        controller.release()
+        controller.release()
+        assert controller.in_flight == 0
+
+    run(scenario())
+
+
+def test_released_slot_is_handed_to_the_longest_waiter():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=2, queue_timeout=5)
+        await controller.acquire()
+        order = []
+
+        async def waiter(name):
+            await controller.acquire()
+            order.append(name)
+
+        tasks = [asyncio.create_task(waiter("first")), asyncio.create_task(waiter("second"))]
+        await settle()
+        assert controller.queued == 2
+
+        controller.release()
+        await settle()
+        # The slot moved to a waiter without ever being free
+        assert (order, controller.in_flight, controller.queued) == (["first"], 1, 1)
+
+        controller.release()
+        await asyncio.gather(*tasks)
+        assert (order, controller.in_flight, controller.queued) == (["first", "second"], 1, 0)
+        controller.release()
+        assert controller.in_flight == 0
+
+    run(scenario())
+
+
+def test_new_requests_do_not_overtake_waiters():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.05)
+        await controller.acquire()
+        queued = asyncio.create_task(controller.acquire())
+        await settle()
+        controller.release()
+        # The slot is the waiter's now, so a newcomer waits for the next one instead of taking it
+        with pytest.raises(Overloaded) as shed:
+            await controller.acquire()
+        assert shed.value.reason == "queue_timeout"
+        await queued
+        assert controller.in_flight == 1
+
+    run(scenario())
+
+
+def test_queue_timeout_sheds_the_waiter():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.01)
+        await controller.acquire()
+        with pytest.raises(Overloaded) as shed:
+            await controller.acquire()
+        assert shed.value.reason == "queue_timeout"
+        assert (controller.in_flight, controller.queued) == (1, 0)
+        controller.release()
+        assert controller.in_flight == 0
+
+    run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5)
+        await controller.acquire()
+        queued = asyncio.create_task(controller.acquire())
+        await settle()
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert (controller.in_flight, controller.queued) == (1, 0)
+        controller.release()
+        assert controller.in_flight == 0
+
+    run(scenario())
+
+
+def test_waiter_cancelled_after_the_hand_off_gives_the_slot_back():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5)
+        await controller.acquire()
+        queued = asyncio.create_task(controller.acquire())
+        await settle()
+        # Hand the slot over, then cancel before the waiter resumes
+        controller.release()
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert (controller.in_flight, controller.queued) == (0, 0)
+
+    run(scenario())
+
+
+def test_retry_after_scales_with_queue_and_service_time():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=2, max_queue=10, queue_timeout=5)
+        controller._service_seconds = 1.0
+        assert controller.retry_after() == 1
+        await controller.acquire()
+        await controller.acquire()
+        tasks = [asyncio.create_task(controller.acquire()) for _ in range(4)]
+        await settle()
+        # (4 queued + 1) requests at 1s each over 2 slots
+        assert controller.retry_after() == 3
+        # Four hand-offs to the waiters, then the last two slots are freed
+        for _ in range(6):
+            controller.release()
+        await asyncio.gather(*tasks)
+        assert controller.in_flight == 0
+
+    run(scenario())
+
+
+def test_service_time_is_a_moving_average_of_slot_hold_times():
+    controller = AdmissionController()
+    controller.in_flight = 1
+    controller.release(admitted_at=0.0)
+    assert controller._service_seconds > 0.1
+    assert controller.in_flight == 0
+
+
+def test_middleware_sheds_heavy_requests_with_retry_after():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=0)
+        await controller.acquire()
+        sent = []
+
+        async def app(scope, receive, send):
+            sent.append("served")
+
+        async def send(message):
+            sent.append(message)
+
+        middleware = AdmissionMiddleware(app, controller, is_heavy=lambda path: path.startswith("/heavy"))
+        await middleware({"type": "http", "path": "/light"}, None, send)
+        await middleware({"type": "http", "path": "/heavy"}, None, send)
+        assert sent[0] == "served"
+        assert sent[1]["status"] == 503
+        assert (b"retry-after", b"1") in sent[1]["headers"]
+
+        controller.release()
+        await middleware({"type": "http", "path": "/heavy"}, None, send)
+        assert sent[-1] == "served"
+        assert controller.in_flight == 0
+
+    run(scenario())
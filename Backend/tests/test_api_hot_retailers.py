@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+MOCK_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mock_data")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    if not os.path.exists(os.path.join(MOCK_DATA, "transactions.json")):
+        pytest.skip("mock data not generated (python generate_mock_data.py)")
+    monkeypatch.chdir(os.path.dirname(MOCK_DATA))
+    monkeypatch.setenv("QWIPO_ENGINE_BACKEND", "local")
+    monkeypatch.setenv("QWIPO_WARMUP_RETAILERS", "0")
+    from fastapi.testclient import TestClient
+    import recommendation_api
+    from cache_warmup import HotRetailers
+    monkeypatch.setattr(recommendation_api, "hot_retailers", HotRetailers())
+    with TestClient(recommendation_api.app) as client:
+        yield client, recommendation_api
+
+
+@pytest.mark.parametrize("route", ["", "/stream", "/blended", "/collaborative"])
+def test_only_existing_retailers_count_as_hot(client, route):
+    client, api = client
+    assert client.get(f"/retailers/no-such-retailer/recommendations{route}").status_code == 404
+    retailer_id = api.recommendation_engine.local_graph.retailers[0]["id"]
+    assert client.get(f"/retailers/{retailer_id}/recommendations{route}").status_code == 200
+    assert api.hot_retailers.top(10) == [retailer_id]
@@ -0,0 +1,100 @@
+import math
+import os
+import struct
+
+import pytest
+
+from graph_snapshot import FORMAT_VERSION, MAGIC, SnapshotError, load_snapshot, read_header, write_snapshot
+from in_memory_graph import InMemoryRecommendationGraph
+
+MOCK_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mock_data")
+
+
+@pytest.fixture(scope="module")
+def graphs(tmp_path_factory):
+    """The graph built from the mock data files, and the same graph loaded back from a snapshot"""
+    retailers_file = os.path.join(MOCK_DATA, "retailers.json")
+    transactions_file = os.path.join(MOCK_DATA, "transactions.json")
+    if not (os.path.exists(retailers_file) and os.path.exists(transactions_file)):
+        pytest.skip("mock data not generated (python generate_mock_data.py)")
+    graph = InMemoryRecommendationGraph.from_files(retailers_file, transactions_file)
+    path = str(tmp_path_factory.mktemp("snapshot") / "graph.qsnap")
+    write_snapshot(graph, path, source={"test": True})
+    return graph, load_snapshot(path), path
+
+
+def normalized(value):
+    """Rows compared as plain values: NaN equals NaN, numpy scalars equal Python numbers"""
+    if isinstance(value, dict):
+        return {key: normalized(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalized(item) for item in value]
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return "nan"
+    return value
+
+
+def test_header_records_counts_and_source(graphs):
+    graph, _, path = graphs
+    header = read_header(path)
+    assert header["format_version"] == FORMAT_VERSION
+    assert header["source"] == {"test": True}
+    assert header["counts"]["retailers"] == len(graph.retailers)
+    assert header["counts"]["products"] == len(graph.product_names)
+
+
+def test_snapshot_answers_every_engine_query_like_its_source(graphs):
+    graph, loaded, _ = graphs
+    retailer_ids = [retailer["id"] for retailer in graph.retailers]
+    as_of_day = graph.latest_day
+    recency = [{}, {"since_day": as_of_day - 30}, {"as_of_day": as_of_day, "half_life_days": 14.0},
+               {"since_day": as_of_day - 90, "as_of_day": as_of_day, "half_life_days": 30.0}]
+    first = graph.run("list_retailers", {"limit": 1})[0]
+
+    calls = [
+        ("list_retailers", {"limit": 1000}),
+        ("list_retailers", {"limit": 5, "after_name": first["retailer_name"], "after_id": first["retailer_id"]}),
+        ("list_retailers", {"limit": 1000, "location": graph.retailers[0]["location"]}),
+        ("top_retailers", {"limit": 10}),
+        ("list_products", {}),
+        ("peer_group_popularity", {}),
+        ("retailer_peer_groups", {"retailer_ids": retailer_ids + ["unknown"]}),
+        ("latest_purchase_day", {}),
+    ]
+    for retailer_id in retailer_ids + ["unknown"]:
+        calls += [("retailer_profile", {"retailer_id": retailer_id}),
+                  ("purchased_products", {"retailer_id": retailer_id})]
+        calls += [(name, {"retailer_id": retailer_id, "limit": 10, **params})
+                  for name in ("collaborative", "category_expansion", "brand_loyalty") for params in recency]
+
+    assert {name for name, _ in calls} == set(graph._queries), "a new engine query needs a case here"
+    for name, params in calls:
+        assert normalized(loaded.run(name, params)) == normalized(graph.run(name, params)), (name, params)
+
+
+def write_preamble(path, magic=MAGIC, version=FORMAT_VERSION):
+    with open(path, "wb") as f:
+        f.write(struct.pack("<8sII", magic, version, 2) + b"{}")
+
+
+def test_rejects_files_that_are_not_snapshots(tmp_path):
+    path = tmp_path / "graph.qsnap"
+    write_preamble(path, magic=b"NOTGRAPH")
+    with pytest.raises(SnapshotError, match="Not a Qwipo graph snapshot"):
+        load_snapshot(str(path))
+
+
+def test_rejects_other_format_versions(tmp_path):
+    path = tmp_path / "graph.qsnap"
+    write_preamble(path, version=FORMAT_VERSION + 1)
+    with pytest.raises(SnapshotError, match="format version"):
+        read_header(str(path))
+
+
+def test_rejects_truncated_files(tmp_path):
+    path = tmp_path / "graph.qsnap"
+    path.write_bytes(MAGIC[:4])
+    with pytest.raises(SnapshotError, match="too short"):
+        load_snapshot(str(path))
@@ -0,0 +1,69 @@
+import pytest
+
+from graph_snapshot import load_snapshot, write_snapshot
+from in_memory_graph import InMemoryRecommendationGraph, purchase_day
+
+OLD, NEW = "2024-01-01", "2024-06-01"
+
+
+def purchase(retailer_id, product_name, brand, category, purchase_date):
+    return {"retailer_id": retailer_id, "retailer_name": retailer_id, "product_name": product_name,
+            "brand": brand, "category": category, "purchase_date": purchase_date}
+
+
+@pytest.fixture
+def graph():
+    transactions = [
+        purchase("target", "tea", "Tata", "Beverages", NEW),
+        purchase("target", "coffee", "Tata", "Beverages", NEW),
+    ]
+    # Three peers share both products with the target; one bought long ago, two recently
+    for peer, day in (("old_peer", OLD), ("peer_1", NEW), ("peer_2", NEW)):
+        transactions += [
+            purchase(peer, "tea", "Tata", "Beverages", day),
+            purchase(peer, "coffee", "Tata", "Beverages", day),
+        ]
+    transactions += [
+        purchase("old_peer", "salt", "Tata", "Staples", OLD),
+        purchase("peer_1", "soap", "Lux", "Personal Care", NEW),
+        purchase("peer_2", "soap", "Lux", "Personal Care", NEW),
+        purchase("peer_2", "salt", "Tata", "Staples", NEW),
+    ]
+    return InMemoryRecommendationGraph.from_transactions([], transactions)
+
+
+def test_decay_ranks_but_never_filters_old_purchases(graph):
+    as_of_day = purchase_day(NEW)
+    plain = graph.collaborative_rows("target", 10)
+    decayed = graph.collaborative_rows("target", 10, as_of_day=as_of_day, half_life_days=1.0)
+
+    assert {row["product_name"] for row in decayed} == {row["product_name"] for row in plain} == {"salt", "soap"}
+    salt = next(row for row in decayed if row["product_name"] == "salt")
+    # Counts stay distinct buyers; only the recency weight reflects age
+    assert salt["similar_retailer_count"] == 2
+    assert salt["recency_weight"] == pytest.approx(1.0, abs=1e-4)
+    assert [row["product_name"] for row in decayed] == ["soap", "salt"]
+    assert all(row["recency_weight"] is None for row in plain)
+
+
+def test_window_still_gates_on_distinct_counts(graph):
+    since_day = purchase_day(NEW) - 29
+    rows = graph.collaborative_rows("target", 10, since_day=since_day)
+    # old_peer's purchases fall outside the window: salt keeps one buyer, below the confidence cut-off
+    assert {row["product_name"]: row["similar_retailer_count"] for row in rows} == {"soap": 2}
+
+
+def test_with_purchases_on_a_loaded_snapshot(graph, tmp_path):
+    path = str(tmp_path / "graph.qsnap")
+    write_snapshot(graph, path)
+    rows = [
+        {**purchase("target", "soap", "Lux", "Personal Care", NEW), "day": purchase_day(NEW)},
+        {**purchase("newcomer", "tea", "Tata", "Beverages", NEW), "day": purchase_day(NEW)},
+    ]
+
+    updated, added = load_snapshot(path).with_purchases(rows)
+    expected, _ = graph.with_purchases(rows)
+
+    assert added == [True, True]
+    for retailer_id in ("target", "newcomer", "peer_1"):
+        assert updated.collaborative_rows(retailer_id, 10) == expected.collaborative_rows(retailer_id, 10)
@@ -0,0 +1,95 @@
+import os
+import uuid
+
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from langchain_community.graphs.graph_document import GraphDocument, Node, Relationship
+from langchain_core.documents import Document
+
+from in_memory_graph import purchase_day
+from optimized_ingestion_service import OptimizedQwipoIngestionService, purchase_day_rows, write_purchase_days
+from recommendation_engine import PURCHASE_EVENTS_CYPHER, Recency, collaborative_cypher
+
+OLD, NEW = "2024-01-01T09:00:00", "2024-06-01T09:00:00"
+
+
+def transaction(retailer_id, product_name, purchase_date):
+    return {"retailer_id": retailer_id, "product_name": product_name, "purchase_date": purchase_date}
+
+
+def test_purchase_day_rows_keep_the_latest_day_per_edge():
+    retailers = [{"id": "R1", "name": "Mega Mart"}]
+    rows = purchase_day_rows(retailers, [
+        transaction("R1", "tea", NEW),
+        transaction("R1", "tea", OLD),
+        transaction("R2", "tea", OLD),
+    ])
+
+    assert sorted(rows, key=lambda row: row["retailer_id"]) == [
+        {"retailer_id": "R1", "retailer_name": "Mega Mart", "product_name": "tea", "day": purchase_day(NEW)},
+        {"retailer_id": "R2", "retailer_name": "R2", "product_name": "tea", "day": purchase_day(OLD)},
+    ]
+
+
+@pytest.fixture
+def neo4j_graph():
+    if not os.getenv("NEO4J_URI"):
+        pytest.skip("NEO4J_URI is not set")
+    from neo4j_pool import close_neo4j_pools, get_neo4j_pool
+    pool = get_neo4j_pool()
+    yield pool
+    close_neo4j_pools()
+
+
+def test_recency_query_sees_ingested_purchases(neo4j_graph):
+    prefix = f"test-{uuid.uuid4().hex[:8]}"
+    target, peers = f"{prefix}-target", [f"{prefix}-peer-1", f"{prefix}-peer-2"]
+    tea, coffee, soap = (f"{prefix}-{name}" for name in ("tea", "coffee", "soap"))
+    # The graph documents LLM extraction produces: ids only, no purchase dates
+    nodes = {name: Node(id=name, type="Product") for name in (tea, coffee, soap)}
+    relationships, transactions = [], []
+    for retailer, products in ((target, (tea, coffee)), (peers[0], (tea, coffee, soap)), (peers[1], (tea, coffee, soap))):
+        nodes[retailer] = Node(id=retailer, type="Retailer")
+        for product in products:
+            relationships.append(Relationship(source=nodes[retailer], target=nodes[product], type="PURCHASES"))
+            transactions.append(transaction(retailer, product, OLD))
+            transactions.append(transaction(retailer, product, NEW))
+    document = GraphDocument(nodes=list(nodes.values()), relationships=relationships, source=Document(page_content=""))
+
+    service = OptimizedQwipoIngestionService.__new__(OptimizedQwipoIngestionService)
+    service.neo4j_graph = neo4j_graph
+    try:
+        service.ingest_graph_documents_optimized([document])
+        assert write_purchase_days(neo4j_graph, [], transactions) == len(relationships)
+
+        params = {"retailer_id": target, "limit": 10,
+                  **Recency(window_days=30, half_life_days=14).query_params(purchase_day(NEW))}
+        rows = neo4j_graph.read(collaborative_cypher(window=True, decay=True), params)
+        assert [row["product_name"] for row in rows] == [soap]
+    finally:
+        neo4j_graph.write("MATCH (n) WHERE n.id STARTS WITH $prefix DETACH DELETE n", {"prefix": prefix})
+
+
+def test_purchase_events_reuse_ingested_nodes(neo4j_graph):
+    prefix = f"test-{uuid.uuid4().hex[:8]}"
+    # The LLM keyed this retailer by its name rather than its id
+    retailer_name, product, brand = (f"{prefix}-{name}" for name in ("Mega Mart", "tea", "brand"))
+    nodes = [Node(id=retailer_name, type="Retailer"), Node(id=product, type="Product"), Node(id=brand, type="Brand")]
+    document = GraphDocument(nodes=nodes, relationships=[], source=Document(page_content=""))
+
+    service = OptimizedQwipoIngestionService.__new__(OptimizedQwipoIngestionService)
+    service.neo4j_graph = neo4j_graph
+    try:
+        service.ingest_graph_documents_optimized([document])
+        event = {"retailer_id": f"{prefix}-R1", "retailer_name": retailer_name, "product_name": product,
+                 "brand": brand, "day": purchase_day(NEW)}
+        assert [row["created"] for row in neo4j_graph.write(PURCHASE_EVENTS_CYPHER, {"rows": [event]})] == [True]
+
+        counts = neo4j_graph.read(
+            "MATCH (n) WHERE n.id STARTS WITH $prefix RETURN labels(n)[0] as label, count(*) as nodes",
+            {"prefix": prefix})
+        assert {row["label"]: row["nodes"] for row in counts} == {"Retailer": 1, "Product": 1, "Brand": 1}
+    finally:
+        neo4j_graph.write("MATCH (n) WHERE n.id STARTS WITH $prefix DETACH DELETE n", {"prefix": prefix})
@@ -0,0 +1,152 @@
+import asyncio
+import json
+
+import pytest
+
+from purchase_events import PurchaseEventBatcher, QueueFull
+
+
+def events(count, retailer_id="R1"):
+    return [{"retailer_id": retailer_id, "product_name": f"p{i}", "purchase_date": "2024-06-01"} for i in range(count)]
+
+
+class Recorder:
+    """apply() that records batches and fails the first `failures` calls"""
+
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+
+    async def __call__(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("write failed")
+        self.batches.append(batch)
+        return {"events": len(batch)}
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_queue_full_rejects_without_queueing():
+    async def scenario():
+        batcher = PurchaseEventBatcher(Recorder(), max_batch=10, max_pending=5)
+        batcher.submit(events(4))
+        with pytest.raises(QueueFull):
+            batcher.submit(events(2))
+        assert batcher.pending == 4
+        batcher.submit(events(1))
+        assert batcher.pending == 5
+
+    run(scenario())
+
+
+def test_full_batch_flushes_without_waiting_for_the_timer():
+    async def scenario():
+        apply = Recorder()
+        batcher = PurchaseEventBatcher(apply, max_batch=4, flush_seconds=60)
+        task = asyncio.create_task(batcher.run())
+        submission = batcher.submit(events(4), wait=True)
+        assert await asyncio.wait_for(submission.future, 1) == {"events": 4}
+        task.cancel()
+        assert batcher.pending == 0
+        assert batcher.status(submission.id)["status"] == "applied"
+
+    run(scenario())
+
+
+def test_partial_batch_flushes_after_flush_seconds_and_keeps_submissions_whole():
+    async def scenario():
+        apply = Recorder()
+        batcher = PurchaseEventBatcher(apply, max_batch=5, flush_seconds=0.01)
+        first = batcher.submit(events(3, "R1"))
+        second = batcher.submit(events(3, "R2"), wait=True)
+        task = asyncio.create_task(batcher.run())
+        await asyncio.wait_for(second.future, 1)
+        task.cancel()
+        assert [len(batch) for batch in apply.batches] == [3, 3]
+        assert batcher.status(first.id)["status"] == "applied"
+
+    run(scenario())
+
+
+def test_failed_batch_is_retried_before_later_events():
+    async def scenario():
+        apply = Recorder(failures=1)
+        batcher = PurchaseEventBatcher(apply, max_batch=2, flush_seconds=0.01, retry_seconds=0.01)
+        first = batcher.submit(events(2, "R1"), wait=True)
+        second = batcher.submit(events(2, "R2"), wait=True)
+        task = asyncio.create_task(batcher.run())
+        await asyncio.wait_for(asyncio.gather(first.future, second.future), 1)
+        task.cancel()
+        assert [batch[0]["retailer_id"] for batch in apply.batches] == ["R1", "R2"]
+        assert batcher.status(first.id) == {"submission_id": first.id, "status": "applied", "events": 2,
+                                            "attempts": 1}
+
+    run(scenario())
+
+
+def test_batch_failing_every_attempt_is_dead_lettered(tmp_path):
+    dead_letter_file = tmp_path / "dead" / "events.jsonl"
+
+    async def scenario():
+        batcher = PurchaseEventBatcher(Recorder(failures=3), max_batch=10, flush_seconds=0.01, max_attempts=3,
+                                       retry_seconds=0.01, dead_letter_file=str(dead_letter_file))
+        waiting = batcher.submit(events(2), wait=True)
+        queued = batcher.submit(events(1))
+        task = asyncio.create_task(batcher.run())
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(waiting.future, 1)
+        task.cancel()
+        assert batcher.pending == 0
+        assert batcher.status(queued.id)["status"] == "dead_lettered"
+        return waiting, queued
+
+    waiting, queued = run(scenario())
+    letters = [json.loads(line) for line in dead_letter_file.read_text().splitlines()]
+    assert [(letter["submission_id"], len(letter["events"]), letter["attempts"]) for letter in letters] == [
+        (waiting.id, 2, 3), (queued.id, 1, 3)]
+
+
+def test_drain_dead_letters_failures_without_retrying(tmp_path):
+    dead_letter_file = tmp_path / "events.jsonl"
+
+    async def scenario():
+        apply = Recorder(failures=1)
+        batcher = PurchaseEventBatcher(apply, max_batch=2, retry_seconds=60, dead_letter_file=str(dead_letter_file))
+        failed = batcher.submit(events(2, "R1"))
+        applied = batcher.submit(events(2, "R2"))
+        await asyncio.wait_for(batcher.drain(), 1)
+        assert batcher.status(failed.id)["status"] == "dead_lettered"
+        assert batcher.status(applied.id)["status"] == "applied"
+
+    run(scenario())
+    assert len(dead_letter_file.read_text().splitlines()) == 1
+
+
+def test_retry_after_counts_the_batches_ahead():
+    async def scenario():
+        batcher = PurchaseEventBatcher(Recorder(), max_batch=10, flush_seconds=0.5)
+        assert batcher.retry_after() == 1
+        batcher.submit(events(30))
+        # Three full batches plus the flush window of the next
+        assert batcher.retry_after() == 2
+
+    run(scenario())
+
+
+def test_partial_batch_waits_for_more_events_until_flush_seconds():
+    async def scenario():
+        apply = Recorder()
+        batcher = PurchaseEventBatcher(apply, max_batch=10, flush_seconds=0.05)
+        task = asyncio.create_task(batcher.run())
+        batcher.submit(events(2, "R1"))
+        await asyncio.sleep(0.01)
+        last = batcher.submit(events(2, "R2"), wait=True)
+        await asyncio.wait_for(last.future, 1)
+        task.cancel()
+        # Both submissions arrived within one flush window and went out as one write
+        assert [len(batch) for batch in apply.batches] == [4]
+
+    run(scenario())
@@ -0,0 +1,144 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import recommendation_engine
+
+from in_memory_graph import InMemoryRecommendationGraph, purchase_day
+from recommendation_engine import QwipoRecommendationEngine, Recency
+from result_cache import MISSING, ResultCache
+
+DAY, LATER, EARLIER = "2024-06-01", "2024-06-20", "2024-05-01"
+RECENT = Recency(window_days=30)
+
+
+def purchase(retailer_id, product_name, purchase_date):
+    return {"retailer_id": retailer_id, "retailer_name": retailer_id, "product_name": product_name,
+            "brand": "Tata", "category": "Staples", "purchase_date": purchase_date}
+
+
+@pytest.fixture
+def engine():
+    transactions = [purchase(retailer, product, DAY)
+                    for retailer in ("target", "peer_1", "peer_2") for product in ("tea", "coffee")]
+    transactions += [purchase("peer_1", "salt", DAY), purchase("peer_2", "salt", DAY)]
+    graph = InMemoryRecommendationGraph.from_transactions([], transactions)
+    engine = QwipoRecommendationEngine(local_graph=graph, result_cache=ResultCache())
+    for recency in (None, RECENT):
+        engine.get_comprehensive_recommendations("peer_1", 5, recency=recency)
+    assert engine.latest_purchase_day() == purchase_day(DAY)
+    return engine
+
+
+def cached(engine, recency):
+    return engine.result_cache.get(("comprehensive", "peer_1", 5, recency)) is not MISSING
+
+
+def test_reference_day_moving_drops_every_recency_result(engine):
+    engine.record_purchases([purchase("target", "salt", LATER)])
+
+    assert engine.latest_purchase_day() == purchase_day(LATER)
+    assert not cached(engine, RECENT)
+    assert cached(engine, None)
+
+
+def test_older_purchases_keep_other_retailers_recency_results(engine):
+    engine.record_purchases([purchase("target", "salt", EARLIER)])
+
+    assert engine.latest_purchase_day() == purchase_day(DAY)
+    assert cached(engine, RECENT)
+
+
+def test_result_computed_across_a_graph_update_is_not_cached(engine):
+    compute = engine._retailer_profile
+
+    def profile_then_purchase(retailer_id):
+        profile = compute(retailer_id)
+        # The update lands while this (now stale) profile is being computed
+        engine.record_purchases([purchase("peer_1", "salt", LATER)])
+        return profile
+
+    engine._retailer_profile = profile_then_purchase
+    engine.get_retailer_profile("target")
+    assert engine.result_cache.get(("profile", "target")) is MISSING
+
+    engine._retailer_profile = compute
+    engine.get_retailer_profile("target")
+    assert engine.result_cache.get(("profile", "target")) is not MISSING
+
+
+def test_callers_after_a_graph_update_do_not_join_an_older_computation(engine):
+    started, release = threading.Event(), threading.Event()
+    compute = engine._retailer_profile
+    calls = []
+
+    def slow_profile(retailer_id):
+        calls.append(retailer_id)
+        if len(calls) == 1:
+            started.set()
+            release.wait(5)
+        return compute(retailer_id)
+
+    engine._retailer_profile = slow_profile
+    first = threading.Thread(target=engine.get_retailer_profile, args=("target",))
+    first.start()
+    assert started.wait(5)
+    engine.record_purchases([purchase("target", "salt", LATER)])
+    profile = engine.get_retailer_profile("target")
+    release.set()
+    first.join(5)
+
+    assert len(calls) == 2
+    assert profile["products_bought"] == 3
+
+
+@pytest.fixture
+def one_recommender_thread(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(recommendation_engine, "_recommender_executor", executor)
+    monkeypatch.setattr(recommendation_engine, "_recommender_slots", threading.BoundedSemaphore(1))
+    yield
+    executor.shutdown(wait=True)
+
+
+def test_recommenders_are_not_queued_behind_one_that_missed_its_deadline(engine, one_recommender_thread):
+    release = threading.Event()
+    collaborative = engine.get_collaborative_recommendations
+
+    def stuck(*args):
+        release.wait(5)
+        return collaborative(*args)
+
+    engine.get_collaborative_recommendations = stuck
+    profile = engine.get_retailer_profile("target")
+    _, status = engine.run_recommenders("target", 5, profile, deadline_seconds=0.05)
+    assert status == {"collaborative": "timeout", "category_expansion": "timeout", "brand_loyalty": "timeout"}
+
+    # The stuck recommender still holds the only thread: later requests give up at their deadline
+    start = time.monotonic()
+    _, status = engine.run_recommenders("target", 5, profile, types=["brand_loyalty"], deadline_seconds=0.05)
+    assert status == {"brand_loyalty": "timeout"}
+    assert time.monotonic() - start < 1
+
+    release.set()
+    engine.get_collaborative_recommendations = collaborative
+    _, status = engine.run_recommenders("target", 5, profile, deadline_seconds=5)
+    assert set(status.values()) == {"ok"}
+
+
+def test_cancelled_recommender_releases_its_slot(monkeypatch):
+    # Two slots on one thread, so the second recommender waits in the executor and can be cancelled
+    executor, slots = ThreadPoolExecutor(max_workers=1), threading.BoundedSemaphore(2)
+    monkeypatch.setattr(recommendation_engine, "_recommender_executor", executor)
+    monkeypatch.setattr(recommendation_engine, "_recommender_slots", slots)
+    release = threading.Event()
+    running = recommendation_engine.submit_recommender(lambda: release.wait(5))
+    queued = recommendation_engine.submit_recommender(lambda: None)
+    assert queued.cancel()
+    release.set()
+    running.result(5)
+    executor.shutdown(wait=True)
+
+    assert slots.acquire(blocking=False) and slots.acquire(blocking=False)
@@ -0,0 +1,46 @@
+import pytest
+
+from search_index import RetailerSearchIndex
+
+RETAILERS = [
+    ("City Mart", "Pune"),
+    ("Mega Mart", "Delhi"),
+    ("Family Mart", "Mumbai"),
+    ("Sharma General Store", "Hyderabad"),
+    ("Green Grocers", "Chennai"),
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return RetailerSearchIndex(
+        {"retailer_id": f"RET{i:03d}", "retailer_name": name, "location": location}
+        for i, (name, location) in enumerate(RETAILERS)
+    )
+
+
+def names(results):
+    return [row["retailer_name"] for row in results]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("ctiy", "City Mart"),                # transposition in a 4-letter word
+    ("mega mrat", "Mega Mart"),           # transposition next to an exact token
+    ("gorcers", "Green Grocers"),         # transposition
+    ("chenai", "Green Grocers"),          # deletion (location)
+    ("hyderbad", "Sharma General Store"), # deletion
+    ("citi", "City Mart"),                # substitution
+    ("sharna", "Sharma General Store"),   # substitution
+])
+def test_one_typo_finds_the_retailer(index, query, expected):
+    assert names(index.search(query))[0] == expected
+
+
+def test_typo_token_outranks_retailers_matching_only_the_rest(index):
+    results = index.search("ctiy mart")
+    assert names(results)[0] == "City Mart"
+    assert all(row["score"] < results[0]["score"] for row in results[1:])
+
+
+def test_short_tokens_are_not_fuzzy_matched(index):
+    assert index.search("cty") == []
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from metrics import SINGLE_FLIGHT_REQUESTS
+from single_flight import SingleFlight
+
+
+def concurrently(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def wait_for_followers(kind, count):
+    """Block until count callers have joined the in-flight computation of kind"""
+    deadline = time.monotonic() + 5
+    while SINGLE_FLIGHT_REQUESTS.value(kind, "coalesced") < count:
+        assert time.monotonic() < deadline, "followers never joined"
+        time.sleep(0.001)
+
+
+def test_concurrent_callers_share_one_computation():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    def call():
+        results.append(flight.do(("shared", "a"), compute))
+
+    threads = concurrently(1, call)
+    assert started.wait(5)
+    threads += concurrently(4, call)
+    wait_for_followers("shared", 4)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight._calls == {}
+
+
+def test_followers_get_the_leaders_exception():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def compute():
+        started.set()
+        release.wait(5)
+        raise ValueError("boom")
+
+    def call():
+        try:
+            flight.do(("failing", "a"), compute)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = concurrently(1, call)
+    assert started.wait(5)
+    threads += concurrently(3, call)
+    wait_for_followers("failing", 3)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(errors) == 4
+    assert flight._calls == {}
+
+
+def test_different_keys_and_later_calls_compute_again():
+    flight = SingleFlight()
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        return value
+
+    assert flight.do(("kind", "a"), lambda: compute("a")) == "a"
+    assert flight.do(("kind", "b"), lambda: compute("b")) == "b"
+    assert flight.do(("kind", "a"), lambda: compute("a")) == "a"
+    assert calls == ["a", "b", "a"]
+
+
+def test_failed_call_does_not_poison_the_key():
+    flight = SingleFlight()
+    with pytest.raises(RuntimeError):
+        flight.do(("kind", "a"), lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+    assert flight.do(("kind", "a"), lambda: "ok") == "ok"